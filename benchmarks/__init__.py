@@ -0,0 +1 @@
+"""Offline benchmarks and load tests (run with ``python -m benchmarks.<name>``)."""
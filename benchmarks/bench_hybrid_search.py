@@ -0,0 +1,72 @@
+"""Compare vector search + Python reranking against hybrid (BM25 + vector) search.
+
+Runs against the configured PostgreSQL and Ollama (see .env) with a JSON
+lines file of labelled queries, one ``{"query": ..., "relevant": [chunk ids]}``
+per line:
+
+    python benchmarks/bench_hybrid_search.py --queries eval_queries.jsonl --k 5
+
+Run ``manage-index init`` first so document_chunks has the content_tsv column.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from cib_chatbot_serverside.db.connection import close_pool
+from cib_chatbot_serverside.db.operations import (
+    get_embedding_function,
+    hybrid_search_by_vector,
+    similarity_search_by_vector,
+)
+
+
+def load_queries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(search, cases, k):
+    times, recalls = [], []
+    for case, embedding in cases:
+        start = time.perf_counter()
+        results = search(embedding, case["query"], k)
+        times.append(time.perf_counter() - start)
+        found = {doc.metadata.get("id") for doc, _ in results}
+        relevant = set(case["relevant"])
+        recalls.append(len(found & relevant) / len(relevant) if relevant else 1.0)
+    return statistics.median(times) * 1000, statistics.mean(recalls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", required=True, help="JSON lines file of labelled queries")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--vector-weight", type=float, default=1.0)
+    parser.add_argument("--text-weight", type=float, default=1.0)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    embeddings = get_embedding_function().embed_documents([case["query"] for case in queries])
+    cases = list(zip(queries, embeddings))
+
+    searches = {
+        "vector + rerank": lambda e, q, k: similarity_search_by_vector(e, q, k, rerank=True),
+        "hybrid (RRF)": lambda e, q, k: hybrid_search_by_vector(
+            e, q, k, vector_weight=args.vector_weight, text_weight=args.text_weight, rrf_k=args.rrf_k,
+        ),
+    }
+    print(f"{'mode':>16} | {'p50 ms':>8} | {'recall@' + str(args.k):>9}")
+    try:
+        for name, search in searches.items():
+            # Warm the pool and the buffer cache before timing
+            search(embeddings[0], queries[0]["query"], args.k)
+            p50, recall = evaluate(search, cases, args.k)
+            print(f"{name:>16} | {p50:>8.2f} | {recall:>9.3f}")
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Measure peak memory and time to first chunks when ingesting a large PDF.
+
+Generates a synthetic text PDF, then loads and splits it in a fresh
+interpreter per run, either the old way (``PyPDFLoader(...).load()`` and one
+``split_documents`` over every page) or as the pipeline now does, one window
+of pages at a time:
+
+    python -m benchmarks.bench_ingest_memory --pages 500 2000 --pages-per-window 16
+
+Reported per run: peak RSS of the child process, seconds until the first
+chunks are ready for embedding, and total seconds. Chunks are only counted,
+not embedded, so the numbers isolate parsing and splitting.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from .stores import synthetic_pdf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def whole_file(file_path: str, pages_per_window: int):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    from cib_chatbot_serverside.scripts.pipeline import _split
+
+    yield _split(PyPDFLoader(file_path).load())
+
+
+def windows(file_path: str, pages_per_window: int):
+    from cib_chatbot_serverside.scripts.pipeline import iter_file_chunks
+
+    yield from iter_file_chunks(file_path, pages_per_window)
+
+
+MODES = {"whole-file": whole_file, "windows": windows}
+
+
+def child(mode: str, file_path: str, pages_per_window: int):
+    """Child process: load the file and report memory and timings as JSON."""
+    # Import outside the timed region, like a long-running sync process
+    from cib_chatbot_serverside.scripts import pipeline  # noqa: F401
+    from langchain_community.document_loaders import PyPDFLoader  # noqa: F401
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    first, chunks = None, 0
+    for window in MODES[mode](file_path, pages_per_window):
+        first = first or time.perf_counter() - start
+        chunks += len(window)
+    total = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    print(json.dumps({
+        "chunks": chunks, "first": first, "total": total,
+        "peak_mib": peak / 1024, "growth_mib": (peak - baseline) / 1024,
+    }))
+
+
+def measure(mode: str, file_path: str, pages_per_window: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_ingest_memory", "--child", mode, file_path,
+         "--pages-per-window", str(pages_per_window)],
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT])),
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--pages-per-window", type=int, default=16)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.pages_per_window)
+        return
+
+    print(f"{'pages':>6} | {'mode':>10} | {'chunks':>7} | {'peak MiB':>8} | {'growth MiB':>10} | "
+          f"{'first s':>7} | {'total s':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in args.pages:
+            file_path = synthetic_pdf(os.path.join(directory, f"synthetic-{pages}.pdf"), pages)
+            for mode in MODES:
+                result = measure(mode, file_path, args.pages_per_window)
+                print(
+                    f"{pages:>6} | {mode:>10} | {result['chunks']:>7} | {result['peak_mib']:>8.1f} | "
+                    f"{result['growth_mib']:>10.1f} | {result['first']:>7.2f} | {result['total']:>7.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark the local memory-mapped index against the pgvector search path.
+
+Against the configured PostgreSQL (see .env), snapshots document_chunks into
+a scratch directory, then runs the same queries (stored embeddings plus a
+little noise) through ``similarity_search_by_vector`` on Postgres and
+through the local index, reporting latency and how many of pgvector's
+top-k the exact local search agrees with:
+
+    python benchmarks/bench_local_index.py --queries 200 --k 6
+
+``--synthetic`` skips Postgres and times the local index alone on random
+vectors, for sizing the float32/float16 trade-off:
+
+    python benchmarks/bench_local_index.py --synthetic 10000 50000 100000
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from unittest.mock import patch
+
+import numpy as np
+
+from cib_chatbot_serverside.config.settings import settings
+from cib_chatbot_serverside.db import operations
+from cib_chatbot_serverside.db.connection import close_pool, get_pool
+from cib_chatbot_serverside.db.local_index import DTYPES, LocalVectorIndex
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000
+
+
+def time_searches(search, queries):
+    times, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        times.append(time.perf_counter() - start)
+    return times, results
+
+
+def sample_queries(count, noise, seed):
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT embedding::text FROM document_chunks ORDER BY random() LIMIT %s", (count,))
+            stored = np.array([row[0].strip("[]").split(",") for row in cur.fetchall()], dtype=np.float32)
+        finally:
+            cur.close()
+    rng = np.random.default_rng(seed)
+    return (stored + rng.standard_normal(stored.shape).astype(np.float32) * noise).tolist()
+
+
+def compare_with_pgvector(args):
+    queries = sample_queries(args.queries, args.noise, args.seed)
+    print(f"{'dtype':>8} | {'build s':>8} | {'MiB':>7} | {'pg p50 ms':>9} | {'pg p95 ms':>9} | "
+          f"{'local p50 ms':>12} | {'local p95 ms':>12} | {'overlap@' + str(args.k):>10}")
+
+    with patch.object(settings, "LOCAL_INDEX_ENABLED", False):
+        pg_times, pg_results = time_searches(
+            lambda q: operations.similarity_search_by_vector(q, "", args.k, rerank=False), queries
+        )
+
+    for dtype in args.dtypes:
+        with tempfile.TemporaryDirectory() as path:
+            index = LocalVectorIndex(path, dims=settings.EMBEDDING_DIMENSIONS, dtype=dtype)
+            start = time.perf_counter()
+            index.refresh(rebuild=True)
+            build_time = time.perf_counter() - start
+            local_times, local_results = time_searches(lambda q: index.search(q, args.k), queries)
+
+            overlaps = []
+            for pg, local in zip(pg_results, local_results):
+                if pg:
+                    expected = {doc.metadata.get("id") for doc, _ in pg}
+                    overlaps.append(len(expected & {doc.metadata.get("id") for doc, _ in local}) / len(expected))
+            print(
+                f"{dtype:>8} | {build_time:>8.2f} | {index.stats()['vector_bytes'] / 2 ** 20:>7.1f} | "
+                f"{percentile(pg_times, 50):>9.2f} | {percentile(pg_times, 95):>9.2f} | "
+                f"{percentile(local_times, 50):>12.3f} | {percentile(local_times, 95):>12.3f} | "
+                f"{statistics.mean(overlaps) if overlaps else 0:>10.3f}"
+            )
+
+
+def synthetic(args):
+    rng = np.random.default_rng(args.seed)
+    dims = settings.EMBEDDING_DIMENSIONS
+    queries = rng.standard_normal((args.queries, dims)).astype(np.float32).tolist()
+    print(f"{'rows':>9} | {'dtype':>8} | {'MiB':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'batch ms/q':>10}")
+
+    for size in sorted(args.synthetic):
+        vectors = rng.standard_normal((size, dims)).astype(np.float32)
+        records = [
+            (i, f"chunk {i}", {"id": f"synthetic:0:{i}"}, "synthetic.pdf", "0" * 32, vectors[i])
+            for i in range(size)
+        ]
+        for dtype in args.dtypes:
+            with tempfile.TemporaryDirectory() as path:
+                index = LocalVectorIndex(path, dims=dims, dtype=dtype)
+                index.build(records)
+                times, _ = time_searches(lambda q: index.search(q, args.k, -1), queries)
+                start = time.perf_counter()
+                index.search_many(queries, args.k, -1)
+                batch_time = (time.perf_counter() - start) / len(queries)
+                print(
+                    f"{size:>9} | {dtype:>8} | {index.stats()['vector_bytes'] / 2 ** 20:>7.1f} | "
+                    f"{percentile(times, 50):>8.3f} | {percentile(times, 95):>8.3f} | {batch_time * 1000:>10.3f}"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=settings.TOP_K_RESULTS * 2)
+    parser.add_argument("--dtypes", choices=DTYPES, nargs="+", default=list(DTYPES))
+    parser.add_argument("--noise", type=float, default=0.01, help="Noise added to stored embeddings used as queries")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--synthetic", type=int, nargs="+", metavar="ROWS", help="Time random corpora of these sizes")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        synthetic(args)
+        return
+    try:
+        compare_with_pgvector(args)
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
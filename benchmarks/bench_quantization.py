@@ -0,0 +1,153 @@
+"""Benchmark quantized two-stage search: storage saved, recall@k and latency.
+
+Runs against the configured PostgreSQL (see .env) using a scratch table, so
+the real document_chunks table is never touched. Each mode runs the same
+SQL as ``similarity_search_by_vector``; recall is measured against an exact
+full-precision scan:
+
+    python benchmarks/bench_quantization.py --rows 50000 --candidates 20 40 80
+
+``--from-corpus`` copies the stored document_chunks embeddings instead of
+generating random vectors; binary quantization is much more accurate on
+real embeddings than on random ones.
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import psycopg2.extras
+
+from cib_chatbot_serverside.config.settings import settings
+from cib_chatbot_serverside.db.connection import get_db_connection
+from cib_chatbot_serverside.db.operations import _vector_search_sql
+from cib_chatbot_serverside.db.schema import QUANTIZED_COLUMNS, QUANTIZED_OPS, quantize_sql, quantized_type
+
+TABLE = "bench_quantized_chunks"
+
+
+def vector_literal(vector) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def random_unit_vectors(rng, n, dims):
+    vectors = rng.standard_normal((n, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def search(cur, mode, query, k, candidates, ef_search):
+    params = {
+        "ef_search": max(ef_search, candidates),
+        "probes": settings.VECTOR_PROBES,
+        "embedding": vector_literal(query),
+        "candidates": candidates,
+        "limit": k,
+        "max_distance": 2.0,
+    }
+    start = time.perf_counter()
+    cur.execute(_vector_search_sql(mode).replace("document_chunks", TABLE), params)
+    ids = [int(row[0]) for row in cur.fetchall()]
+    elapsed = time.perf_counter() - start
+    cur.connection.rollback()
+    return ids, elapsed
+
+
+def exact(cur, query, k):
+    cur.execute(
+        f"SET LOCAL enable_indexscan = off; "
+        f"SELECT content FROM {TABLE} ORDER BY embedding <=> %(q)s::vector LIMIT %(k)s",
+        {"q": vector_literal(query), "k": k},
+    )
+    ids = [int(row[0]) for row in cur.fetchall()]
+    cur.connection.rollback()
+    return ids
+
+
+def storage(cur, column, index):
+    cur.execute(
+        f"SELECT sum(pg_column_size({column})), pg_relation_size(%s::regclass) FROM {TABLE}", (index,)
+    )
+    return cur.fetchone()
+
+
+def load(cur, args, dims, rng):
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    columns = ", ".join(f"{column} {quantized_type(mode)}" for mode, column in QUANTIZED_COLUMNS.items())
+    cur.execute(
+        f"CREATE TABLE {TABLE} (id BIGSERIAL PRIMARY KEY, content TEXT, metadata JSONB DEFAULT '{{}}', "
+        f"file_name TEXT, embedding vector({dims}), {columns})"
+    )
+    if args.from_corpus:
+        cur.execute(
+            f"INSERT INTO {TABLE} (embedding) SELECT embedding FROM document_chunks ORDER BY id LIMIT %s",
+            (args.rows,),
+        )
+        cur.execute(f"SELECT embedding::text FROM {TABLE} ORDER BY random() LIMIT %s", (args.queries,))
+        stored = np.array([row[0].strip("[]").split(",") for row in cur.fetchall()], dtype=np.float32)
+        queries = stored + rng.standard_normal(stored.shape).astype(np.float32) * args.noise
+    else:
+        psycopg2.extras.execute_values(
+            cur, f"INSERT INTO {TABLE} (embedding) VALUES %s",
+            [(vector_literal(v),) for v in random_unit_vectors(rng, args.rows, dims)], page_size=1000,
+        )
+        queries = random_unit_vectors(rng, args.queries, dims)
+    assignments = ", ".join(f"{column} = {quantize_sql(mode, 'embedding')}" for mode, column in QUANTIZED_COLUMNS.items())
+    cur.execute(f"UPDATE {TABLE} SET content = id::text, {assignments}")
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=settings.TOP_K_RESULTS * 2)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[settings.VECTOR_RESCORE_CANDIDATES])
+    parser.add_argument("--ef-search", type=int, default=settings.VECTOR_EF_SEARCH)
+    parser.add_argument("--dims", type=int, default=settings.EMBEDDING_DIMENSIONS)
+    parser.add_argument("--from-corpus", action="store_true", help="Copy embeddings from document_chunks")
+    parser.add_argument("--noise", type=float, default=0.01, help="Noise added to stored embeddings used as queries")
+    args = parser.parse_args()
+    settings.EMBEDDING_DIMENSIONS = args.dims
+
+    rng = np.random.default_rng(42)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        queries = load(cur, args, args.dims, rng)
+        cur.execute(f"CREATE INDEX {TABLE}_embedding_idx ON {TABLE} USING hnsw (embedding vector_cosine_ops)")
+        for mode, column in QUANTIZED_COLUMNS.items():
+            ops, _ = QUANTIZED_OPS[mode]
+            cur.execute(f"CREATE INDEX {TABLE}_{column}_idx ON {TABLE} USING hnsw ({column} {ops})")
+        conn.commit()
+        truth = [exact(cur, query, args.k) for query in queries]
+
+        full_bytes, full_index = storage(cur, "embedding", f"{TABLE}_embedding_idx")
+        print(f"{'mode':>8} | {'candidates':>10} | {'column MiB':>10} | {'index MiB':>9} | "
+              f"{'idx saved':>9} | {'recall@' + str(args.k):>9} | {'p50 ms':>7} | {'p95 ms':>7}")
+        for mode in ("none",) + tuple(QUANTIZED_COLUMNS):
+            if mode == "none":
+                column_bytes, index_bytes = full_bytes, full_index
+            else:
+                column = QUANTIZED_COLUMNS[mode]
+                column_bytes, index_bytes = storage(cur, column, f"{TABLE}_{column}_idx")
+            saved = 1 - (index_bytes / full_index)
+            for candidates in (args.candidates if mode != "none" else [args.k]):
+                times, recalls = [], []
+                for query, expected in zip(queries, truth):
+                    found, elapsed = search(cur, mode, query, args.k, candidates, args.ef_search)
+                    times.append(elapsed)
+                    recalls.append(len(set(found) & set(expected)) / len(expected))
+                print(
+                    f"{mode:>8} | {candidates:>10} | {column_bytes / 2 ** 20:>10.1f} | {index_bytes / 2 ** 20:>9.1f} | "
+                    f"{saved:>9.0%} | {statistics.mean(recalls):>9.3f} | "
+                    f"{np.percentile(times, 50) * 1000:>7.2f} | {np.percentile(times, 95) * 1000:>7.2f}"
+                )
+    finally:
+        conn.rollback()
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Measure cold-start cost: import time, time to ready and first-request latency.
+
+The app runs as a child process (a fresh interpreter, so nothing is already
+imported) against the in-memory store and a fake Ollama whose models take
+``--load-latency`` seconds to load on first use, like a cold Ollama:
+
+    python -m benchmarks.bench_startup --load-latency 2 --runs 3
+
+Reported per run: seconds from spawn until the port answers /api/health,
+until /api/ready returns 200 (the same as listening on trees without a
+readiness endpoint), and the latency of the first and second /api/chat.
+Point ``--src`` at another checkout's ``src`` directory to measure it
+with the same harness.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .fake_ollama import FakeOllama
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import cib_chatbot_serverside.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def child_env(src: str, **overrides) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([src, ROOT]), **overrides)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def import_time(src: str, runs: int) -> float:
+    """Median seconds to import the app in a fresh interpreter."""
+    times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET], env=child_env(src), cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        )
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, path: str, deadline: float) -> httpx.Response:
+    while True:
+        try:
+            response = client.get(path)
+            if response.status_code != 503:
+                return response
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{path} did not answer in time")
+        time.sleep(0.01)
+
+
+def cold_start(src: str, fake: FakeOllama, timeout: float) -> dict:
+    """Spawn the server, wait for it to listen and be ready, then time two chats."""
+    port = free_port()
+    env = child_env(src, OLLAMA_BASE_URL=fake.base_url)
+    start = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--serve", str(port)],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            deadline = start + timeout
+            wait_for(client, "/api/health", deadline)
+            listening = time.monotonic() - start
+            ready = listening
+            if client.get("/api/ready").status_code != 404:
+                wait_for(client, "/api/ready", deadline)
+                ready = time.monotonic() - start
+            chats = []
+            for question in ("What is the refund policy?", "How do I open an account?"):
+                request_start = time.monotonic()
+                client.post("/api/chat", json={"message": question}).raise_for_status()
+                chats.append(time.monotonic() - request_start)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"listening": listening, "ready": ready, "first_chat": chats[0], "second_chat": chats[1]}
+
+
+def serve(port: int):
+    """Child process: the real app with searches routed to the in-memory store."""
+    import uvicorn
+
+    from cib_chatbot_serverside.config.settings import settings
+
+    from .stores import InMemoryVectorStore, install_store, synthetic_corpus
+
+    store = InMemoryVectorStore(synthetic_corpus(500), latency=0.005, dims=settings.EMBEDDING_DIMENSIONS)
+    with install_store(store):
+        from cib_chatbot_serverside.main import app
+
+        uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--src", default=os.path.join(ROOT, "src"), help="Source tree to measure")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--load-latency", type=float, default=2.0, help="Fake cold model load (s)")
+    parser.add_argument("--generate-latency", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    print(f"import cib_chatbot_serverside.main: {import_time(args.src, args.runs):.3f} s (median of {args.runs})")
+    print(f"{'run':>3} | {'listening s':>11} | {'ready s':>7} | {'1st chat s':>10} | {'2nd chat s':>10}")
+    for run in range(args.runs):
+        # A fresh fake per run, so every start finds the models unloaded
+        with FakeOllama(load_latency=args.load_latency, generate_latency=args.generate_latency) as fake:
+            result = cold_start(args.src, fake, args.timeout)
+        print(
+            f"{run + 1:>3} | {result['listening']:>11.3f} | {result['ready']:>7.3f} | "
+            f"{result['first_chat']:>10.3f} | {result['second_chat']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
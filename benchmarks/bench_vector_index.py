@@ -0,0 +1,101 @@
+"""Benchmark ANN index recall and latency against exact scan as the table grows.
+
+Runs against the configured PostgreSQL (see .env) using a scratch table, so
+the real document_chunks table is never touched:
+
+    python benchmarks/bench_vector_index.py --sizes 10000 50000 100000 --index hnsw
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import psycopg2.extras
+
+from cib_chatbot_serverside.config.settings import settings
+from cib_chatbot_serverside.db.connection import get_db_connection
+
+TABLE = "bench_document_chunks"
+
+
+def vector_literal(vector) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def random_unit_vectors(rng, n, dims):
+    vectors = rng.standard_normal((n, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def top_k(cur, query, k, exact, ef_search, probes):
+    settings_sql = (
+        "SET LOCAL enable_indexscan = off;" if exact
+        else f"SET LOCAL hnsw.ef_search = {ef_search}; SET LOCAL ivfflat.probes = {probes};"
+    )
+    start = time.perf_counter()
+    cur.execute(
+        settings_sql + f" SELECT id FROM {TABLE} ORDER BY embedding <=> %(q)s::vector LIMIT %(k)s",
+        {"q": vector_literal(query), "k": k},
+    )
+    ids = [row[0] for row in cur.fetchall()]
+    cur.connection.rollback()
+    return ids, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--index", choices=["hnsw", "ivfflat"], default="hnsw")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, default=settings.VECTOR_EF_SEARCH)
+    parser.add_argument("--probes", type=int, default=settings.VECTOR_PROBES)
+    parser.add_argument("--dims", type=int, default=settings.EMBEDDING_DIMENSIONS)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    queries = random_unit_vectors(rng, args.queries, args.dims)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cur.execute(f"CREATE TABLE {TABLE} (id BIGSERIAL PRIMARY KEY, embedding vector({args.dims}))")
+    conn.commit()
+
+    print(f"{'rows':>9} | {'exact p50 ms':>12} | {'index p50 ms':>12} | {'recall@' + str(args.k):>9}")
+    try:
+        rows = 0
+        for size in sorted(args.sizes):
+            batch = random_unit_vectors(rng, size - rows, args.dims)
+            psycopg2.extras.execute_values(
+                cur, f"INSERT INTO {TABLE} (embedding) VALUES %s",
+                [(vector_literal(v),) for v in batch], page_size=1000,
+            )
+            rows = size
+            cur.execute(f"DROP INDEX IF EXISTS {TABLE}_embedding_idx")
+            options = "WITH (m = 16, ef_construction = 64)" if args.index == "hnsw" else f"WITH (lists = {max(size // 1000, 1)})"
+            cur.execute(
+                f"CREATE INDEX {TABLE}_embedding_idx ON {TABLE} "
+                f"USING {args.index} (embedding vector_cosine_ops) {options}"
+            )
+            conn.commit()
+
+            exact_times, index_times, recalls = [], [], []
+            for query in queries:
+                truth, exact_time = top_k(cur, query, args.k, True, args.ef_search, args.probes)
+                found, index_time = top_k(cur, query, args.k, False, args.ef_search, args.probes)
+                exact_times.append(exact_time)
+                index_times.append(index_time)
+                recalls.append(len(set(truth) & set(found)) / len(truth))
+
+            print(
+                f"{size:>9} | {statistics.median(exact_times) * 1000:>12.2f} | "
+                f"{statistics.median(index_times) * 1000:>12.2f} | {statistics.mean(recalls):>9.3f}"
+            )
+    finally:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Measure /api/chat throughput as the number of server workers grows.
+
+Each run starts the real app with ``SERVER_WORKERS``-style uvicorn workers
+(separate processes sharing one port) against the fake Ollama and the
+in-memory store, then drives it with the closed-loop load generator. The
+fake Ollama is fast and the LLM admission limits are lifted, so the
+service's own CPU work is what limits throughput:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --requests 1000
+
+Sessions stay in memory per worker unless ``--session-store postgres``
+(which needs the configured database); every client holds one session.
+Throughput can only scale up to the number of free CPU cores, and the
+fake Ollama and the load generator run on the same machine.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from .fake_ollama import FakeOllama
+from .load_test import run_load, summarize
+from .stores import sample_queries, synthetic_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_installed = None
+
+
+def create_app():
+    """uvicorn factory run in every worker: the app with searches on the in-memory store."""
+    from cib_chatbot_serverside.config.settings import settings
+
+    from .stores import InMemoryVectorStore, install_store
+
+    global _installed
+    store = InMemoryVectorStore(synthetic_corpus(2000), latency=0.002, dims=settings.EMBEDDING_DIMENSIONS)
+    # Entered for the life of the worker process (and kept referenced, or collection would undo it)
+    _installed = install_store(store)
+    _installed.__enter__()
+    from cib_chatbot_serverside.main import app
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, ollama_url: str, session_store: str) -> tuple:
+    port = free_port()
+    env = dict(
+        os.environ,
+        OLLAMA_BASE_URL=ollama_url,
+        SESSION_STORE=session_store,
+        LLM_MAX_CONCURRENCY="1000",
+        LLM_QUEUE_SIZE="10000",
+        LLM_QUEUE_PER_CLIENT="10000",
+        WARMUP_ENABLED="false",
+        LOG_LEVEL="WARNING",
+    )
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.bench_workers:create_app", "--factory",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            if httpx.get(f"{base_url}/api/health").status_code == 200:
+                return process, base_url
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline or process.poll() is not None:
+            process.kill()
+            raise RuntimeError(f"Server with {workers} workers failed to start")
+        time.sleep(0.05)
+
+
+async def drive(base_url: str, queries, args) -> dict:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(120), limits=limits) as client:
+        # Warm every worker's imports and caches before measuring
+        await run_load(client, queries, concurrency=args.concurrency, requests=args.concurrency * 4)
+        return await run_load(client, queries, concurrency=args.concurrency, requests=args.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--generate-latency", type=float, default=0.02, help="Fake time to first token (s)")
+    parser.add_argument("--tokens", type=int, default=16)
+    parser.add_argument("--session-store", choices=["memory", "postgres"], default="memory")
+    args = parser.parse_args()
+
+    queries = sample_queries(synthetic_corpus(2000), 200)
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'workers':>7} | {'req/s':>8} | {'speed-up':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'errors':>6}")
+    baseline = None
+    with FakeOllama(
+        embed_latency=0.002, embed_latency_per_text=0, generate_latency=args.generate_latency,
+        token_latency=0, tokens=args.tokens, parallel=10_000,
+    ) as fake:
+        for workers in args.workers:
+            process, base_url = start_server(workers, fake.base_url, args.session_store)
+            try:
+                report = asyncio.run(drive(base_url, queries, args))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            stats = summarize(report["samples"].get("client_total", []))
+            baseline = baseline or report["throughput"]
+            print(
+                f"{workers:>7} | {report['throughput']:>8.1f} | {report['throughput'] / baseline:>7.2f}x | "
+                f"{stats.get('p50', 0) * 1000:>8.1f} | {stats.get('p95', 0) * 1000:>8.1f} | {report['errors']:>6}"
+            )
+            for error in report["error_samples"]:
+                print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
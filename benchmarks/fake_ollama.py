@@ -0,0 +1,237 @@
+"""A local stand-in for the Ollama HTTP API with configurable latency.
+
+Serves ``/api/embed`` and ``/api/chat`` (streamed NDJSON or a single JSON
+body) in the wire format the ``ollama`` client expects, so the real
+``ChatOllama``/``OllamaEmbeddings`` code paths are exercised without a GPU
+or network:
+
+    python -m benchmarks.fake_ollama --port 11435 --generate-latency 0.3 --tokens 64
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from cib_chatbot_serverside.config.settings import settings
+
+_WORD = re.compile(r"\w+")
+
+
+def fake_embedding(text: str, dims: int) -> List[float]:
+    """Deterministic bag-of-words embedding: texts sharing words are close."""
+    vector = np.zeros(dims, dtype=np.float32)
+    for word in _WORD.findall(text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dims
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+
+class BackgroundServer:
+    """Serve an ASGI app with uvicorn on a background thread (port 0 = any free port)."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0, lifespan: str = "off"):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.lifespan = lifespan
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Start serving and wait until the port is bound."""
+        config = uvicorn.Config(
+            self.app, host=self.host, port=self.port, log_level="warning", lifespan=self.lifespan
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"{type(self).__name__} failed to start")
+            time.sleep(0.01)
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def wait(self):
+        self._thread.join()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeOllama(BackgroundServer):
+    """Fake Ollama server running in a background thread.
+
+    ``embed_latency`` is paid per request plus ``embed_latency_per_text`` per
+    input; ``generate_latency`` is the time to first token and
+    ``token_latency`` the gap between tokens. ``parallel`` caps concurrent
+    requests per endpoint (i.e. per loaded model) like
+    ``OLLAMA_NUM_PARALLEL``; the rest queue. ``load_latency`` is paid once
+    per model by whichever requests arrive before it is loaded, like a cold
+    Ollama; a chat with no messages only loads the model, as in Ollama.
+    """
+
+    def __init__(
+        self,
+        embed_latency: float = 0.02,
+        embed_latency_per_text: float = 0.002,
+        generate_latency: float = 0.2,
+        token_latency: float = 0.01,
+        load_latency: float = 0.0,
+        tokens: int = 32,
+        parallel: int = 4,
+        dims: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.embed_latency = embed_latency
+        self.embed_latency_per_text = embed_latency_per_text
+        self.generate_latency = generate_latency
+        self.token_latency = token_latency
+        self.load_latency = load_latency
+        self.tokens = tokens
+        self.parallel = parallel
+        self.dims = dims or settings.EMBEDDING_DIMENSIONS
+        self.requests = {"embed": 0, "chat": 0}
+        super().__init__(self._build_app(), host=host, port=port)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+        slots: dict = {}
+        loads: dict = {}
+
+        def slot(model: str) -> asyncio.Semaphore:
+            # Created lazily so it binds to the server's event loop
+            if model not in slots:
+                slots[model] = asyncio.Semaphore(self.parallel)
+            return slots[model]
+
+        async def load(model: str):
+            if model not in loads:
+                loads[model] = asyncio.ensure_future(asyncio.sleep(self.load_latency))
+            await asyncio.shield(loads[model])
+
+        def envelope(model: str, **fields) -> dict:
+            return {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), **fields}
+
+        @app.post("/api/embed")
+        async def embed(request: Request):
+            body = await request.json()
+            texts = body.get("input", [])
+            if isinstance(texts, str):
+                texts = [texts]
+            self.requests["embed"] += 1
+            await load(body.get("model", ""))
+            async with slot("embed"):
+                await asyncio.sleep(self.embed_latency + self.embed_latency_per_text * len(texts))
+            return JSONResponse(envelope(
+                body.get("model", ""),
+                embeddings=[fake_embedding(text, self.dims) for text in texts],
+                done=True,
+            ))
+
+        @app.post("/api/chat")
+        async def chat(request: Request):
+            body = await request.json()
+            model = body.get("model", "")
+            prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+            words = [f"token{i}" for i in range(self.tokens)]
+            self.requests["chat"] += 1
+            await load(model)
+            if not body.get("messages"):
+                return JSONResponse(envelope(
+                    model, message={"role": "assistant", "content": ""}, done=True, done_reason="load"
+                ))
+            final = envelope(
+                model,
+                message={"role": "assistant", "content": ""},
+                done=True,
+                done_reason="stop",
+                prompt_eval_count=prompt_tokens,
+                eval_count=self.tokens,
+            )
+
+            if not body.get("stream", True):
+                async with slot("chat"):
+                    await asyncio.sleep(self.generate_latency + self.token_latency * self.tokens)
+                final["message"]["content"] = " ".join(words)
+                return JSONResponse(final)
+
+            async def stream():
+                async with slot("chat"):
+                    await asyncio.sleep(self.generate_latency)
+                    for i, word in enumerate(words):
+                        if i:
+                            await asyncio.sleep(self.token_latency)
+                        content = word if i == 0 else " " + word
+                        chunk = envelope(model, message={"role": "assistant", "content": content}, done=False)
+                        yield json.dumps(chunk) + "\n"
+                yield json.dumps(final) + "\n"
+
+            return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+        @app.get("/api/tags")
+        async def tags():
+            return {"models": []}
+
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--generate-latency", type=float, default=0.2, help="Time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Cold model load time (s)")
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--parallel", type=int, default=4)
+    args = parser.parse_args()
+
+    server = FakeOllama(
+        embed_latency=args.embed_latency,
+        generate_latency=args.generate_latency,
+        token_latency=args.token_latency,
+        load_latency=args.load_latency,
+        tokens=args.tokens,
+        parallel=args.parallel,
+        port=args.port,
+    ).start()
+    print(f"Fake Ollama listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server.wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Load test /api/chat offline and compare the results against a saved baseline.
+
+By default everything runs in one process: the app is served by uvicorn on
+a background thread, Ollama is replaced by ``benchmarks.fake_ollama`` (real
+HTTP, real clients) and pgvector by an in-memory store, so the numbers
+isolate the service's own overhead and concurrency behaviour:
+
+    python -m benchmarks.load_test --concurrency 16 --requests 400
+    python -m benchmarks.load_test --rate 20 --duration 30 --endpoint stream
+    python -m benchmarks.load_test --save-baseline benchmarks/baselines/main.json
+    python -m benchmarks.load_test --compare benchmarks/baselines/main.json --tolerance 0.1
+
+``--store pgvector`` searches the configured database instead, and
+``--url http://host:8000`` targets a running server (client-side timings
+only; per-stage timings are captured in-process). ``--compare`` exits with
+status 1 if any p95 or the throughput regressed by more than the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+from .fake_ollama import BackgroundServer, FakeOllama
+from .stores import InMemoryVectorStore, install_store, sample_queries, synthetic_corpus
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99 of a list of latencies (seconds)."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64)
+    summary = {"count": int(values.size), "mean": float(values.mean())}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = float(np.percentile(values, p))
+    return summary
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.1) -> List[str]:
+    """Describe every stage whose p95 or the run whose throughput regressed."""
+    regressions = []
+    for stage, stats in baseline.get("stages", {}).items():
+        now = current.get("stages", {}).get(stage)
+        if not now or not now.get("count") or not stats.get("count"):
+            continue
+        if now["p95"] > stats["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{stage}: p95 {stats['p95'] * 1000:.1f} ms -> {now['p95'] * 1000:.1f} ms"
+            )
+    if current.get("throughput", 0) < baseline.get("throughput", 0) * (1 - tolerance):
+        regressions.append(
+            f"throughput: {baseline['throughput']:.2f} -> {current['throughput']:.2f} req/s"
+        )
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def capture_stages(samples: Dict[str, List[float]]):
+    """Record every server-side STAGE_LATENCY observation made during the block."""
+    from cib_chatbot_serverside.utils.metrics import STAGE_LATENCY
+
+    original = STAGE_LATENCY.observe
+
+    def observe(value, **labels):
+        samples.setdefault(labels.get("stage", ""), []).append(value)
+        original(value, **labels)
+
+    STAGE_LATENCY.observe = observe
+    try:
+        yield samples
+    finally:
+        del STAGE_LATENCY.observe
+
+
+class Rejected(Exception):
+    """The server shed the request (429)."""
+
+
+async def _one_request(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    query: str,
+    samples: Dict[str, List[float]],
+    client_id: str,
+    session_id: str,
+):
+    start = time.perf_counter()
+    headers = {"X-Client-ID": client_id}
+    body = {"message": query, "session_id": session_id}
+    if endpoint == "stream":
+        first_token = None
+        async with client.stream("POST", "/api/chat/stream", json=body, headers=headers) as response:
+            if response.status_code == 429:
+                raise Rejected()
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("event: error"):
+                    raise RuntimeError("stream reported an error")
+                if first_token is None and line.startswith("event: token"):
+                    first_token = time.perf_counter() - start
+        if first_token is not None:
+            samples.setdefault("client_first_token", []).append(first_token)
+    else:
+        response = await client.post("/api/chat", json=body, headers=headers)
+        if response.status_code == 429:
+            raise Rejected()
+        response.raise_for_status()
+    samples.setdefault("client_total", []).append(time.perf_counter() - start)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    queries: Sequence[str],
+    endpoint: str = "chat",
+    concurrency: int = 8,
+    requests: Optional[int] = None,
+    duration: Optional[float] = None,
+    rate: Optional[float] = None,
+    clients: Optional[int] = None,
+    samples: Optional[Dict[str, List[float]]] = None,
+) -> dict:
+    """Drive the API and return throughput, errors and client-side samples.
+
+    Closed loop by default (``concurrency`` workers, each sending its next
+    request when the previous one finishes); with ``rate`` requests start on
+    a fixed schedule regardless of how fast earlier ones complete. Requests
+    are spread over ``clients`` client IDs (default: one per worker) so the
+    server's per-client fairness sees distinct callers, and each client
+    holds one conversation (a session new to this run); 429s are counted
+    as ``rejected``, not errors.
+    """
+    samples = {} if samples is None else samples
+    errors: List[str] = []
+    counter = {"sent": 0, "rejected": 0}
+    clients = clients or concurrency
+    run_id = uuid.uuid4().hex[:8]
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def next_query() -> Optional[str]:
+        if requests is not None and counter["sent"] >= requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        query = queries[counter["sent"] % len(queries)]
+        counter["sent"] += 1
+        return query
+
+    async def attempt(query: str, client_id: str):
+        try:
+            await _one_request(client, endpoint, query, samples, client_id, f"{run_id}-{client_id}")
+        except Rejected:
+            counter["rejected"] += 1
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    if rate:
+        tasks = []
+        while (query := next_query()) is not None:
+            scheduled = start + (counter["sent"] - 1) / rate
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            tasks.append(asyncio.create_task(attempt(query, f"client-{counter['sent'] % clients}")))
+        await asyncio.gather(*tasks)
+    else:
+        async def worker(index: int):
+            while (query := next_query()) is not None:
+                await attempt(query, f"client-{index % clients}")
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+    elapsed = time.perf_counter() - start
+    completed = counter["sent"] - len(errors) - counter["rejected"]
+    return {
+        "requests": counter["sent"],
+        "rejected": counter["rejected"],
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "elapsed": elapsed,
+        "throughput": completed / elapsed if elapsed > 0 else 0.0,
+        "samples": samples,
+    }
+
+
+def print_report(report: dict):
+    print(f"{report['requests']} requests in {report['elapsed']:.2f} s, "
+          f"{report['throughput']:.2f} req/s, {report.get('rejected', 0)} rejected (429), "
+          f"{report['errors']} errors")
+    for error in report.get("error_samples", []):
+        print(f"  error: {error}")
+    print(f"{'stage':>20} | {'count':>6} | {'mean ms':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8}")
+    for stage, stats in sorted(report["stages"].items()):
+        if not stats.get("count"):
+            continue
+        print(f"{stage:>20} | {stats['count']:>6} | {stats['mean'] * 1000:>8.1f} | "
+              + " | ".join(f"{stats[f'p{p}'] * 1000:>8.1f}" for p in PERCENTILES))
+
+
+async def _run(args, base_url: str, queries: Sequence[str]) -> dict:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(args.timeout), limits=limits) as client:
+        return await run_load(
+            client, queries, endpoint=args.endpoint, concurrency=args.concurrency,
+            requests=args.requests, duration=args.duration, rate=args.rate, clients=args.clients,
+        )
+
+
+def point_clients_at(base_url: str):
+    """Point the app's Ollama clients (built lazily from settings) at ``base_url``."""
+    from cib_chatbot_serverside.config.settings import settings
+    from cib_chatbot_serverside.services import rag_service
+
+    settings.OLLAMA_BASE_URL = base_url
+    rag_service._rag_service = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["chat", "stream"], default="chat")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop workers")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate (req/s) instead of closed loop")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests (default 200)")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--clients", type=int, help="Distinct X-Client-ID values (default: one per worker)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--url", help="Load a running server instead of the in-process app")
+    parser.add_argument("--store", choices=["memory", "pgvector"], default="memory")
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200, help="Distinct queries to cycle through")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="In-memory store round trip (s)")
+    parser.add_argument("--ollama-url", help="Use a real Ollama instead of the fake server")
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--generate-latency", type=float, default=0.2, help="Fake time to first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=32)
+    parser.add_argument("--ollama-parallel", type=int, default=4, help="Fake OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression")
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 200
+
+    from cib_chatbot_serverside.config.settings import settings
+
+    corpus = synthetic_corpus(args.corpus_size)
+    queries = sample_queries(corpus, args.queries)
+
+    samples: Dict[str, List[float]] = {}
+    base_url = args.url
+    with ExitStack() as stack:
+        if not base_url:
+            if args.ollama_url:
+                point_clients_at(args.ollama_url)
+            else:
+                fake = stack.enter_context(FakeOllama(
+                    embed_latency=args.embed_latency,
+                    generate_latency=args.generate_latency,
+                    token_latency=args.token_latency,
+                    tokens=args.tokens,
+                    parallel=args.ollama_parallel,
+                ))
+                point_clients_at(fake.base_url)
+            if args.store == "memory":
+                store = InMemoryVectorStore(corpus, latency=args.db_latency, dims=settings.EMBEDDING_DIMENSIONS)
+                stack.enter_context(install_store(store))
+
+            from cib_chatbot_serverside.main import app
+
+            # Real HTTP (not an ASGI transport) so streamed tokens arrive as they are sent;
+            # the lifespan only matters when the database is involved
+            server = BackgroundServer(app, lifespan="on" if args.store == "pgvector" else "off")
+            base_url = stack.enter_context(server).base_url
+            stack.enter_context(capture_stages(samples))
+        report = asyncio.run(_run(args, base_url, queries))
+
+    samples.update(report.pop("samples"))
+    report["stages"] = {stage: summarize(values) for stage, values in samples.items()}
+    report.update(
+        commit=git_commit(),
+        created_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        config={k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare")},
+    )
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        print(f"Compared with {args.compare} (commit {baseline.get('commit')}, tolerance {args.tolerance:.0%})")
+        for line in regressions:
+            print(f"  REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print("  no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Vector store stand-ins for offline benchmarks.
+
+``InMemoryVectorStore`` answers the same calls as
+``db.operations.similarity_search_by_vector``/``hybrid_search_by_vector``
+(and their batch variants) from a numpy matrix, with a configurable sleep
+standing in for the database round trip. ``install_store`` swaps it in for
+the duration of a run.
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+from unittest.mock import patch
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .fake_ollama import fake_embedding
+
+VOCABULARY = (
+    "account balance transfer loan mortgage interest rate card credit debit fee limit branch "
+    "statement deposit withdrawal savings current overdraft payment swift iban currency exchange "
+    "salary certificate cheque beneficiary online banking mobile app password token otp fraud "
+    "complaint dispute chargeback installment tenor collateral guarantee letter corporate retail "
+    "customer service hours document identity address proof form application approval"
+).split()
+
+
+def synthetic_corpus(size: int = 2000, words_per_chunk: int = 60, seed: int = 0) -> List[Document]:
+    """Chunks of random banking vocabulary, laid out like ingested PDF pages."""
+    rng = np.random.default_rng(seed)
+    documents = []
+    for i in range(size):
+        words = rng.choice(VOCABULARY, size=words_per_chunk)
+        documents.append(Document(
+            page_content=" ".join(words),
+            metadata={
+                "id": f"doc{i // 20}.pdf:{(i % 20) // 4}:{i % 4}",
+                "source": f"data/doc{i // 20}.pdf",
+                "file_name": f"doc{i // 20}.pdf",
+                "page": (i % 20) // 4,
+                "start_index": (i % 4) * words_per_chunk * 8,
+            },
+        ))
+    return documents
+
+
+def synthetic_pdf(path: str, pages: int, lines_per_page: int = 45, words_per_line: int = 12, seed: int = 0) -> str:
+    """Write a text PDF of random banking vocabulary, for ingestion benchmarks and tests."""
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    rng = np.random.default_rng(seed)
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+    for _ in range(pages):
+        lines = [" ".join(rng.choice(VOCABULARY, size=words_per_line)) for _ in range(lines_per_page)]
+        text = " T* ".join(f"({line}) Tj" for line in lines)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 9 Tf 11 TL 36 770 Td {text} ET".encode("ascii"))
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = resources
+        page[NameObject("/Contents")] = writer._add_object(content)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def sample_queries(documents: Sequence[Document], count: int = 200, words: int = 6, seed: int = 1) -> List[str]:
+    """Queries built from words of random chunks, so retrieval has something to find."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for index in rng.integers(0, len(documents), size=count):
+        chunk_words = documents[index].page_content.split()
+        start = int(rng.integers(0, max(1, len(chunk_words) - words)))
+        queries.append("What about " + " ".join(chunk_words[start:start + words]) + "?")
+    return queries
+
+
+class InMemoryVectorStore:
+    """Exact cosine search over a numpy matrix, sleeping ``latency`` per query."""
+
+    def __init__(
+        self,
+        documents: Sequence[Document],
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        latency: float = 0.005,
+        dims: int = 1024,
+    ):
+        self.documents = list(documents)
+        self.latency = latency
+        embed_fn = embed_fn or (lambda text: fake_embedding(text, dims))
+        self.matrix = np.asarray([embed_fn(doc.page_content) for doc in self.documents], dtype=np.float32)
+        self.queries = 0
+
+    def search(self, query_embedding: List[float], query: str = "", k: int = 3, **options) -> List[Tuple[Document, float]]:
+        """Blocking like psycopg2; accepts and ignores vector/hybrid tuning options."""
+        self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._rank(query_embedding, k)
+
+    def batch_search(
+        self, query_embeddings: List[List[float]], queries: Sequence[str], k: int = 3, **options
+    ) -> List[List[Tuple[Document, float]]]:
+        """One simulated round trip for a whole batch, like the LATERAL query."""
+        self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._rank(embedding, k) for embedding in query_embeddings]
+
+    def _rank(self, query_embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        scores = self.matrix @ np.asarray(query_embedding, dtype=np.float32)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+
+@contextmanager
+def install_store(store: InMemoryVectorStore) -> Iterator[InMemoryVectorStore]:
+    """Route the app's vector and hybrid searches to ``store``."""
+    with patch("cib_chatbot_serverside.db.operations.similarity_search_by_vector", store.search), \
+            patch("cib_chatbot_serverside.db.operations.hybrid_search_by_vector", store.search), \
+            patch("cib_chatbot_serverside.db.operations.batch_similarity_search_by_vector", store.batch_search), \
+            patch("cib_chatbot_serverside.db.operations.batch_hybrid_search_by_vector", store.batch_search):
+        yield store
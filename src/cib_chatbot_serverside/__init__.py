@@ -2,19 +2,25 @@
 CIB ChatBot Server Side
 A RAG-based chatbot API using FastAPI, LangChain, and PostgreSQL with pgvector
 """
+import importlib
 
 __version__ = "1.0.0"
 
-# Make key components available at package level
-from .config import settings, prompt_manager
-from .services import RAGService, LLMService
-from .api import ChatRequest, ChatResponse
+# Key components available at package level, imported on first access so
+# that importing the package (or any submodule) stays cheap
+_EXPORTS = {
+    "settings": ".config",
+    "prompt_manager": ".config",
+    "RAGService": ".services",
+    "LLMService": ".services",
+    "ChatRequest": ".api",
+    "ChatResponse": ".api",
+}
 
-__all__ = [
-    "settings",
-    "prompt_manager",
-    "RAGService",
-    "LLMService",
-    "ChatRequest",
-    "ChatResponse",
-]
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
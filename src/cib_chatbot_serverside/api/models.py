@@ -1,15 +1,49 @@
 """API request and response models."""
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from ..config.settings import settings
+
+
+SESSION_ID_PATTERN = r"^[\w.:-]{1,128}$"
 
 
 class ChatRequest(BaseModel):
-    """Chat request model."""
+    """Chat request model; without a ``session_id`` a new conversation is started."""
     message: str
+    session_id: Optional[str] = Field(None, pattern=SESSION_ID_PATTERN)
 
 
 class ChatResponse(BaseModel):
-    """Chat response model."""
+    """Chat response model, with the session to send back for follow-up questions."""
     response: str
     context_used: Optional[bool] = None
     sources: Optional[List[str]] = None
+    session_id: Optional[str] = None
+
+
+class ClearHistoryRequest(BaseModel):
+    """Clear the conversation of one session."""
+    session_id: str = Field(..., pattern=SESSION_ID_PATTERN)
+
+
+class BatchChatRequest(BaseModel):
+    """Batch chat request: independent questions answered without chat history."""
+    messages: List[str] = Field(..., min_length=1, max_length=settings.BATCH_MAX_QUESTIONS)
+    concurrency: Optional[int] = Field(None, ge=1)
+
+
+class BatchChatItem(BaseModel):
+    """Answer to one question of a batch, or the reason it failed."""
+    index: int
+    response: Optional[str] = None
+    context_used: Optional[bool] = None
+    sources: Optional[List[str]] = None
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    """Batch chat response model, with results in request order."""
+    results: List[BatchChatItem]
+    succeeded: int
+    failed: int
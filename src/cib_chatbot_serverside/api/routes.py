@@ -1,34 +1,139 @@
 """API routes for the chat application."""
+import json
+import uuid
+from contextlib import aclosing
 from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 import time
 
-from .models import ChatRequest, ChatResponse
-from ..services import RAGService
+from .models import BatchChatRequest, BatchChatResponse, ChatRequest, ChatResponse, ClearHistoryRequest
+from ..config.prompts import prompt_manager
+from ..db.connection import get_pool
+from ..services import LLMOverloadedError, get_llm_scheduler, get_rag_service, get_warmup
+from ..services.semantic_cache import get_semantic_cache
+from ..utils.embedding_cache import get_embedding_cache
 from ..utils.logging import setup_logger
 
 logger = setup_logger("api_routes")
 
 router = APIRouter()
 
-# Initialize RAG service
-rag_service = RAGService()
-
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(req: ChatRequest):
     """Chat endpoint that processes user queries using RAG."""
-    result = rag_service.process_query(req.message)
-    return ChatResponse(**result)
+    # Shed load before spending an embedding and a search on a doomed request
+    get_llm_scheduler().check_admission()
+    session_id = req.session_id or uuid.uuid4().hex
+    result = await get_rag_service().process_query(req.message, session_id)
+    return ChatResponse(**result, session_id=session_id)
+
+
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(req: BatchChatRequest):
+    """Answer many independent questions in one request (evaluation runs, cache pre-warming).
+
+    Questions share batched embedding and a single retrieval query; a
+    failed question is reported in its own result without failing the rest.
+    """
+    results = await get_rag_service().process_batch(req.messages, req.concurrency)
+    failed = sum(1 for item in results if item.get("error"))
+    return BatchChatResponse(results=results, succeeded=len(results) - failed, failed=failed)
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest, request: Request):
+    """Chat endpoint that streams the answer as Server-Sent Events.
+
+    Emits ``token`` events while the model generates, then a ``done`` event
+    with ``sources``, ``context_used``, ``session_id`` and timing metrics
+    (the session is also in the ``X-Session-ID`` header). Responds 429 up
+    front when the LLM queue is already full; if the generation is rejected
+    later, an ``error`` event carries ``retry_after``.
+    """
+    get_llm_scheduler().check_admission()
+    session_id = req.session_id or uuid.uuid4().hex
+    
+    async def event_stream():
+        async with aclosing(get_rag_service().stream_query(req.message, session_id)) as events:
+            try:
+                async for event in events:
+                    if await request.is_disconnected():
+                        logger.info("Client disconnected, cancelling generation", extra={'stage': 'LLM_STREAM'})
+                        return
+                    event_type = event.pop("type")
+                    if event_type == "done":
+                        event["session_id"] = session_id
+                    yield _sse_event(event_type, event)
+            except LLMOverloadedError as e:
+                yield _sse_event("error", {"detail": str(e), "retry_after": e.retry_after})
+            except Exception as e:
+                logger.error(f"Streaming chat failed: {e}", exc_info=True)
+                yield _sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-ID": session_id},
+    )
 
 
 @router.post("/clear-history")
-async def clear_history():
-    """Clear the chat history."""
-    rag_service.clear_history()
-    return {"message": "Chat history cleared"}
+async def clear_history(req: ClearHistoryRequest):
+    """Clear the chat history of one session."""
+    await get_rag_service().clear_history(req.session_id)
+    return {"message": "Chat history cleared", "session_id": req.session_id}
 
 
 @router.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the startup warm-up has finished."""
+    status = get_warmup().status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@router.get("/pool-stats")
+async def pool_stats():
+    """Database connection pool statistics."""
+    return get_pool().stats()
+
+
+@router.get("/llm-stats")
+async def llm_stats():
+    """LLM admission control: active generations, queue depth and rejections."""
+    return get_llm_scheduler().stats()
+
+
+@router.get("/cache-stats")
+async def cache_stats():
+    """Cache hit/miss and request coalescing statistics."""
+    return {
+        "embedding": get_embedding_cache().stats(),
+        "semantic": get_semantic_cache().stats(),
+        "coalescing": get_rag_service().coalescing_stats(),
+        "sessions": get_rag_service().sessions.stats(),
+    }
+
+
+@router.get("/admin/config")
+async def config_status():
+    """Current prompt configuration snapshot and reload status."""
+    return {"config": prompt_manager.get().model_dump(), "status": prompt_manager.stats()}
+
+
+@router.post("/admin/reload-config")
+async def reload_config():
+    """Re-read prompt_config.json now instead of waiting for the mtime check."""
+    reloaded = prompt_manager.reload()
+    return {"reloaded": reloaded, "status": prompt_manager.stats()}
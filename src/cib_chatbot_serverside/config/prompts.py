@@ -1,7 +1,13 @@
 """Prompt configuration management."""
 import json
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Any, Callable, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from .settings import settings
 from ..utils.logging import setup_logger
 
 logger = setup_logger("config_manager")
@@ -13,16 +19,67 @@ DEFAULT_CONFIG = {
     "prompt_template": "Answer the question based on the following context:\n\n{context}\n\n---\n\nQuestion: {question}\n\nIf the answer is in the context, use it. If the context doesn't contain the answer, you may use your own knowledge to help answer the question.",
     "system_message": "You are a helpful assistant. Prioritize using the provided context to answer questions. If the context doesn't contain the answer, you can use your general knowledge to provide a helpful response.",
     "similarity_threshold": 0.2,
-    "top_k_results": 3
+    "top_k_results": 3,
+    "retrieval_mode": "vector",
+    "history_summary_prompt": "Update the running summary of a conversation between a user and an assistant.\n\nCurrent summary:\n{summary}\n\nNew messages:\n{conversation}\n\nWrite the updated summary in at most {max_tokens} tokens. Keep facts, names, numbers and open questions the user may refer back to. Reply with the summary only."
 }
 
 
+class PromptConfig(BaseModel):
+    """Validated, immutable snapshot of prompt_config.json."""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
+    prompt_template: str = DEFAULT_CONFIG["prompt_template"]
+    system_message: str = DEFAULT_CONFIG["system_message"]
+    # Unset in the file: the SIMILARITY_THRESHOLD / TOP_K_RESULTS env settings
+    similarity_threshold: float = Field(default_factory=lambda: settings.SIMILARITY_THRESHOLD, ge=0, le=1)
+    top_k_results: int = Field(default_factory=lambda: settings.TOP_K_RESULTS, ge=1)
+    reranking_enabled: bool = True
+    context_window_size: int = Field(settings.CONTEXT_TOKEN_BUDGET, ge=1)
+    retrieval_mode: Literal["vector", "hybrid"] = DEFAULT_CONFIG["retrieval_mode"]
+    hybrid_vector_weight: float = Field(1.0, ge=0)
+    hybrid_text_weight: float = Field(1.0, ge=0)
+    hybrid_rrf_k: int = Field(60, ge=1)
+    hybrid_candidates: Optional[int] = Field(None, ge=1)
+    history_summary_prompt: str = DEFAULT_CONFIG["history_summary_prompt"]
+    
+    @field_validator("prompt_template")
+    @classmethod
+    def _has_placeholders(cls, value: str) -> str:
+        for placeholder in ("{context}", "{question}"):
+            if placeholder not in value:
+                raise ValueError(f"prompt_template must contain {placeholder}")
+        return value
+    
+    @field_validator("history_summary_prompt")
+    @classmethod
+    def _has_summary_placeholders(cls, value: str) -> str:
+        for placeholder in ("{summary}", "{conversation}"):
+            if placeholder not in value:
+                raise ValueError(f"history_summary_prompt must contain {placeholder}")
+        return value
+
+
 class PromptManager:
-    """Manages application prompts from JSON file."""
+    """Manages application prompts from JSON file.
+
+    The file is parsed and validated once; ``get()`` returns the current
+    snapshot and only re-reads the file when its mtime changes (checked at
+    most every ``PROMPT_CONFIG_CHECK_INTERVAL`` seconds). A file that fails
+    to parse or validate is reported and the previous snapshot stays live.
+    """
     
-    def __init__(self, config_path: str = CONFIG_PATH):
+    def __init__(self, config_path: str = CONFIG_PATH, check_interval: Optional[float] = None):
         self.config_path = config_path
+        self.check_interval = settings.PROMPT_CONFIG_CHECK_INTERVAL if check_interval is None else check_interval
+        self._lock = threading.Lock()
+        self._config = PromptConfig()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._listeners: List[Callable[[PromptConfig], None]] = []
+        self._stats = {"reloads": 0, "failures": 0, "last_error": None, "loaded_at": None}
         self._ensure_config_exists()
+        self.reload()
     
     def _ensure_config_exists(self):
         """Create config file with defaults if it doesn't exist."""
@@ -31,19 +88,76 @@ class PromptManager:
             with open(self.config_path, "w", encoding="utf-8") as f:
                 json.dump(DEFAULT_CONFIG, f, indent=4, ensure_ascii=False)
     
-    def get(self) -> Dict[str, Any]:
-        """Get current configuration from JSON file."""
-        try:
-            with open(self.config_path, "r", encoding="utf-8") as f:
-                config = json.load(f)
-                logger.debug("Configuration loaded successfully", extra={'stage': 'CONFIG'})
-                return config
-        except FileNotFoundError:
-            logger.warning("Config file not found, using defaults")
-            return DEFAULT_CONFIG
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in config file: {e}")
-            return DEFAULT_CONFIG
+    def get(self) -> PromptConfig:
+        """Get the current configuration snapshot, reloading it if the file changed."""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.config_path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self.reload()
+        return self._config
+    
+    def reload(self) -> bool:
+        """Re-read and validate the file, swapping in the new snapshot on success.
+
+        Safe to call from a signal handler, an admin endpoint or ``get()``;
+        requests already holding the previous snapshot keep using it.
+        """
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(self.config_path).st_mtime_ns
+                with open(self.config_path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                config = PromptConfig.model_validate(raw)
+            except FileNotFoundError as e:
+                return self._reload_failed(None, f"Config file not found: {e}")
+            except json.JSONDecodeError as e:
+                return self._reload_failed(mtime, f"Invalid JSON in config file: {e}")
+            except ValidationError as e:
+                return self._reload_failed(mtime, f"Invalid prompt configuration: {e}")
+            
+            unknown = set(raw) - set(PromptConfig.model_fields)
+            if unknown:
+                logger.warning(f"Ignoring unknown prompt config keys: {sorted(unknown)}")
+            
+            changed = config != self._config
+            self._config = config
+            self._mtime = mtime
+            self._stats["reloads"] += 1
+            self._stats["last_error"] = None
+            self._stats["loaded_at"] = time.time()
+            logger.info("Configuration loaded successfully", extra={'stage': 'CONFIG'})
+            listeners = list(self._listeners) if changed else []
+        
+        for listener in listeners:
+            try:
+                listener(config)
+            except Exception as e:
+                logger.error(f"Config reload listener failed: {e}")
+        return True
+    
+    def _reload_failed(self, mtime: Optional[float], error: str) -> bool:
+        # Remember the broken file's mtime so it is not re-parsed on every request
+        self._mtime = mtime
+        self._stats["failures"] += 1
+        self._stats["last_error"] = error
+        logger.error(f"{error}; keeping the previous configuration", extra={'stage': 'CONFIG'})
+        return False
+    
+    def add_listener(self, callback: Callable[[PromptConfig], None]):
+        """Call ``callback(config)`` after every reload that changes the configuration."""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Reload counters and the state of the current snapshot."""
+        with self._lock:
+            return dict(self._stats, path=os.path.abspath(self.config_path))
 
 
 # Create a singleton instance
@@ -17,23 +17,104 @@ class Settings:
     DB_NAME: str = os.getenv("DB_NAME", "vectordb")
     DB_USER: str = os.getenv("DB_USER", "vectoruser")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "mypassword123")
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_HEALTH_CHECK_INTERVAL: float = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
     
     # Ollama Configuration
     OLLAMA_BASE_URL: str = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "mxbai-embed-large")
     LLM_MODEL: str = os.getenv("LLM_MODEL", "llama3.1:8b")
     LLM_TEMPERATURE: float = float(os.getenv("LLM_TEMPERATURE", "0"))
+    OLLAMA_KEEP_ALIVE: str = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # empty uses the Ollama server default
+    
+    # Startup Warm-up (pool connections and model preloading before /api/ready reports ready)
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+    WARMUP_TIMEOUT: float = float(os.getenv("WARMUP_TIMEOUT", "120"))
+    
+    # Embedding Cache (size 0 disables; empty path keeps it in memory only)
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+    EMBEDDING_CACHE_TTL: float = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "")
     
     # RAG Configuration
     SIMILARITY_THRESHOLD: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.2"))
     TOP_K_RESULTS: int = int(os.getenv("TOP_K_RESULTS", "3"))
+    MIN_SIMILARITY: float = float(os.getenv("MIN_SIMILARITY", "0.1"))
+    TEXT_SEARCH_CONFIG: str = os.getenv("TEXT_SEARCH_CONFIG", "english")
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2048"))
+    PROMPT_CONFIG_CHECK_INTERVAL: float = float(os.getenv("PROMPT_CONFIG_CHECK_INTERVAL", "1"))
+    
+    # Conversation History
+    HISTORY_TOKEN_BUDGET: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "1024"))
+    HISTORY_MIN_RECENT_TURNS: int = int(os.getenv("HISTORY_MIN_RECENT_TURNS", "2"))
+    HISTORY_SUMMARY_TOKENS: int = int(os.getenv("HISTORY_SUMMARY_TOKENS", "256"))
+    
+    # Chat Sessions (postgres shares conversations between workers; memory keeps them per process)
+    SESSION_STORE: str = os.getenv("SESSION_STORE", "postgres")  # postgres or memory
+    SESSION_CACHE_SIZE: int = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+    SESSION_IDLE_TTL: float = float(os.getenv("SESSION_IDLE_TTL", "86400"))
+    SESSION_EXPIRE_INTERVAL: float = float(os.getenv("SESSION_EXPIRE_INTERVAL", "600"))
+    
+    # Server (chatbot-server; reload only applies to a single worker)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "1"))
+    SERVER_RELOAD: bool = os.getenv("SERVER_RELOAD", "true").lower() in ("1", "true", "yes")
+    
+    # Vector Index
+    EMBEDDING_DIMENSIONS: int = int(os.getenv("EMBEDDING_DIMENSIONS", "1024"))
+    VECTOR_EF_SEARCH: int = int(os.getenv("VECTOR_EF_SEARCH", "40"))
+    VECTOR_PROBES: int = int(os.getenv("VECTOR_PROBES", "10"))
+    VECTOR_QUANTIZATION: str = os.getenv("VECTOR_QUANTIZATION", "none")  # none, halfvec or binary
+    VECTOR_RESCORE_CANDIDATES: int = int(os.getenv("VECTOR_RESCORE_CANDIDATES", "40"))
+    
+    # Local Vector Index (memory-mapped replica of document_chunks for "vector" retrieval; Postgres stays the fallback)
+    LOCAL_INDEX_ENABLED: bool = os.getenv("LOCAL_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+    LOCAL_INDEX_PATH: str = os.getenv("LOCAL_INDEX_PATH", "data/local_index")
+    LOCAL_INDEX_DTYPE: str = os.getenv("LOCAL_INDEX_DTYPE", "float32")  # float32 or float16
+    LOCAL_INDEX_CHECK_INTERVAL: float = float(os.getenv("LOCAL_INDEX_CHECK_INTERVAL", "1"))
+    
+    # Semantic Response Cache
+    SEMANTIC_CACHE_ENABLED: bool = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+    SEMANTIC_CACHE_MAX_DISTANCE: float = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.05"))
+    
+    # LLM Admission Control
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+    LLM_QUEUE_SIZE: int = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+    LLM_QUEUE_PER_CLIENT: int = int(os.getenv("LLM_QUEUE_PER_CLIENT", "8"))
+    LLM_QUEUE_TIMEOUT: float = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+    
+    # Batch Chat
+    BATCH_MAX_QUESTIONS: int = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+    BATCH_EMBED_SIZE: int = int(os.getenv("BATCH_EMBED_SIZE", "64"))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "2"))
+    
+    # Request Coalescing
+    REQUEST_COALESCING_ENABLED: bool = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() in ("1", "true", "yes")
     
     # Data Path
     DATA_PATH: str = os.getenv("DATA_PATH", "data/books")
     
+    # Ingestion
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+    INGEST_EMBED_WORKERS: int = int(os.getenv("INGEST_EMBED_WORKERS", "4"))
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+    # PDF pages parsed and split per load task; bounds a file's memory while it streams in
+    INGEST_PAGES_PER_WINDOW: int = int(os.getenv("INGEST_PAGES_PER_WINDOW", "16"))
+    # Reuse embeddings of text already embedded with EMBEDDING_MODEL (chunk_embeddings table)
+    INGEST_EMBEDDING_CACHE: bool = os.getenv("INGEST_EMBEDDING_CACHE", "true").lower() in ("1", "true", "yes")
+    SYNC_MANIFEST_PATH: str = os.getenv("SYNC_MANIFEST_PATH", "data/sync_manifest.json")
+    
     # Logging
     LOGS_DIR: str = os.getenv("LOGS_DIR", "logs")
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "DEBUG")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # json or text
+    LOG_BACKUP_DAYS: int = int(os.getenv("LOG_BACKUP_DAYS", "14"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    LOG_PAYLOAD_SAMPLE_RATE: float = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
     
     # CORS Configuration
     CORS_ORIGINS: list = os.getenv("CORS_ORIGINS", "*").split(",")
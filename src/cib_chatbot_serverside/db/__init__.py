@@ -1,5 +1,36 @@
 """Database package."""
-from .connection import get_db_connection
-from .operations import similarity_search_with_scores, save_to_pgvector
+from .connection import get_db_connection, get_pool, close_pool, ConnectionPool
+from .local_index import LocalVectorIndex, get_local_index
+from .operations import (
+    similarity_search_with_scores,
+    similarity_search_by_vector,
+    asimilarity_search_by_vector,
+    hybrid_search_by_vector,
+    ahybrid_search_by_vector,
+    batch_similarity_search_by_vector,
+    batch_hybrid_search_by_vector,
+    abatch_similarity_search_by_vector,
+    abatch_hybrid_search_by_vector,
+    save_to_pgvector,
+    reembed_chunks,
+)
 
-__all__ = ["get_db_connection", "similarity_search_with_scores", "save_to_pgvector"]
+__all__ = [
+    "get_db_connection",
+    "get_pool",
+    "close_pool",
+    "ConnectionPool",
+    "LocalVectorIndex",
+    "get_local_index",
+    "similarity_search_with_scores",
+    "similarity_search_by_vector",
+    "asimilarity_search_by_vector",
+    "hybrid_search_by_vector",
+    "ahybrid_search_by_vector",
+    "batch_similarity_search_by_vector",
+    "batch_hybrid_search_by_vector",
+    "abatch_similarity_search_by_vector",
+    "abatch_hybrid_search_by_vector",
+    "save_to_pgvector",
+    "reembed_chunks",
+]
@@ -0,0 +1,98 @@
+"""Content-addressed store of chunk embeddings (the chunk_embeddings table).
+
+Rows are keyed by embedding model and ``md5(content)``, so text that was
+embedded once (a disclaimer repeated across files, a copied file, a
+re-ingest) is never sent to Ollama again with the same model. The vector
+column has no fixed dimensions, so several models can share the table.
+"""
+import hashlib
+from typing import Dict, List, Sequence, Tuple
+
+import psycopg2.extras
+
+from .connection import get_pool
+from ..utils.logging import setup_logger
+
+logger = setup_logger("chunk_embeddings")
+
+_table_ready = False
+
+
+def content_hash(text: str) -> str:
+    """Key of a chunk's text; matches Postgres ``md5(content)``."""
+    return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+
+def ensure_chunk_embeddings_table():
+    """Create chunk_embeddings if needed; safe to run from several processes at once."""
+    global _table_ready
+    if _table_ready:
+        return
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('chunk_embeddings'))")
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                    model TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    embedding vector NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (model, content_hash)
+                )
+                """
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    _table_ready = True
+    logger.info("chunk_embeddings table is ready", extra={'stage': 'EMBED_STORE'})
+
+
+def fetch_chunk_embeddings(model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+    """Stored embeddings of ``model`` for the given content hashes (missing ones are left out)."""
+    if not hashes:
+        return {}
+    ensure_chunk_embeddings_table()
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT content_hash, embedding::text FROM chunk_embeddings "
+                "WHERE model = %s AND content_hash = ANY(%s)",
+                (model, list(hashes)),
+            )
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+    return {content_hash: [float(x) for x in embedding.strip("[]").split(",")] for content_hash, embedding in rows}
+
+
+def store_chunk_embeddings(model: str, rows: Sequence[Tuple[str, List[float]]]) -> int:
+    """Insert ``(content_hash, embedding)`` pairs; a hash stored concurrently is kept as is."""
+    if not rows:
+        return 0
+    ensure_chunk_embeddings_table()
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            psycopg2.extras.execute_values(
+                cur,
+                "INSERT INTO chunk_embeddings (model, content_hash, embedding) VALUES %s "
+                "ON CONFLICT (model, content_hash) DO NOTHING",
+                [(model, content_hash, embedding) for content_hash, embedding in rows],
+                template="(%s, %s, %s::vector)",
+                page_size=len(rows),
+            )
+            stored = cur.rowcount
+            conn.commit()
+            return stored
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
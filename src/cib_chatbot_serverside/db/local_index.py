@@ -0,0 +1,496 @@
+"""In-process, memory-mapped replica of document_chunks for local vector search."""
+import json
+import mmap
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .connection import get_pool
+from ..config.settings import settings
+from ..utils.logging import setup_logger
+from ..utils.metrics import STAGE_LATENCY
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): workers cannot share the files, so search stays on Postgres
+    fcntl = None
+
+logger = setup_logger("local_index")
+if fcntl is None and settings.LOCAL_INDEX_ENABLED:
+    logger.warning(
+        "LOCAL_INDEX_ENABLED is set but this platform has no flock; searching Postgres only",
+        extra={'stage': 'LOCAL_INDEX'},
+    )
+
+DTYPES = ("float32", "float16")
+MANIFEST = "manifest.json"
+# Per-row bookkeeping, stored next to the vectors in the same order
+ROW_DTYPE = np.dtype([("id", "<i8"), ("offset", "<i8"), ("length", "<i4"), ("hash", "S32")])
+# Detects relabels and renames, which rewrite metadata in place, and
+# `manage-index reembed`, which rewrites the embedding
+ROW_HASH_SQL = "md5(metadata::text || coalesce(file_name, '') || embedding::text)"
+# Rows fetched per round trip when catching up
+FETCH_BATCH = 500
+# Rows scored per step, so float16 matrices are converted a slice at a time
+SCORE_BLOCK_ROWS = 16384
+
+# (id, content, metadata, file_name, row hash, embedding as pgvector text or numbers)
+Record = Tuple[int, str, Dict[str, Any], Optional[str], str, Any]
+
+
+def _parse_vector(embedding) -> np.ndarray:
+    if isinstance(embedding, str):
+        return np.array(embedding.strip("[]").split(","), dtype=np.float32)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Snapshot:
+    """One consistent view of the index files; reloads swap in a new one whole."""
+
+    def __init__(self, manifest: Dict[str, Any], vectors: np.ndarray, rows: np.ndarray, chunks: Optional[mmap.mmap]):
+        self.generation = manifest["generation"]
+        self.chunks_bytes = manifest["chunks_bytes"]
+        self.vectors = vectors
+        self.rows = rows
+        self.chunks = chunks
+        self.deleted = np.asarray(manifest["deleted"], dtype=np.int64)
+        self.live = len(rows) - len(self.deleted)
+
+    def document(self, index: int) -> Document:
+        offset, length = int(self.rows[index]["offset"]), int(self.rows[index]["length"])
+        entry = json.loads(self.chunks[offset:offset + length])
+        metadata = entry["metadata"] or {}
+        metadata["file_name"] = entry["file_name"]
+        return Document(page_content=entry["content"], metadata=metadata)
+
+
+class LocalVectorIndex:
+    """Exact cosine search over a memory-mapped copy of the chunk embeddings.
+
+    The files under ``path`` hold one generation of the replica: a
+    contiguous, L2-normalized ``(rows, dims)`` matrix, a row table (chunk
+    id, payload offset, metadata hash) and the chunk payloads as JSON
+    lines. All three are append-only; ``manifest.json`` says how many rows
+    are valid and which were deleted, and is replaced atomically, so every
+    worker process maps the same pages and only ever sees complete rows.
+
+    ``refresh`` re-reads the rows a change notification named, appends
+    their new versions and tombstones the old ones; without ids (on
+    startup, after a listener reconnect) it diffs every chunk id and hash
+    against Postgres instead. Once tombstones pass ``compact_ratio`` it
+    writes a fresh generation. Only one process refreshes at a time
+    (``flock``); the others pick the new manifest up on their next search.
+    Postgres stays the source of truth: callers fall back to it whenever
+    ``search`` returns None.
+
+    Only plain vector retrieval reads the replica; hybrid retrieval always
+    runs its vector leg in Postgres, fused with the full-text leg there.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dims: int = 1024,
+        dtype: str = "float32",
+        check_interval: float = 1.0,
+        compact_ratio: float = 0.25,
+    ):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown local index dtype {dtype!r}, expected one of {DTYPES}")
+        self.path = path
+        self.dims = dims
+        self.dtype = np.dtype(dtype)
+        self.check_interval = check_interval
+        self.compact_ratio = compact_ratio
+        self._snapshot: Optional[_Snapshot] = None
+        self._manifest_key = None
+        self._checked = 0.0
+        self._reload_lock = threading.Lock()
+
+        self.searches = 0
+        self.reloads = 0
+        self.refreshed_at: Optional[float] = None
+
+    def _file(self, name: str, generation: Optional[int] = None) -> str:
+        return os.path.join(self.path, name if generation is None else f"{name}-{generation}")
+
+    # Reading
+
+    def reload(self) -> bool:
+        """Map the files again if another process (or ``refresh``) changed the manifest."""
+        with self._reload_lock:
+            try:
+                stat = os.stat(self._file(MANIFEST))
+            except FileNotFoundError:
+                return False
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if key == self._manifest_key:
+                return False
+
+            with open(self._file(MANIFEST)) as f:
+                manifest = json.load(f)
+            if manifest["dims"] != self.dims or manifest["dtype"] != self.dtype.name:
+                logger.warning(
+                    "Local index at %s holds %s x %d vectors, expected %s x %d; rebuild it",
+                    self.path, manifest["dtype"], manifest["dims"], self.dtype.name, self.dims,
+                    extra={'stage': 'LOCAL_INDEX'},
+                )
+                self._snapshot = None
+                self._manifest_key = key
+                return False
+
+            self._snapshot = self._open(manifest)
+            self._manifest_key = key
+            self.reloads += 1
+            logger.info(
+                "Loaded local index generation %d: %d rows, %d live",
+                self._snapshot.generation, len(self._snapshot.rows), self._snapshot.live,
+                extra={'stage': 'LOCAL_INDEX'},
+            )
+            return True
+
+    def _open(self, manifest: Dict[str, Any]) -> _Snapshot:
+        rows, generation = manifest["rows"], manifest["generation"]
+        if rows == 0:
+            return _Snapshot(manifest, np.empty((0, self.dims), self.dtype), np.empty(0, ROW_DTYPE), None)
+        # Old snapshots are left to the garbage collector: a search may still be reading them
+        vectors = np.memmap(self._file("vectors", generation), dtype=self.dtype, mode="r", shape=(rows, self.dims))
+        table = np.memmap(self._file("rows", generation), dtype=ROW_DTYPE, mode="r", shape=(rows,))
+        with open(self._file("chunks", generation), "rb") as f:
+            chunks = mmap.mmap(f.fileno(), manifest["chunks_bytes"], access=mmap.ACCESS_READ)
+        return _Snapshot(manifest, vectors, table, chunks)
+
+    def snapshot(self) -> Optional[_Snapshot]:
+        """The current view, checking the manifest at most every ``check_interval`` seconds."""
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._checked = now
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Local index reload failed: {e}", extra={'stage': 'LOCAL_INDEX'})
+        return self._snapshot
+
+    @property
+    def ready(self) -> bool:
+        return self.snapshot() is not None
+
+    def search(
+        self, query_embedding: Sequence[float], n: int, min_similarity: Optional[float] = None
+    ) -> Optional[List[Tuple[Document, float]]]:
+        """Top ``n`` chunks by cosine similarity, or None if there is no usable snapshot."""
+        results = self.search_many([query_embedding], n, min_similarity)
+        return None if results is None else results[0]
+
+    def search_many(
+        self, query_embeddings: Sequence[Sequence[float]], n: int, min_similarity: Optional[float] = None
+    ) -> Optional[List[List[Tuple[Document, float]]]]:
+        """Score every query against the whole matrix in one matrix product.
+
+        Same result shape and low-score cut-off as
+        ``similarity_search_by_vector``'s SQL, which scores ``1 - cosine
+        distance``.
+        """
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return None
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dims:
+            logger.warning(
+                "Query embedding has %d dimensions, local index has %d",
+                queries.shape[-1], self.dims, extra={'stage': 'LOCAL_INDEX'},
+            )
+            return None
+        min_similarity = settings.MIN_SIMILARITY if min_similarity is None else min_similarity
+
+        start_time = time.perf_counter()
+        scores = self._scores(snapshot.vectors, _normalize(queries))
+        if len(snapshot.deleted):
+            scores[:, snapshot.deleted] = -np.inf
+        k = min(n, snapshot.live)
+        results = []
+        for row_scores in scores:
+            if k <= 0:
+                results.append([])
+                continue
+            top = np.argpartition(-row_scores, k - 1)[:k]
+            top = top[np.argsort(-row_scores[top], kind="stable")]
+            results.append([
+                (snapshot.document(int(i)), float(row_scores[i])) for i in top if row_scores[i] > min_similarity
+            ])
+        search_time = time.perf_counter() - start_time
+        STAGE_LATENCY.observe(search_time, stage="local_index")
+        self.searches += len(queries)
+        logger.debug("Local index searched %d rows in %.4f seconds", len(snapshot.rows), search_time)
+        return results
+
+    @staticmethod
+    def _scores(vectors: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        scores = np.empty((len(queries), len(vectors)), dtype=np.float32)
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    # Writing
+
+    def refresh(self, rebuild: bool = False, row_ids: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+        """Catch the files up with document_chunks (or rewrite them with ``rebuild``).
+
+        ``row_ids`` limits the refresh to the rows a change notification
+        named; without it every row's hash is compared.
+        """
+        if fcntl is None:
+            raise RuntimeError("The local index needs flock, which this platform does not have")
+        os.makedirs(self.path, exist_ok=True)
+        with open(self._file(".lock"), "a") as lock:
+            # Wait for whichever worker is refreshing: a refresh already under
+            # way may have started before the changes this one is for. Rows
+            # it applied are then found current and not rewritten.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.reload()
+                snapshot = self._snapshot
+                if rebuild or snapshot is None:
+                    stats = self._rebuild()
+                elif row_ids is not None:
+                    stats = self._update_rows(snapshot, row_ids)
+                else:
+                    stats = self._update(snapshot)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self.reload()
+        self.refreshed_at = time.time()
+        return stats
+
+    def build(self, records: Iterable[Record]) -> Dict[str, Any]:
+        """Write ``records`` as a new generation and switch to it."""
+        os.makedirs(self.path, exist_ok=True)
+        previous = self._read_manifest()
+        generation = previous["generation"] + 1 if previous else 1
+        for name in ("vectors", "rows", "chunks"):
+            open(self._file(name, generation), "wb").close()
+
+        manifest = {
+            "generation": generation, "rows": 0, "dims": self.dims, "dtype": self.dtype.name,
+            "chunks_bytes": 0, "deleted": [],
+        }
+        self._append(manifest, records)
+        self._write_manifest(manifest)
+        if previous:
+            for name in ("vectors", "rows", "chunks"):
+                try:
+                    os.remove(self._file(name, previous["generation"]))
+                except FileNotFoundError:
+                    pass
+        self.reload()
+        return {"generation": generation, "rows": manifest["rows"], "added": manifest["rows"], "removed": 0}
+
+    def _rebuild(self) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        stats = self.build(self._fetch_all())
+        logger.info(
+            "Built local index generation %d with %d rows in %.2f seconds",
+            stats["generation"], stats["rows"], time.perf_counter() - start_time, extra={'stage': 'LOCAL_INDEX'},
+        )
+        return stats
+
+    def _update(self, snapshot: _Snapshot) -> Dict[str, Any]:
+        """Diff every row against Postgres, for changes no notification named."""
+        remote = self._fetch_hashes()
+        current, stale = self._compare(snapshot, np.arange(len(snapshot.rows)), remote)
+        missing = sorted(set(remote) - current)
+        return self._patch(snapshot, stale, len(missing), self._fetch_rows(missing))
+
+    def _update_rows(self, snapshot: _Snapshot, row_ids: Sequence[int]) -> Dict[str, Any]:
+        """Re-read just ``row_ids``; ids that are gone from Postgres were deleted."""
+        ids = np.unique(np.asarray(row_ids, dtype=np.int64))
+        records = {record[0]: record for record in self._fetch_rows(ids.tolist())}
+        indices = np.flatnonzero(np.isin(snapshot.rows["id"], ids))
+        current, stale = self._compare(snapshot, indices, {row_id: record[4] for row_id, record in records.items()})
+        missing = [record for row_id, record in sorted(records.items()) if row_id not in current]
+        return self._patch(snapshot, stale, len(missing), missing)
+
+    @staticmethod
+    def _compare(snapshot: _Snapshot, indices: np.ndarray, remote: Dict[int, str]) -> Tuple[set, List[int]]:
+        """Split the live rows at ``indices`` into ids still current in ``remote`` and stale row indices."""
+        deleted = set(snapshot.deleted.tolist())
+        current, stale = set(), []
+        rows = snapshot.rows[indices]
+        for index, row_id, row_hash in zip(indices.tolist(), rows["id"].tolist(), rows["hash"].tolist()):
+            if index in deleted:
+                continue
+            if remote.get(row_id) == row_hash.decode():
+                current.add(row_id)
+            else:
+                stale.append(index)
+        return current, stale
+
+    def _patch(self, snapshot: _Snapshot, stale: List[int], added: int, records: Iterable[Record]) -> Dict[str, Any]:
+        """Tombstone ``stale`` and append ``records``, or compact once there are too many tombstones."""
+        if not stale and not added:
+            return {"generation": snapshot.generation, "rows": len(snapshot.rows), "added": 0, "removed": 0}
+
+        deleted = set(snapshot.deleted.tolist())
+        if len(deleted) + len(stale) > self.compact_ratio * (len(snapshot.rows) + added):
+            return self._rebuild()
+
+        manifest = self._read_manifest()
+        manifest["deleted"] = sorted(deleted.union(stale))
+        self._append(manifest, records)
+        self._write_manifest(manifest)
+        logger.info(
+            "Local index: %d rows added, %d removed", added, len(stale), extra={'stage': 'LOCAL_INDEX'}
+        )
+        return {"generation": manifest["generation"], "rows": manifest["rows"], "added": added, "removed": len(stale)}
+
+    def _append(self, manifest: Dict[str, Any], records: Iterable[Record]):
+        """Append rows to the manifest's generation; the caller then publishes the manifest."""
+        generation = manifest["generation"]
+        with open(self._file("vectors", generation), "ab") as vector_file, \
+                open(self._file("rows", generation), "ab") as row_file, \
+                open(self._file("chunks", generation), "ab") as chunk_file:
+            # Drop whatever a crashed refresh wrote past the last published manifest
+            vector_file.truncate(manifest["rows"] * self.dims * self.dtype.itemsize)
+            row_file.truncate(manifest["rows"] * ROW_DTYPE.itemsize)
+            chunk_file.truncate(manifest["chunks_bytes"])
+
+            offset = manifest["chunks_bytes"]
+            for batch in _batched(records, FETCH_BATCH):
+                vectors = _normalize(np.stack([_parse_vector(record[5]) for record in batch]))
+                if vectors.shape[1] != self.dims:
+                    raise ValueError(f"Stored embeddings have {vectors.shape[1]} dimensions, expected {self.dims}")
+                table = np.zeros(len(batch), dtype=ROW_DTYPE)
+                payloads = []
+                for i, (row_id, content, metadata, file_name, row_hash, _) in enumerate(batch):
+                    payload = json.dumps(
+                        {"content": content, "metadata": metadata, "file_name": file_name}, ensure_ascii=False
+                    ).encode() + b"\n"
+                    table[i] = (row_id, offset, len(payload), row_hash.encode())
+                    payloads.append(payload)
+                    offset += len(payload)
+                vector_file.write(vectors.astype(self.dtype).tobytes())
+                row_file.write(table.tobytes())
+                chunk_file.write(b"".join(payloads))
+                manifest["rows"] += len(batch)
+
+            for f in (vector_file, row_file, chunk_file):
+                f.flush()
+                os.fsync(f.fileno())
+        manifest["chunks_bytes"] = offset
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._file(MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        manifest["updated_at"] = time.time()
+        temp_path = self._file(MANIFEST + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._file(MANIFEST))
+
+    # Postgres side
+
+    def _fetch_hashes(self) -> Dict[int, str]:
+        with get_pool().connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(f"SELECT id, {ROW_HASH_SQL} FROM document_chunks")
+                return dict(cur.fetchall())
+            finally:
+                cur.close()
+
+    def _fetch_rows(self, ids: List[int]) -> Iterator[Record]:
+        for batch in _batched(ids, FETCH_BATCH):
+            with get_pool().connection() as conn:
+                cur = conn.cursor()
+                try:
+                    cur.execute(
+                        f"""
+                        SELECT id, content, metadata, file_name, {ROW_HASH_SQL}, embedding::text
+                        FROM document_chunks WHERE id = ANY(%s) ORDER BY id
+                        """,
+                        (batch,)
+                    )
+                    rows = cur.fetchall()
+                finally:
+                    cur.close()
+            yield from rows
+
+    def _fetch_all(self) -> Iterator[Record]:
+        with get_pool().connection() as conn:
+            # Server-side cursor: the table is streamed, not loaded at once
+            cur = conn.cursor(name="local_index_snapshot")
+            cur.itersize = FETCH_BATCH
+            try:
+                cur.execute(
+                    f"SELECT id, content, metadata, file_name, {ROW_HASH_SQL}, embedding::text "
+                    "FROM document_chunks ORDER BY id"
+                )
+                yield from cur
+            finally:
+                cur.close()
+                conn.rollback()
+
+    def stats(self) -> Dict[str, Any]:
+        """Rows, memory footprint and usage of the current snapshot."""
+        snapshot = self._snapshot
+        return {
+            "ready": snapshot is not None,
+            "path": self.path,
+            "dtype": self.dtype.name,
+            "generation": snapshot.generation if snapshot else None,
+            "rows": len(snapshot.rows) if snapshot else 0,
+            "live": snapshot.live if snapshot else 0,
+            "deleted": len(snapshot.deleted) if snapshot else 0,
+            "vector_bytes": int(snapshot.vectors.nbytes) if snapshot else 0,
+            "searches": self.searches,
+            "reloads": self.reloads,
+            "refreshed_at": self.refreshed_at,
+        }
+
+
+_index: Optional[LocalVectorIndex] = None
+
+
+def get_local_index() -> Optional[LocalVectorIndex]:
+    """Get the process-wide local index, or None when LOCAL_INDEX_ENABLED is off or flock is missing."""
+    global _index
+    if not settings.LOCAL_INDEX_ENABLED or fcntl is None:
+        return None
+    if _index is None:
+        _index = LocalVectorIndex(
+            settings.LOCAL_INDEX_PATH,
+            dims=settings.EMBEDDING_DIMENSIONS,
+            dtype=settings.LOCAL_INDEX_DTYPE,
+            check_interval=settings.LOCAL_INDEX_CHECK_INTERVAL,
+        )
+    return _index
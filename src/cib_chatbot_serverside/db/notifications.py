@@ -0,0 +1,118 @@
+"""Cross-process change notifications via LISTEN/NOTIFY."""
+import select
+import threading
+from typing import Callable, List, Optional, Sequence
+
+from psycopg2 import extensions
+
+from .connection import get_db_connection
+from ..utils.logging import setup_logger
+
+logger = setup_logger("db_notifications")
+
+CHUNKS_CHANGED_CHANNEL = "document_chunks_changed"
+# Ids per payload: even 20-digit ids fit in pg_notify's 8000-byte limit
+NOTIFY_IDS_PER_PAYLOAD = 350
+
+
+def notify_chunks_changed(cur, row_ids: Sequence[int]):
+    """Queue notifications naming the inserted, updated or deleted rows.
+
+    Postgres delivers them when the transaction commits. Ids are sent as
+    comma-separated lists, split over several notifications when there are
+    many, so listeners can catch up on just those rows.
+    """
+    row_ids = list(row_ids)
+    if not row_ids:
+        return
+    payloads = [
+        ",".join(map(str, row_ids[start:start + NOTIFY_IDS_PER_PAYLOAD]))
+        for start in range(0, len(row_ids), NOTIFY_IDS_PER_PAYLOAD)
+    ]
+    cur.execute("SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload", (CHUNKS_CHANGED_CHANNEL, payloads))
+
+
+def changed_row_ids(payloads: Optional[List[str]]) -> Optional[List[int]]:
+    """The row ids named by ``notify_chunks_changed`` payloads, or None if they are unknown."""
+    if payloads is None:
+        return None
+    try:
+        return [int(row_id) for payload in payloads for row_id in payload.split(",")]
+    except ValueError:
+        logger.warning(f"Unexpected {CHUNKS_CHANGED_CHANNEL} payload, treating every row as changed")
+        return None
+
+
+class NotificationListener(threading.Thread):
+    """Background thread that passes the payloads received on ``channel`` to ``callback``.
+
+    Lost connections are retried. Notifications sent while disconnected are
+    not replayed, so ``callback`` is called with ``None`` after a reconnect
+    to mean "anything may have changed".
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        callback: Callable[[Optional[List[str]]], None],
+        poll_interval: float = 5.0,
+        retry_delay: float = 5.0,
+    ):
+        super().__init__(name=f"{channel}-listener", daemon=True)
+        self.channel = channel
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        first_connect = True
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = get_db_connection()
+                conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {self.channel}")
+                if not first_connect:
+                    self.callback(None)
+                first_connect = False
+                logger.info(f"Listening for {self.channel} notifications")
+
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        payloads = [notify.payload for notify in conn.notifies]
+                        conn.notifies.clear()
+                        self.callback(payloads)
+            except Exception as e:
+                logger.error(f"{self.channel} listener error: {e}")
+                self._stop_event.wait(self.retry_delay)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+class ChunkChangeListener(NotificationListener):
+    """Background thread that calls ``callback`` whenever ingestion changes chunks.
+
+    The ingestion script runs in a separate process, so the API learns about
+    new or changed chunks through Postgres notifications. ``callback``
+    receives the changed row ids, or ``None`` after a reconnect, when any
+    row may have changed.
+    """
+
+    def __init__(
+        self,
+        callback: Callable[[Optional[List[int]]], None],
+        poll_interval: float = 5.0,
+        retry_delay: float = 5.0,
+    ):
+        super().__init__(
+            CHUNKS_CHANGED_CHANNEL, lambda payloads: callback(changed_row_ids(payloads)), poll_interval, retry_delay
+        )
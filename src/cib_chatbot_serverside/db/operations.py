@@ -1,82 +1,607 @@
 """Database operations for vector search and document management."""
+import asyncio
 import time
 import os
+import psycopg2.errors
 import psycopg2.extras
-from typing import List, Tuple
+from typing import List, Tuple, Dict, Any, Optional
 from langchain_core.documents import Document
-from langchain_ollama import OllamaEmbeddings
 
-from .connection import get_db_connection
+from .chunk_embeddings import content_hash, fetch_chunk_embeddings, store_chunk_embeddings
+from .connection import get_pool
+from .local_index import get_local_index
+from .notifications import notify_chunks_changed
+from .schema import QUANTIZED_COLUMNS, QUANTIZED_OPS, quantize_sql
 from ..config.settings import settings
+from ..utils.embedding_cache import get_embedding_cache
 from ..utils.logging import setup_logger
+from ..utils.metrics import STAGE_LATENCY
 
 logger = setup_logger("db_operations")
 
-# Initialize embeddings model
-embedding_function = OllamaEmbeddings(model=settings.EMBEDDING_MODEL)
+_embedding_function = None
+
+
+def get_embedding_function():
+    """The embeddings client for ingestion and sync search, built on first use."""
+    global _embedding_function
+    if _embedding_function is None:
+        # Deferred: importing langchain_ollama and building the client slows every import of this module
+        from langchain_ollama import OllamaEmbeddings
+        
+        _embedding_function = OllamaEmbeddings(model=settings.EMBEDDING_MODEL, base_url=settings.OLLAMA_BASE_URL)
+    return _embedding_function
 
 
 def similarity_search_with_scores(query: str, k: int = 3) -> List[Tuple[Document, float]]:
     """Search for similar documents using cosine similarity with query expansion."""
-    logger.info(f"Starting similarity search", extra={'stage': 'SIMILARITY_SEARCH'})
-    logger.debug(f"Query: {query}")
+    logger.info("Starting similarity search", extra={'stage': 'SIMILARITY_SEARCH'})
+    logger.debug("Query: %s", query, extra={'payload': True})
     
     # Add query expansion for better results
     expanded_query = query
     
     logger.info("Generating query embedding...", extra={'stage': 'EMBEDDING_GENERATION'})
-    embed_start_time = time.time()
-    query_embedding = embedding_function.embed_query(expanded_query)
-    embed_time = time.time() - embed_start_time
+    embed_start_time = time.perf_counter()
+    cache = get_embedding_cache()
+    query_embedding = cache.get(expanded_query, settings.EMBEDDING_MODEL)
+    if query_embedding is None:
+        query_embedding = get_embedding_function().embed_query(expanded_query)
+        cache.put(expanded_query, settings.EMBEDDING_MODEL, query_embedding)
+    embed_time = time.perf_counter() - embed_start_time
+    STAGE_LATENCY.observe(embed_time, stage="embed")
     
-    logger.debug(f"Embedding generated in {embed_time:.4f} seconds")
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
+    logger.debug("Embedding generated in %.4f seconds", embed_time)
     
+    return similarity_search_by_vector(query_embedding, query, k)
+
+
+def _local_search(query_embeddings: List[List[float]], n: int) -> Optional[List[List[Tuple[Document, float]]]]:
+    """Serve a vector search from the in-process replica, or None to go to Postgres."""
+    index = get_local_index()
+    if index is None:
+        return None
     try:
-        logger.info("Executing vector similarity query...", extra={'stage': 'DATABASE_QUERY'})
-        query_start_time = time.time()
-        
-        # Fetch more results for potential reranking
-        fetch_k = k * 2
-        
-        cur.execute(
-            """
-            SELECT content, metadata, file_name, 1 - (embedding <=> %s::vector) AS similarity
+        return index.search_many(query_embeddings, n)
+    except Exception as e:
+        logger.error(f"Local index search failed, falling back to Postgres: {e}", extra={'stage': 'LOCAL_INDEX'})
+        return None
+
+
+def _nearest_sql(columns: str, query_vector: str, limit: str, mode: str) -> str:
+    """Subquery selecting ``columns`` and ``distance`` of the ``limit`` rows nearest ``query_vector``.
+
+    Without quantization it is the index-friendly ``ORDER BY embedding <=> q
+    LIMIT n``. With a quantized ``mode``, the compact column's HNSW index
+    picks ``%(rescore)s`` candidates and only that shortlist has its
+    full-precision embedding read and rescored. Column names are left
+    unqualified so they resolve to document_chunks inside a LATERAL join
+    on ``q.embedding`` too.
+    """
+    distance = f"embedding <=> {query_vector}"
+    if mode not in QUANTIZED_COLUMNS:
+        return f"""
+            SELECT {columns}, {distance} AS distance
+            FROM document_chunks
+            ORDER BY {distance}
+            LIMIT {limit}
+        """
+    _, operator = QUANTIZED_OPS[mode]
+    return f"""
+        SELECT {columns}, {distance} AS distance
+        FROM (
+            SELECT {columns}, embedding
             FROM document_chunks
-            WHERE 1 - (embedding <=> %s::vector) > 0.1  -- Filter very low scores early
-            ORDER BY embedding <=> %s::vector
-            LIMIT %s
-            """,
-            (query_embedding, query_embedding, query_embedding, fetch_k)
+            ORDER BY {QUANTIZED_COLUMNS[mode]} {operator} {quantize_sql(mode, query_vector)}
+            LIMIT %(rescore)s
+        ) AS candidates
+        ORDER BY distance
+        LIMIT {limit}
+    """
+
+
+def _rescore_candidates(mode: str, n: int) -> int:
+    """Rows read from the quantized index for ``n`` results (``n`` without quantization)."""
+    return max(settings.VECTOR_RESCORE_CANDIDATES, n) if mode in QUANTIZED_COLUMNS else n
+
+
+def _vector_search_sql(mode: str) -> str:
+    """The single-query vector search, two-staged when a quantized column is in use."""
+    return f"""
+        SET LOCAL hnsw.ef_search = %(ef_search)s;
+        SET LOCAL ivfflat.probes = %(probes)s;
+        SELECT content, metadata, file_name, 1 - distance AS similarity
+        FROM ({_nearest_sql("content, metadata, file_name", "%(embedding)s::vector", "%(limit)s", mode)}) AS nearest
+        WHERE distance < %(max_distance)s  -- Filter very low scores
+        """
+
+
+# Whether document_chunks has the content_tsv column hybrid search needs,
+# as (checked at, present); a missing column is looked for again after a while
+_text_search_column: Optional[Tuple[float, bool]] = None
+TEXT_SEARCH_RECHECK_SECONDS = 60.0
+
+
+def _text_search_available() -> bool:
+    """True if hybrid search can run; checked once, not by failing every query."""
+    known = _text_search_column
+    if known is not None and (known[1] or time.monotonic() - known[0] < TEXT_SEARCH_RECHECK_SECONDS):
+        return known[1]
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'document_chunks' AND column_name = 'content_tsv')"
+            )
+            present = bool(cur.fetchone()[0])
+        finally:
+            cur.close()
+    _set_text_search_available(present)
+    return present
+
+
+def _set_text_search_available(present: bool):
+    global _text_search_column
+    if not present:
+        logger.warning(
+            "document_chunks has no content_tsv column (run `manage-index init`); using vector search",
+            extra={'stage': 'DATABASE_QUERY'}
         )
+    _text_search_column = (time.monotonic(), present)
+
+
+def _vector_literal(embedding: List[float]) -> str:
+    """Format an embedding as a pgvector text literal ('[x,y,...]')."""
+    return "[" + ",".join(repr(float(x)) for x in embedding) + "]"
+
+
+def similarity_search_by_vector(
+    query_embedding: List[float],
+    query: str,
+    k: int = 3,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    rerank: bool = True,
+) -> List[Tuple[Document, float]]:
+    """Search for similar documents given a precomputed query embedding.
+
+    The inner query is a plain ``ORDER BY embedding <=> q LIMIT n`` so an
+    HNSW/IVFFlat index can serve it; the low-score cut-off is applied to
+    that small result set instead of to every row. ``ef_search`` and
+    ``probes`` default to the ``VECTOR_*`` settings and only apply to this
+    query's transaction. With VECTOR_QUANTIZATION set, the index scan runs
+    on the compact column and only ``VECTOR_RESCORE_CANDIDATES`` rows are
+    rescored at full precision. With LOCAL_INDEX_ENABLED, a loaded local
+    replica answers instead and Postgres is only the fallback.
+    """
+    ef_search = ef_search or settings.VECTOR_EF_SEARCH
+    probes = probes or settings.VECTOR_PROBES
+    # Fetch more results for potential reranking
+    fetch_k = k * 2 if rerank else k
+    
+    local = _local_search([query_embedding], fetch_k)
+    if local is not None:
+        results = local[0]
+        if rerank and len(results) > k:
+            with STAGE_LATENCY.time(stage="rerank"):
+                results = _rerank_results(results, query, k)
+        return results
+    
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
         
-        query_time = time.time() - query_start_time
-        logger.debug(f"Database query executed in {query_time:.4f} seconds")
-        
-        results = []
-        rows = cur.fetchall()
-        logger.info(f"Retrieved {len(rows)} results from database", extra={'stage': 'RESULTS_PROCESSING'})
+        try:
+            logger.info("Executing vector similarity query...", extra={'stage': 'DATABASE_QUERY'})
+            query_start_time = time.perf_counter()
+            
+            mode = settings.VECTOR_QUANTIZATION
+            rescore = _rescore_candidates(mode, fetch_k)
+            
+            # One round trip: index tuning for this transaction, then the search
+            cur.execute(
+                _vector_search_sql(mode),
+                {
+                    "ef_search": max(int(ef_search), rescore),
+                    "rescore": rescore,
+                    "probes": int(probes),
+                    "embedding": _vector_literal(query_embedding),
+                    "limit": fetch_k,
+                    "max_distance": 1 - settings.MIN_SIMILARITY,
+                }
+            )
+            
+            rows = cur.fetchall()
+            query_time = time.perf_counter() - query_start_time
+            STAGE_LATENCY.observe(query_time, stage="db")
+            logger.debug("Database query executed in %.4f seconds", query_time)
+            
+            results = []
+            logger.info("Retrieved %d results from database", len(rows), extra={'stage': 'RESULTS_PROCESSING'})
+            
+            for idx, (content, metadata, file_name, similarity) in enumerate(rows):
+                doc_metadata = metadata or {}
+                doc_metadata["file_name"] = file_name
+                doc = Document(page_content=content, metadata=doc_metadata)
+                results.append((doc, similarity))
+            
+            # Optional: Rerank based on keyword overlap
+            if rerank and len(results) > k:
+                with STAGE_LATENCY.time(stage="rerank"):
+                    results = _rerank_results(results, query, k)
+            
+            if results:
+                logger.info("Similarity search completed. Best score: %.4f", results[0][1])
+            else:
+                logger.info("No results found")
+            return results
+        except Exception as e:
+            logger.error(f"Database query error: {str(e)}", exc_info=True)
+            raise
+        finally:
+            cur.close()
+
+
+def hybrid_search_by_vector(
+    query_embedding: List[float],
+    query: str,
+    k: int = 3,
+    vector_weight: float = 1.0,
+    text_weight: float = 1.0,
+    rrf_k: int = 60,
+    candidates: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    rerank: bool = True,
+) -> List[Tuple[Document, float]]:
+    """Search with vector and full-text candidates fused by reciprocal rank.
+
+    Both candidate lists (``ORDER BY embedding <=> q`` on the ANN index and
+    ``content_tsv @@ query`` on the GIN index) are fetched and fused in one
+    statement: each chunk scores ``weight / (rrf_k + rank)`` per list it
+    appears in. The returned score is still the cosine similarity, so
+    thresholds keep their meaning; the fused score is in
+    ``metadata["rrf_score"]``. Falls back to vector search (reranked as
+    ``rerank`` says) if the schema has no ``content_tsv`` column yet. The
+    vector leg always runs in Postgres: LOCAL_INDEX_ENABLED only serves
+    plain vector retrieval.
+    """
+    ef_search = ef_search or settings.VECTOR_EF_SEARCH
+    probes = probes or settings.VECTOR_PROBES
+    candidates = max(candidates or k * 4, k)
+    if not _text_search_available():
+        return similarity_search_by_vector(query_embedding, query, k, ef_search=ef_search, probes=probes, rerank=rerank)
+    
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
         
-        for idx, (content, metadata, file_name, similarity) in enumerate(rows):
-            doc_metadata = metadata or {}
-            doc_metadata["file_name"] = file_name
-            doc = Document(page_content=content, metadata=doc_metadata)
-            results.append((doc, similarity))
+        try:
+            logger.info("Executing hybrid search query...", extra={'stage': 'DATABASE_QUERY'})
+            query_start_time = time.perf_counter()
+            
+            mode = settings.VECTOR_QUANTIZATION
+            rescore = _rescore_candidates(mode, candidates)
+            cur.execute(
+                f"""
+                SET LOCAL hnsw.ef_search = %(ef_search)s;
+                SET LOCAL ivfflat.probes = %(probes)s;
+                WITH vector_hits AS (
+                    SELECT id, distance, row_number() OVER (ORDER BY distance) AS rank
+                    FROM ({_nearest_sql("id", "%(embedding)s::vector", "%(candidates)s", mode)}) AS nearest
+                ),
+                text_hits AS (
+                    SELECT id, row_number() OVER (ORDER BY text_rank DESC) AS rank
+                    FROM (
+                        SELECT id, ts_rank_cd(content_tsv, tsq) AS text_rank
+                        FROM document_chunks, websearch_to_tsquery(%(ts_config)s::regconfig, %(query)s) AS tsq
+                        WHERE content_tsv @@ tsq
+                        ORDER BY text_rank DESC
+                        LIMIT %(candidates)s
+                    ) AS matches
+                ),
+                fused AS (
+                    SELECT COALESCE(v.id, t.id) AS id,
+                           COALESCE(%(vector_weight)s / (%(rrf_k)s + v.rank), 0)
+                           + COALESCE(%(text_weight)s / (%(rrf_k)s + t.rank), 0) AS rrf_score
+                    FROM vector_hits v
+                    FULL OUTER JOIN text_hits t ON t.id = v.id
+                    -- Keyword matches are kept even when their vector is far off
+                    WHERE t.id IS NOT NULL OR v.distance < %(max_distance)s
+                    ORDER BY rrf_score DESC
+                    LIMIT %(limit)s
+                )
+                SELECT d.content, d.metadata, d.file_name,
+                       1 - (d.embedding <=> %(embedding)s::vector) AS similarity, f.rrf_score
+                FROM fused f
+                JOIN document_chunks d ON d.id = f.id
+                ORDER BY f.rrf_score DESC
+                """,
+                {
+                    "ef_search": max(int(ef_search), rescore),
+                    "probes": int(probes),
+                    "rescore": rescore,
+                    "embedding": _vector_literal(query_embedding),
+                    "query": query,
+                    "ts_config": settings.TEXT_SEARCH_CONFIG,
+                    "candidates": candidates,
+                    "vector_weight": float(vector_weight),
+                    "text_weight": float(text_weight),
+                    "rrf_k": int(rrf_k),
+                    "max_distance": 1 - settings.MIN_SIMILARITY,
+                    "limit": k,
+                }
+            )
+            
+            rows = cur.fetchall()
+            query_time = time.perf_counter() - query_start_time
+            STAGE_LATENCY.observe(query_time, stage="db")
+            logger.debug("Database query executed in %.4f seconds", query_time)
+            
+            results = []
+            logger.info("Retrieved %d results from database", len(rows), extra={'stage': 'RESULTS_PROCESSING'})
+            
+            for content, metadata, file_name, similarity, rrf_score in rows:
+                doc_metadata = metadata or {}
+                doc_metadata["file_name"] = file_name
+                doc_metadata["rrf_score"] = float(rrf_score)
+                doc = Document(page_content=content, metadata=doc_metadata)
+                results.append((doc, similarity))
+            
+            if rows:
+                logger.info("Hybrid search completed. Best fused score: %.4f", rows[0][4])
+            else:
+                logger.info("No results found")
+            return results
+        except psycopg2.errors.UndefinedColumn:
+            # Dropped since it was checked
+            _set_text_search_available(False)
+        except Exception as e:
+            logger.error(f"Database query error: {str(e)}", exc_info=True)
+            raise
+        finally:
+            cur.close()
+    
+    return similarity_search_by_vector(query_embedding, query, k, ef_search=ef_search, probes=probes, rerank=rerank)
+
+
+def _group_batch_rows(rows, count: int, with_rrf: bool = False) -> List[List[Tuple[Document, float]]]:
+    """Split ``(ord, content, metadata, file_name, similarity[, rrf])`` rows per query."""
+    grouped: List[List[Tuple[Document, float]]] = [[] for _ in range(count)]
+    for row in rows:
+        ordinal, content, metadata, file_name, similarity = row[:5]
+        doc_metadata = metadata or {}
+        doc_metadata["file_name"] = file_name
+        if with_rrf:
+            doc_metadata["rrf_score"] = float(row[5])
+        grouped[ordinal - 1].append((Document(page_content=content, metadata=doc_metadata), similarity))
+    return grouped
+
+
+def batch_similarity_search_by_vector(
+    query_embeddings: List[List[float]],
+    queries: List[str],
+    k: int = 3,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    rerank: bool = True,
+) -> List[List[Tuple[Document, float]]]:
+    """Vector search for many queries in one statement and one round trip.
+
+    The queries are unnested and each one runs the same index-friendly
+    ``ORDER BY embedding <=> q LIMIT n`` through a LATERAL join (or one
+    matrix product against the local replica, when loaded). Returns one
+    result list per query, in input order.
+    """
+    if not query_embeddings:
+        return []
+    ef_search = ef_search or settings.VECTOR_EF_SEARCH
+    probes = probes or settings.VECTOR_PROBES
+    fetch_k = k * 2 if rerank else k
+    
+    grouped = _local_search(query_embeddings, fetch_k)
+    if grouped is None:
+        grouped = _batch_vector_query(query_embeddings, fetch_k, ef_search, probes)
+    if rerank:
+        with STAGE_LATENCY.time(stage="rerank"):
+            grouped = [
+                _rerank_results(results, query, k) if len(results) > k else results
+                for results, query in zip(grouped, queries)
+            ]
+    return grouped
+
+
+def _batch_vector_query(
+    query_embeddings: List[List[float]], fetch_k: int, ef_search: int, probes: int
+) -> List[List[Tuple[Document, float]]]:
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
         
-        # Optional: Rerank based on keyword overlap
-        if len(results) > k:
-            results = _rerank_results(results, query, k)
+        try:
+            logger.info(
+                "Executing batch vector query for %d queries...", len(query_embeddings),
+                extra={'stage': 'DATABASE_QUERY'}
+            )
+            query_start_time = time.perf_counter()
+            
+            mode = settings.VECTOR_QUANTIZATION
+            rescore = _rescore_candidates(mode, fetch_k)
+            nearest = _nearest_sql("content, metadata, file_name", "q.embedding", "%(limit)s", mode)
+            cur.execute(
+                f"""
+                SET LOCAL hnsw.ef_search = %(ef_search)s;
+                SET LOCAL ivfflat.probes = %(probes)s;
+                SELECT q.ord, nearest.content, nearest.metadata, nearest.file_name, 1 - nearest.distance
+                FROM unnest(%(embeddings)s::vector[]) WITH ORDINALITY AS q(embedding, ord)
+                CROSS JOIN LATERAL ({nearest}) AS nearest
+                WHERE nearest.distance < %(max_distance)s
+                ORDER BY q.ord, nearest.distance
+                """,
+                {
+                    "ef_search": max(int(ef_search), rescore),
+                    "probes": int(probes),
+                    "rescore": rescore,
+                    "embeddings": [_vector_literal(embedding) for embedding in query_embeddings],
+                    "limit": fetch_k,
+                    "max_distance": 1 - settings.MIN_SIMILARITY,
+                }
+            )
+            
+            rows = cur.fetchall()
+            query_time = time.perf_counter() - query_start_time
+            STAGE_LATENCY.observe(query_time, stage="db_batch")
+            logger.info(
+                "Retrieved %d results for %d queries in %.4f seconds", len(rows), len(query_embeddings), query_time,
+                extra={'stage': 'RESULTS_PROCESSING'}
+            )
+        except Exception as e:
+            logger.error(f"Database query error: {str(e)}", exc_info=True)
+            raise
+        finally:
+            cur.close()
+    
+    return _group_batch_rows(rows, len(query_embeddings))
+
+
+def batch_hybrid_search_by_vector(
+    query_embeddings: List[List[float]],
+    queries: List[str],
+    k: int = 3,
+    vector_weight: float = 1.0,
+    text_weight: float = 1.0,
+    rrf_k: int = 60,
+    candidates: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    rerank: bool = True,
+) -> List[List[Tuple[Document, float]]]:
+    """Hybrid search (see hybrid_search_by_vector) for many queries in one statement.
+
+    Each ``(embedding, query)`` pair runs the vector/full-text RRF fusion in
+    a LATERAL subquery. Returns one result list per query, in input order;
+    falls back to batch vector search without a ``content_tsv`` column.
+    """
+    if not query_embeddings:
+        return []
+    ef_search = ef_search or settings.VECTOR_EF_SEARCH
+    probes = probes or settings.VECTOR_PROBES
+    candidates = max(candidates or k * 4, k)
+    if not _text_search_available():
+        return batch_similarity_search_by_vector(
+            query_embeddings, queries, k, ef_search=ef_search, probes=probes, rerank=rerank
+        )
+    
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
         
-        logger.info(f"Similarity search completed. Best score: {results[0][1]:.4f}" if results else "No results found")
-        return results
-    except Exception as e:
-        logger.error(f"Database query error: {str(e)}", exc_info=True)
-        raise
-    finally:
-        cur.close()
-        conn.close()
+        try:
+            logger.info(
+                "Executing batch hybrid query for %d queries...", len(query_embeddings),
+                extra={'stage': 'DATABASE_QUERY'}
+            )
+            query_start_time = time.perf_counter()
+            
+            mode = settings.VECTOR_QUANTIZATION
+            rescore = _rescore_candidates(mode, candidates)
+            cur.execute(
+                f"""
+                SET LOCAL hnsw.ef_search = %(ef_search)s;
+                SET LOCAL ivfflat.probes = %(probes)s;
+                SELECT q.ord, d.content, d.metadata, d.file_name,
+                       1 - (d.embedding <=> q.embedding) AS similarity, fused.rrf_score
+                FROM unnest(%(embeddings)s::vector[], %(queries)s::text[]) WITH ORDINALITY AS q(embedding, query, ord)
+                CROSS JOIN LATERAL (
+                    SELECT COALESCE(v.id, t.id) AS id,
+                           COALESCE(%(vector_weight)s / (%(rrf_k)s + v.rank), 0)
+                           + COALESCE(%(text_weight)s / (%(rrf_k)s + t.rank), 0) AS rrf_score
+                    FROM (
+                        SELECT id, distance, row_number() OVER (ORDER BY distance) AS rank
+                        FROM ({_nearest_sql("id", "q.embedding", "%(candidates)s", mode)}) AS nearest
+                    ) AS v
+                    FULL OUTER JOIN (
+                        SELECT id, row_number() OVER (ORDER BY text_rank DESC) AS rank
+                        FROM (
+                            SELECT c.id, ts_rank_cd(c.content_tsv, tsq) AS text_rank
+                            FROM document_chunks c, websearch_to_tsquery(%(ts_config)s::regconfig, q.query) AS tsq
+                            WHERE c.content_tsv @@ tsq
+                            ORDER BY text_rank DESC
+                            LIMIT %(candidates)s
+                        ) AS matches
+                    ) AS t ON t.id = v.id
+                    -- Keyword matches are kept even when their vector is far off
+                    WHERE t.id IS NOT NULL OR v.distance < %(max_distance)s
+                    ORDER BY rrf_score DESC
+                    LIMIT %(limit)s
+                ) AS fused
+                JOIN document_chunks d ON d.id = fused.id
+                ORDER BY q.ord, fused.rrf_score DESC
+                """,
+                {
+                    "ef_search": max(int(ef_search), rescore),
+                    "probes": int(probes),
+                    "rescore": rescore,
+                    "embeddings": [_vector_literal(embedding) for embedding in query_embeddings],
+                    "queries": list(queries),
+                    "ts_config": settings.TEXT_SEARCH_CONFIG,
+                    "candidates": candidates,
+                    "vector_weight": float(vector_weight),
+                    "text_weight": float(text_weight),
+                    "rrf_k": int(rrf_k),
+                    "max_distance": 1 - settings.MIN_SIMILARITY,
+                    "limit": k,
+                }
+            )
+            
+            rows = cur.fetchall()
+            query_time = time.perf_counter() - query_start_time
+            STAGE_LATENCY.observe(query_time, stage="db_batch")
+            logger.info(
+                "Retrieved %d results for %d queries in %.4f seconds", len(rows), len(query_embeddings), query_time,
+                extra={'stage': 'RESULTS_PROCESSING'}
+            )
+            return _group_batch_rows(rows, len(query_embeddings), with_rrf=True)
+        except psycopg2.errors.UndefinedColumn:
+            _set_text_search_available(False)
+        except Exception as e:
+            logger.error(f"Database query error: {str(e)}", exc_info=True)
+            raise
+        finally:
+            cur.close()
+    
+    return batch_similarity_search_by_vector(
+        query_embeddings, queries, k, ef_search=ef_search, probes=probes, rerank=rerank
+    )
+
+
+async def asimilarity_search_by_vector(
+    query_embedding: List[float], query: str, k: int = 3, rerank: bool = True
+) -> List[Tuple[Document, float]]:
+    """Async variant of similarity_search_by_vector.
+
+    psycopg2 is blocking, so the query runs in a worker thread to keep the
+    event loop free for other requests.
+    """
+    return await asyncio.to_thread(similarity_search_by_vector, query_embedding, query, k, rerank=rerank)
+
+
+async def ahybrid_search_by_vector(
+    query_embedding: List[float], query: str, k: int = 3, **options
+) -> List[Tuple[Document, float]]:
+    """Async variant of hybrid_search_by_vector, run in a worker thread."""
+    return await asyncio.to_thread(hybrid_search_by_vector, query_embedding, query, k, **options)
+
+
+async def abatch_similarity_search_by_vector(
+    query_embeddings: List[List[float]], queries: List[str], k: int = 3, **options
+) -> List[List[Tuple[Document, float]]]:
+    """Async variant of batch_similarity_search_by_vector, run in a worker thread."""
+    return await asyncio.to_thread(batch_similarity_search_by_vector, query_embeddings, queries, k, **options)
+
+
+async def abatch_hybrid_search_by_vector(
+    query_embeddings: List[List[float]], queries: List[str], k: int = 3, **options
+) -> List[List[Tuple[Document, float]]]:
+    """Async variant of batch_hybrid_search_by_vector, run in a worker thread."""
+    return await asyncio.to_thread(batch_hybrid_search_by_vector, query_embeddings, queries, k, **options)
 
 
 def _rerank_results(results: List[Tuple[Document, float]], query: str, k: int) -> List[Tuple[Document, float]]:
@@ -95,50 +620,323 @@ def _rerank_results(results: List[Tuple[Document, float]], query: str, k: int) -
     return [(doc, sim) for doc, sim, _ in scored_results[:k]]
 
 
-def save_to_pgvector(chunks: List[Document]):
-    """Save document chunks to PostgreSQL with pgvector."""
+def filter_new_chunks(chunks: List[Document]) -> List[Document]:
+    """Drop chunks whose IDs already exist, using a single set-based query."""
+    if not chunks:
+        return []
+    
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            chunk_ids = [chunk.metadata["id"] for chunk in chunks]
+            cur.execute(
+                "SELECT metadata->>'id' FROM document_chunks WHERE metadata->>'id' = ANY(%s)",
+                (chunk_ids,)
+            )
+            existing = {row[0] for row in cur.fetchall()}
+        finally:
+            cur.close()
+    
+    new_chunks = []
+    for chunk in chunks:
+        chunk_id = chunk.metadata["id"]
+        if chunk_id in existing:
+            continue
+        existing.add(chunk_id)
+        new_chunks.append(chunk)
+    return new_chunks
+
+
+def embed_chunks(chunks: List[Document]) -> List[List[float]]:
+    """Embed a batch of chunks in one Ollama call."""
+    return get_embedding_function().embed_documents([chunk.page_content for chunk in chunks])
+
+
+def embed_chunks_cached(chunks: List[Document]) -> Tuple[List[List[float]], int]:
+    """Embed a batch of chunks, reusing the stored embedding of any text seen before.
+
+    Returns the embeddings and how many chunks needed no Ollama call. Each
+    distinct text missing from chunk_embeddings for the configured model is
+    embedded once and stored. If the store is unreachable the whole batch is
+    embedded, as without the store.
+    """
+    if not settings.INGEST_EMBEDDING_CACHE or not chunks:
+        return embed_chunks(chunks), 0
+    
+    model = settings.EMBEDDING_MODEL
+    hashes = [content_hash(chunk.page_content) for chunk in chunks]
+    try:
+        embeddings = fetch_chunk_embeddings(model, hashes)
+    except Exception as e:
+        logger.warning(f"Embedding store lookup failed, embedding the batch: {e}", extra={'stage': 'INGEST'})
+        return embed_chunks(chunks), 0
+    
+    missing: Dict[str, Document] = {}
+    for key, chunk in zip(hashes, chunks):
+        if key not in embeddings:
+            missing.setdefault(key, chunk)
+    if missing:
+        fresh = list(zip(missing, embed_chunks(list(missing.values()))))
+        try:
+            store_chunk_embeddings(model, fresh)
+        except Exception as e:
+            logger.warning(f"Storing {len(fresh)} embeddings failed: {e}", extra={'stage': 'INGEST'})
+        embeddings.update(fresh)
+    return [embeddings[key] for key in hashes], len(chunks) - len(missing)
+
+
+def write_chunks(chunks: List[Document], embeddings: List[List[float]]) -> int:
+    """Insert embedded chunks with one multi-row INSERT and commit."""
+    if not chunks:
+        return 0
+    
+    rows = [
+        (
+            chunk.page_content,
+            embedding,
+            psycopg2.extras.Json(chunk.metadata),
+            # Extract only the filename from the source path
+            os.path.basename(chunk.metadata.get("source", "unknown")),
+        )
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+    mode = settings.VECTOR_QUANTIZATION
+    if mode in QUANTIZED_COLUMNS:
+        # Fill the quantized column from the same parameter in SQL
+        sql = (
+            f"INSERT INTO document_chunks (content, embedding, metadata, file_name, {QUANTIZED_COLUMNS[mode]}) "
+            f"SELECT content, embedding::vector, metadata::jsonb, file_name, {quantize_sql(mode, 'embedding::vector')} "
+            "FROM (VALUES %s) AS v(content, embedding, metadata, file_name)"
+        )
+    else:
+        sql = "INSERT INTO document_chunks (content, embedding, metadata, file_name) VALUES %s"
+    
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            inserted = psycopg2.extras.execute_values(cur, sql + " RETURNING id", rows, page_size=len(rows), fetch=True)
+            # Lets API processes drop cached answers built on the old corpus
+            notify_chunks_changed(cur, [row_id for row_id, in inserted])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return len(rows)
+
+
+def save_to_pgvector(chunks: List[Document], batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """Save document chunks to PostgreSQL with pgvector.
+
+    Existing chunk IDs are found with one set-based query, new chunks are
+    embedded with ``embed_documents`` and written with multi-row INSERTs,
+    one committed transaction per batch. A failed run leaves every earlier
+    batch committed, so re-running it resumes where it stopped.
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    stats = {
+        "total": len(chunks), "skipped": 0, "added": 0, "cache_hits": 0,
+        "elapsed": 0.0, "chunks_per_second": 0.0,
+    }
     if len(chunks) == 0:
         print("No chunks to add")
-        return
+        return stats
     
     print(f"Adding chunks: {len(chunks)}")
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
+    start_time = time.time()
     
     try:
-        for chunk in chunks:
-            chunk_id = chunk.metadata["id"]
-            # Extract only the filename from the source path
-            file_name = os.path.basename(chunk.metadata.get("source", "unknown"))
-            
-            # Check if chunk already exists
+        new_chunks = filter_new_chunks(chunks)
+        stats["skipped"] = len(chunks) - len(new_chunks)
+        if stats["skipped"]:
+            print(f"Skipping {stats['skipped']} existing chunks")
+        
+        for offset in range(0, len(new_chunks), batch_size):
+            batch = new_chunks[offset:offset + batch_size]
+            embeddings, hits = embed_chunks_cached(batch)
+            stats["cache_hits"] += hits
+            stats["added"] += write_chunks(batch, embeddings)
+            print(f"Committed {stats['added']}/{len(new_chunks)} new chunks")
+    except Exception as e:
+        print(f"Error adding chunks after {stats['added']} committed: {e}")
+        raise
+    
+    stats["elapsed"] = time.time() - start_time
+    if stats["elapsed"] > 0:
+        stats["chunks_per_second"] = stats["added"] / stats["elapsed"]
+    print(
+        f"Chunks added successfully: {stats['added']} added, {stats['skipped']} skipped, "
+        f"{stats['cache_hits']} embeddings reused "
+        f"in {stats['elapsed']:.2f}s ({stats['chunks_per_second']:.1f} chunks/sec)"
+    )
+    return stats
+
+
+def reembed_chunks(batch_size: Optional[int] = None, after_id: int = 0) -> Dict[str, Any]:
+    """Re-embed every stored chunk with the configured model, one committed batch at a time.
+
+    The migration after changing ``EMBEDDING_MODEL`` (to one with the same
+    dimensions). Embeddings go through chunk_embeddings, so text repeated
+    across chunks is embedded once and re-running an interrupted migration
+    only re-reads what it already embedded; ``after_id`` skips rows already
+    rewritten. Searches keep working on the mix of models until it ends.
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    stats = {"rows": 0, "cache_hits": 0, "last_id": after_id}
+    mode = settings.VECTOR_QUANTIZATION
+    assignments = "embedding = v.embedding::vector"
+    if mode in QUANTIZED_COLUMNS:
+        assignments += f", {QUANTIZED_COLUMNS[mode]} = {quantize_sql(mode, 'v.embedding::vector')}"
+    
+    while True:
+        with get_pool().connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    "SELECT id, content FROM document_chunks WHERE id > %s ORDER BY id LIMIT %s",
+                    (stats["last_id"], batch_size)
+                )
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+        if not rows:
+            break
+        
+        embeddings, hits = embed_chunks_cached([Document(page_content=content) for _, content in rows])
+        if len(embeddings[0]) != settings.EMBEDDING_DIMENSIONS:
+            raise ValueError(
+                f"{settings.EMBEDDING_MODEL} returns {len(embeddings[0])} dimensions but document_chunks "
+                f"holds {settings.EMBEDDING_DIMENSIONS}; re-create the table and re-ingest instead"
+            )
+        with get_pool().connection() as conn:
+            cur = conn.cursor()
+            try:
+                psycopg2.extras.execute_values(
+                    cur,
+                    f"UPDATE document_chunks AS d SET {assignments} "
+                    "FROM (VALUES %s) AS v(row_id, embedding) WHERE d.id = v.row_id",
+                    [(row_id, embedding) for (row_id, _), embedding in zip(rows, embeddings)],
+                    page_size=len(rows),
+                )
+                notify_chunks_changed(cur, [row_id for row_id, _ in rows])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+        
+        stats["rows"] += len(rows)
+        stats["cache_hits"] += hits
+        stats["last_id"] = rows[-1][0]
+        logger.info(
+            f"Re-embedded {stats['rows']} chunks with {settings.EMBEDDING_MODEL} "
+            f"({stats['cache_hits']} reused), up to id {stats['last_id']}",
+            extra={'stage': 'INGEST'}
+        )
+    return stats
+
+
+def fetch_file_chunk_rows(source: str) -> List[Tuple[int, str, str]]:
+    """Return ``(row_id, chunk_id, md5(content))`` for every stored chunk of a source file."""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
             cur.execute(
-                "SELECT 1 FROM document_chunks WHERE metadata->>'id' = %s",
-                (chunk_id,)
+                "SELECT id, metadata->>'id', md5(content) FROM document_chunks WHERE metadata->>'source' = %s",
+                (source,)
             )
-            if cur.fetchone():
-                print(f"Skipping existing chunk: {chunk_id}")
-                continue
-            
-            # Generate embedding
-            embedding = embedding_function.embed_query(chunk.page_content)
-            
-            # Insert into document_chunks table
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+
+def apply_chunk_changes(
+    relabel: Optional[List[Tuple[int, Dict[str, Any]]]] = None,
+    delete_rows: Optional[List[int]] = None,
+) -> int:
+    """Re-key unchanged chunks and delete orphans in one transaction.
+
+    ``relabel`` maps a stored row (by primary key) to the chunk's new
+    metadata, so text that only moved within a file keeps its embedding.
+    Rows are addressed by primary key rather than chunk ID because, while a
+    file is streamed in, a new chunk can briefly share its ID with the
+    stored row it replaces.
+    """
+    if not relabel and not delete_rows:
+        return 0
+    
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            changed = 0
+            if delete_rows:
+                cur.execute("DELETE FROM document_chunks WHERE id = ANY(%s)", (delete_rows,))
+                changed += cur.rowcount
+            if relabel:
+                psycopg2.extras.execute_values(
+                    cur,
+                    """
+                    UPDATE document_chunks AS d SET metadata = v.metadata::jsonb
+                    FROM (VALUES %s) AS v(row_id, metadata)
+                    WHERE d.id = v.row_id
+                    """,
+                    [(row_id, psycopg2.extras.Json(metadata)) for row_id, metadata in relabel],
+                    page_size=len(relabel),
+                )
+                changed += cur.rowcount
+            notify_chunks_changed(cur, list(delete_rows or []) + [row_id for row_id, _ in relabel or []])
+            conn.commit()
+            return changed
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+def delete_file_chunks(source: str) -> int:
+    """Delete every chunk of a source file."""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM document_chunks WHERE metadata->>'source' = %s RETURNING id", (source,))
+            deleted = [row_id for row_id, in cur.fetchall()]
+            notify_chunks_changed(cur, deleted)
+            conn.commit()
+            return len(deleted)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+def rename_file_chunks(old_source: str, new_source: str) -> int:
+    """Point the chunks of a moved file at its new path without re-embedding."""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
             cur.execute(
                 """
-                INSERT INTO document_chunks (content, embedding, metadata, file_name)
-                VALUES (%s, %s, %s, %s)
+                UPDATE document_chunks SET
+                    metadata = jsonb_set(
+                        jsonb_set(metadata, '{source}', to_jsonb(%(new)s::text)),
+                        '{id}', to_jsonb(%(new)s::text || substr(metadata->>'id', length(%(old)s) + 1))
+                    ),
+                    file_name = %(file_name)s
+                WHERE metadata->>'source' = %(old)s
+                RETURNING id
                 """,
-                (chunk.page_content, embedding, psycopg2.extras.Json(chunk.metadata), file_name)
+                {"old": old_source, "new": new_source, "file_name": os.path.basename(new_source)}
             )
-        
-        conn.commit()
-        print("Chunks added successfully")
-    except Exception as e:
-        conn.rollback()
-        print(f"Error adding chunks: {e}")
-        raise
-    finally:
-        cur.close()
-        conn.close()
+            renamed = [row_id for row_id, in cur.fetchall()]
+            notify_chunks_changed(cur, renamed)
+            conn.commit()
+            return len(renamed)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
@@ -0,0 +1,228 @@
+"""Schema and vector index management for document_chunks."""
+from typing import Dict, Any, Optional
+
+from .chunk_embeddings import ensure_chunk_embeddings_table
+from .connection import get_pool
+from ..config.settings import settings
+from ..utils.logging import setup_logger
+
+logger = setup_logger("db_schema")
+
+VECTOR_INDEX_NAME = "document_chunks_embedding_idx"
+TEXT_INDEX_NAME = "document_chunks_content_tsv_idx"
+INDEX_TYPES = ("hnsw", "ivfflat")
+# Compact copies of the embedding for two-stage search: column and HNSW
+# operator class per mode (halfvec and bit indexes need pgvector >= 0.7)
+QUANTIZED_COLUMNS = {"halfvec": "embedding_half", "binary": "embedding_bit"}
+QUANTIZED_OPS = {"halfvec": ("halfvec_cosine_ops", "<=>"), "binary": ("bit_hamming_ops", "<~>")}
+QUANTIZATIONS = ("none",) + tuple(QUANTIZED_COLUMNS)
+
+
+def quantized_type(mode: str) -> str:
+    """SQL type of the quantized column for ``mode``."""
+    dims = int(settings.EMBEDDING_DIMENSIONS)
+    return f"halfvec({dims})" if mode == "halfvec" else f"bit({dims})"
+
+
+def quantize_sql(mode: str, vector_sql: str) -> str:
+    """SQL expression turning the full-precision ``vector_sql`` into the quantized type."""
+    if mode == "halfvec":
+        return f"({vector_sql})::{quantized_type(mode)}"
+    return f"binary_quantize({vector_sql})::{quantized_type(mode)}"
+
+
+def _check_quantization(mode: str):
+    if mode not in QUANTIZED_COLUMNS:
+        raise ValueError(f"Unknown quantization {mode!r}, expected one of {tuple(QUANTIZED_COLUMNS)}")
+
+
+def _execute(statements, autocommit: bool = False):
+    with get_pool().connection() as conn:
+        previous = conn.autocommit
+        conn.autocommit = autocommit
+        cur = conn.cursor()
+        try:
+            for sql, params in statements:
+                logger.info(f"Executing: {sql.strip().splitlines()[0]}", extra={'stage': 'SCHEMA'})
+                cur.execute(sql, params)
+            if not autocommit:
+                conn.commit()
+        except Exception:
+            if not autocommit:
+                conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.autocommit = previous
+
+
+def ensure_schema():
+    """Create the pgvector extension, document_chunks and its lookup indexes.
+
+    ``content_tsv`` is a generated column, so existing rows are backfilled
+    by the ALTER and new rows need nothing from the ingestion code. The
+    chunk_embeddings store is created too (ingestion also creates it on
+    first use).
+    """
+    ts_config = settings.TEXT_SEARCH_CONFIG.replace("'", "")
+    _execute([
+        ("CREATE EXTENSION IF NOT EXISTS vector", None),
+        (
+            f"""
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                id BIGSERIAL PRIMARY KEY,
+                content TEXT NOT NULL,
+                embedding vector({settings.EMBEDDING_DIMENSIONS}) NOT NULL,
+                metadata JSONB NOT NULL DEFAULT '{{}}'::jsonb,
+                file_name TEXT
+            )
+            """,
+            None,
+        ),
+        # Chunk ID and source lookups used by ingestion
+        ("CREATE INDEX IF NOT EXISTS document_chunks_chunk_id_idx ON document_chunks ((metadata->>'id'))", None),
+        ("CREATE INDEX IF NOT EXISTS document_chunks_source_idx ON document_chunks ((metadata->>'source'))", None),
+        # Full-text side of hybrid search
+        (
+            "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('{ts_config}'::regconfig, content)) STORED",
+            None,
+        ),
+        (f"CREATE INDEX IF NOT EXISTS {TEXT_INDEX_NAME} ON document_chunks USING gin (content_tsv)", None),
+    ])
+    ensure_chunk_embeddings_table()
+
+
+def create_vector_index(
+    index_type: str = "hnsw",
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: Optional[int] = None,
+    concurrently: bool = True,
+):
+    """(Re)build the ANN index on document_chunks.embedding for cosine distance.
+
+    For IVFFlat, ``lists`` defaults to rows/1000 (sqrt(rows) above one
+    million rows), following the pgvector guidance.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+
+    if index_type == "hnsw":
+        options = f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+    else:
+        if lists is None:
+            rows = index_status()["rows"]
+            lists = int(rows / 1000) if rows <= 1_000_000 else int(rows ** 0.5)
+        options = f"WITH (lists = {max(int(lists), 1)})"
+
+    keyword = "CONCURRENTLY " if concurrently else ""
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+    _execute([
+        (f"DROP INDEX {keyword}IF EXISTS {VECTOR_INDEX_NAME}", None),
+        (
+            f"CREATE INDEX {keyword}{VECTOR_INDEX_NAME} ON document_chunks "
+            f"USING {index_type} (embedding vector_cosine_ops) {options}",
+            None,
+        ),
+    ], autocommit=concurrently)
+
+
+def drop_vector_index():
+    """Drop the ANN index, falling back to exact scans."""
+    _execute([(f"DROP INDEX IF EXISTS {VECTOR_INDEX_NAME}", None)])
+
+
+def add_quantized_column(mode: str):
+    """Add the nullable quantized embedding column for ``mode``."""
+    _check_quantization(mode)
+    _execute([(
+        f"ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS {QUANTIZED_COLUMNS[mode]} {quantized_type(mode)}",
+        None,
+    )])
+
+
+def backfill_quantized(mode: str, batch_size: int = 1000) -> int:
+    """Fill the quantized column of existing rows, one committed batch at a time.
+
+    Small batches keep row locks short, so ingestion and searches carry on
+    during the migration; an interrupted run simply resumes.
+    """
+    _check_quantization(mode)
+    column = QUANTIZED_COLUMNS[mode]
+    total = 0
+    while True:
+        with get_pool().connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    f"""
+                    UPDATE document_chunks SET {column} = {quantize_sql(mode, "embedding")}
+                    WHERE id IN (SELECT id FROM document_chunks WHERE {column} IS NULL LIMIT %s)
+                    """,
+                    (batch_size,)
+                )
+                updated = cur.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+        total += updated
+        if updated < batch_size:
+            break
+        logger.info(f"Backfilled {total} {column} values", extra={'stage': 'SCHEMA'})
+    return total
+
+
+def create_quantized_index(mode: str, m: int = 16, ef_construction: int = 64, concurrently: bool = True):
+    """(Re)build the HNSW index on the quantized column used for candidate fetches."""
+    _check_quantization(mode)
+    column = QUANTIZED_COLUMNS[mode]
+    ops, _ = QUANTIZED_OPS[mode]
+    keyword = "CONCURRENTLY " if concurrently else ""
+    _execute([
+        (f"DROP INDEX {keyword}IF EXISTS document_chunks_{column}_idx", None),
+        (
+            f"CREATE INDEX {keyword}document_chunks_{column}_idx ON document_chunks "
+            f"USING hnsw ({column} {ops}) WITH (m = {int(m)}, ef_construction = {int(ef_construction)})",
+            None,
+        ),
+    ], autocommit=concurrently)
+
+
+def index_status() -> Dict[str, Any]:
+    """Report row count and the vector index definition and size."""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT count(*) FROM document_chunks")
+            rows = cur.fetchone()[0]
+            cur.execute(
+                """
+                SELECT indexdef, pg_size_pretty(pg_relation_size(indexname::regclass))
+                FROM pg_indexes WHERE tablename = 'document_chunks' AND indexname = %s
+                """,
+                (VECTOR_INDEX_NAME,)
+            )
+            index = cur.fetchone()
+            cur.execute("SELECT pg_size_pretty(pg_total_relation_size('document_chunks'))")
+            table_size = cur.fetchone()[0]
+            cur.execute(
+                """
+                SELECT indexname, pg_size_pretty(pg_relation_size(indexname::regclass))
+                FROM pg_indexes WHERE tablename = 'document_chunks' AND indexname = ANY(%s)
+                """,
+                ([f"document_chunks_{column}_idx" for column in QUANTIZED_COLUMNS.values()],)
+            )
+            quantized = dict(cur.fetchall())
+            return {
+                "rows": rows,
+                "table_size": table_size,
+                "vector_index": index[0] if index else None,
+                "vector_index_size": index[1] if index else None,
+                "quantized_indexes": quantized,
+            }
+        finally:
+            cur.close()
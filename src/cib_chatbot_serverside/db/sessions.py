@@ -0,0 +1,116 @@
+"""Persistence for per-session conversation history (the chat_sessions table)."""
+from typing import Any, Dict, Optional
+
+import psycopg2.extras
+
+from .connection import get_pool
+from ..utils.logging import setup_logger
+
+logger = setup_logger("db_sessions")
+
+SESSIONS_CHANGED_CHANNEL = "chat_sessions_changed"
+
+
+def _write(sql: str, params, notify: Optional[str] = None) -> int:
+    """Run one statement (plus the change notification) in its own transaction."""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, params)
+            changed = cur.rowcount
+            if notify is not None:
+                cur.execute("SELECT pg_notify(%s, %s)", (SESSIONS_CHANGED_CHANNEL, notify))
+            conn.commit()
+            return changed
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+def ensure_sessions_table():
+    """Create chat_sessions if needed; safe to run from several workers at once."""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            # Concurrent CREATE TABLE IF NOT EXISTS can still collide on the catalog
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('chat_sessions'))")
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    messages JSONB NOT NULL DEFAULT '[]'::jsonb,
+                    pending JSONB NOT NULL DEFAULT '[]'::jsonb,
+                    summary TEXT NOT NULL DEFAULT '',
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+                """
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS chat_sessions_updated_at_idx ON chat_sessions (updated_at)")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+def load_session(session_id: str, idle_ttl: float) -> Optional[Dict[str, Any]]:
+    """Return the stored state of a session, or None if it is unknown or idle for over ``idle_ttl`` seconds."""
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT messages, pending, summary FROM chat_sessions
+                WHERE session_id = %s AND updated_at > now() - make_interval(secs => %s)
+                """,
+                (session_id, idle_ttl),
+            )
+            row = cur.fetchone()
+        finally:
+            cur.close()
+    if row is None:
+        return None
+    messages, pending, summary = row
+    return {"messages": messages, "pending": pending, "summary": summary}
+
+
+def save_session(session_id: str, state: Dict[str, Any], origin: str):
+    """Upsert a session and tell the other workers to drop their cached copy."""
+    _write(
+        """
+        INSERT INTO chat_sessions (session_id, messages, pending, summary, updated_at)
+        VALUES (%s, %s, %s, %s, now())
+        ON CONFLICT (session_id) DO UPDATE SET
+            messages = EXCLUDED.messages,
+            pending = EXCLUDED.pending,
+            summary = EXCLUDED.summary,
+            updated_at = EXCLUDED.updated_at
+        """,
+        (
+            session_id,
+            psycopg2.extras.Json(state["messages"]),
+            psycopg2.extras.Json(state["pending"]),
+            state["summary"],
+        ),
+        notify=f"{origin}:{session_id}",
+    )
+
+
+def delete_session(session_id: str, origin: str) -> bool:
+    """Delete a session; returns whether it existed."""
+    return _write(
+        "DELETE FROM chat_sessions WHERE session_id = %s", (session_id,), notify=f"{origin}:{session_id}"
+    ) > 0
+
+
+def expire_sessions(idle_ttl: float) -> int:
+    """Delete sessions idle for over ``idle_ttl`` seconds; returns how many."""
+    deleted = _write(
+        "DELETE FROM chat_sessions WHERE updated_at < now() - make_interval(secs => %s)", (idle_ttl,)
+    )
+    if deleted:
+        logger.info(f"Expired {deleted} idle chat sessions", extra={'stage': 'SESSIONS'})
+    return deleted
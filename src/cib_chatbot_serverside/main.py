@@ -1,19 +1,155 @@
 """Main FastAPI application."""
+import asyncio
+import re
+import signal
 import time
+import uuid
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from .api.routes import router
+from .config.prompts import prompt_manager
 from .config.settings import settings
-from .utils.logging import setup_logger
+from .db.connection import get_pool, close_pool
+from .db.local_index import get_local_index
+from .db.notifications import ChunkChangeListener, NotificationListener
+from .db.sessions import SESSIONS_CHANGED_CHANNEL
+from .services.rag_service import get_rag_service
+from .services.scheduler import LLMOverloadedError, get_llm_scheduler, set_client_id
+from .services.warmup import get_warmup
+from .services.semantic_cache import get_semantic_cache
+from .utils.embedding_cache import get_embedding_cache
+from .utils.logging import logging_stats, sample_request_payloads, set_request_id, setup_logger
+from .utils.metrics import HTTP_LATENCY, HTTP_REQUESTS, gauge_family, registry
 
 logger = setup_logger("main")
 
+_REQUEST_ID = re.compile(r"^[\w.:-]{1,128}$")
+
+
+def _collect_gauges():
+    """Cache, pool and logging gauges, read at scrape time."""
+    pool = get_pool().stats()
+    yield gauge_family(
+        "db_pool_connections", "Pooled database connections by state",
+        {"idle": pool["idle"], "in_use": pool["in_use"]}, label="state",
+    )
+    yield gauge_family("db_pool_waiting", "Callers waiting for a connection", {"": pool["waiting"]})
+    yield gauge_family("db_pool_wait_seconds_max", "Longest wait for a connection", {"": pool["wait_time_max"]})
+    caches = {"embedding": get_embedding_cache().stats(), "semantic": get_semantic_cache().stats()}
+    for key, help in (("size", "Cache entries"), ("hits", "Cache hits"), ("misses", "Cache misses")):
+        yield gauge_family(f"cache_{key}", help, {name: stats[key] for name, stats in caches.items()}, label="cache")
+    llm = get_llm_scheduler().stats()
+    yield gauge_family("llm_generations_active", "Generations holding an LLM slot", {"": llm["active"]})
+    yield gauge_family("llm_queue_depth", "Generations waiting for an LLM slot", {"": llm["queued"]})
+    yield gauge_family("llm_queue_clients", "Distinct clients with queued generations", {"": llm["queued_clients"]})
+    local_index = get_local_index()
+    if local_index is not None:
+        index = local_index.stats()
+        yield gauge_family(
+            "local_index_rows", "Rows in the local vector index by state",
+            {"live": index["live"], "deleted": index["deleted"]}, label="state",
+        )
+        yield gauge_family("local_index_searches", "Queries answered by the local vector index", {"": index["searches"]})
+    sessions = get_rag_service().sessions.stats()
+    yield gauge_family("chat_sessions_cached", "Conversations held in this worker's session cache", {"": sessions["cached"]})
+    yield gauge_family("log_records_dropped", "Log records dropped on a full queue", {"": logging_stats()["dropped"]})
+
+
+registry.register_collector(_collect_gauges)
+
+
+def _invalidate_semantic_cache(config):
+    get_semantic_cache().invalidate()
+
+
+def _refresh_local_index(row_ids=None):
+    try:
+        get_local_index().refresh(row_ids=row_ids)
+    except Exception as e:
+        logger.error(f"Local index refresh failed: {e}", extra={'stage': 'LOCAL_INDEX'})
+
+
+async def _expire_sessions(sessions):
+    while True:
+        await asyncio.sleep(settings.SESSION_EXPIRE_INTERVAL)
+        await sessions.expire()
+
+
+def _warm_up_steps():
+    """What has to be open or loaded before the first request is fast."""
+    if not settings.WARMUP_ENABLED:
+        return {}
+    llm_service = get_rag_service().llm_service
+    return {
+        "database": lambda: asyncio.to_thread(get_pool().warm_up),
+        "chat_model": llm_service.preload_chat_model,
+        "embedding_model": llm_service.preload_embedding_model,
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up shared resources on startup and release them on shutdown.
+
+    The warm-up runs in the background: the server accepts connections
+    (and answers /api/health) at once, and /api/ready turns 200 when the
+    pool is open and both Ollama models are loaded.
+    """
+    warmup = asyncio.create_task(get_warmup().run(_warm_up_steps()))
+    
+    try:
+        # `kill -HUP <pid>` reloads prompt_config.json without a restart
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, prompt_manager.reload)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        logger.debug("SIGHUP config reload is not available on this platform")
+    
+    on_chunks_changed = []
+    if get_semantic_cache().enabled:
+        # Cached answers were generated with the previous prompts
+        prompt_manager.add_listener(_invalidate_semantic_cache)
+        # Drop cached answers whenever sync-docs changes document_chunks
+        on_chunks_changed.append(lambda row_ids: get_semantic_cache().invalidate())
+    
+    if get_local_index() is not None:
+        # Serve from the snapshot on disk right away and catch up in the background;
+        # searches use Postgres until a snapshot exists. Notifications then name
+        # the changed rows, so only those are re-read.
+        asyncio.get_running_loop().run_in_executor(None, _refresh_local_index)
+        on_chunks_changed.append(_refresh_local_index)
+    
+    listener = None
+    if on_chunks_changed:
+        listener = ChunkChangeListener(lambda row_ids: [callback(row_ids) for callback in on_chunks_changed])
+        listener.start()
+    
+    sessions = get_rag_service().sessions
+    session_listener = None
+    if sessions.persistent:
+        # Other workers' writes make this worker's cached copy of a session stale
+        session_listener = NotificationListener(SESSIONS_CHANGED_CHANNEL, sessions.invalidate)
+        session_listener.start()
+    session_expiry = asyncio.create_task(_expire_sessions(sessions))
+    
+    yield
+    
+    warmup.cancel()
+    session_expiry.cancel()
+    if listener is not None:
+        listener.stop()
+    if session_listener is not None:
+        session_listener.stop()
+    close_pool()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="CIB ChatBot API",
     description="RAG-based chatbot API using LangChain and PostgreSQL with pgvector",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -29,24 +165,54 @@ app.add_middleware(
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all HTTP requests."""
-    request_id = f"{time.time()}"
-    logger.info(f"Request started", extra={'stage': 'HTTP_REQUEST'})
-    logger.debug(f"Request ID: {request_id}")
-    logger.debug(f"Method: {request.method}")
-    logger.debug(f"URL: {request.url}")
-    logger.debug(f"Client: {request.client.host if request.client else 'Unknown'}")
+    """Log all HTTP requests and record their latency.
+
+    The request ID (the caller's ``X-Request-ID`` or a new UUID) is set in
+    the request context, so every log record of every stage carries it, and
+    echoed back in the response headers.
+    """
+    request_id = request.headers.get("x-request-id", "")
+    if not _REQUEST_ID.match(request_id):
+        request_id = uuid.uuid4().hex
+    set_request_id(request_id)
+    # Fair LLM scheduling is per caller: an explicit client ID, else the peer address
+    client_id = request.headers.get("x-client-id", "")
+    if not _REQUEST_ID.match(client_id):
+        client_id = request.client.host if request.client else None
+    set_client_id(client_id)
+    sample_request_payloads()
+    logger.info("Request started: %s %s", request.method, request.url.path, extra={'stage': 'HTTP_REQUEST'})
+    logger.debug("Client: %s", request.client.host if request.client else 'Unknown')
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
+    
+    # Route templates, not raw URLs, keep label cardinality bounded
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    HTTP_REQUESTS.inc(method=request.method, path=path, status=response.status_code)
+    HTTP_LATENCY.observe(process_time, method=request.method, path=path)
+    response.headers["X-Request-ID"] = request_id
     
-    logger.info(f"Request completed in {process_time:.4f} seconds", extra={'stage': 'HTTP_RESPONSE'})
-    logger.debug(f"Response status: {response.status_code}")
+    logger.info(
+        "Request completed in %.4f seconds with status %d", process_time, response.status_code,
+        extra={'stage': 'HTTP_RESPONSE'},
+    )
     
     return response
 
 
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloadedError):
+    """Reject quickly with 429 so clients back off instead of piling on."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # Include API routes
 app.include_router(router, prefix="/api", tags=["chat"])
 
@@ -59,21 +225,47 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/api/chat",
+            "chat_stream": "/api/chat/stream",
+            "chat_batch": "/api/chat/batch",
             "clear_history": "/api/clear-history",
             "health": "/api/health",
+            "ready": "/api/ready",
+            "pool_stats": "/api/pool-stats",
+            "cache_stats": "/api/cache-stats",
+            "llm_stats": "/api/llm-stats",
+            "reload_config": "/api/admin/reload-config",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics in the text exposition format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 def main():
-    """Entry point for the application."""
+    """Entry point for the application.
+
+    ``SERVER_WORKERS`` processes share the port; each keeps its own pool,
+    caches and LLM admission limit, while conversations are shared through
+    the Postgres session store.
+    """
     import uvicorn
+    workers = max(settings.SERVER_WORKERS, 1)
+    if workers > 1 and settings.SESSION_STORE != "postgres":
+        logger.warning(
+            "SESSION_STORE=%s keeps conversations per worker; follow-up questions routed "
+            "to another worker lose their history", settings.SESSION_STORE, extra={'stage': 'STARTUP'}
+        )
     uvicorn.run(
         "cib_chatbot_serverside.main:app", 
-        host="0.0.0.0", 
-        port=8000, 
-        reload=True
+        host=settings.SERVER_HOST, 
+        port=settings.SERVER_PORT, 
+        workers=workers,
+        reload=settings.SERVER_RELOAD and workers == 1
     )
 
 
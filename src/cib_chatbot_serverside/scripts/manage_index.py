@@ -0,0 +1,112 @@
+"""Schema and vector index management command."""
+import argparse
+import json
+
+from ..config.settings import settings
+from ..db.connection import close_pool
+from ..db.local_index import DTYPES, LocalVectorIndex
+from ..db.operations import reembed_chunks
+from ..db.schema import (
+    INDEX_TYPES,
+    QUANTIZED_COLUMNS,
+    add_quantized_column,
+    backfill_quantized,
+    create_quantized_index,
+    create_vector_index,
+    drop_vector_index,
+    ensure_schema,
+    index_status,
+)
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Manage the document_chunks schema and vector index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("init", help="Create the pgvector extension, table, lookup and full-text indexes")
+
+    create = sub.add_parser("create-index", help="(Re)build the ANN index on embeddings")
+    create.add_argument("--type", choices=INDEX_TYPES, default="hnsw")
+    create.add_argument("--m", type=int, default=16, help="HNSW: max connections per layer")
+    create.add_argument("--ef-construction", type=int, default=64, help="HNSW: build-time candidate list size")
+    create.add_argument("--lists", type=int, default=None, help="IVFFlat: number of lists (default: rows/1000)")
+    create.add_argument(
+        "--blocking", action="store_true",
+        help="Build without CONCURRENTLY (faster, but blocks writes)",
+    )
+
+    quantize = sub.add_parser(
+        "quantize", help="Add, backfill and index a quantized embedding column for two-stage search",
+    )
+    quantize.add_argument("--mode", choices=tuple(QUANTIZED_COLUMNS), required=True)
+    quantize.add_argument("--batch-size", type=int, default=1000, help="Rows updated per committed batch")
+    quantize.add_argument("--m", type=int, default=16, help="HNSW: max connections per layer")
+    quantize.add_argument("--ef-construction", type=int, default=64, help="HNSW: build-time candidate list size")
+    quantize.add_argument(
+        "--blocking", action="store_true",
+        help="Build without CONCURRENTLY (faster, but blocks writes)",
+    )
+
+    reembed = sub.add_parser(
+        "reembed", help="Re-embed every chunk with EMBEDDING_MODEL after a model change",
+    )
+    reembed.add_argument(
+        "--batch-size", type=int, default=settings.INGEST_BATCH_SIZE,
+        help="Chunks per embedding call and per committed UPDATE",
+    )
+    reembed.add_argument("--after-id", type=int, default=0, help="Resume after this document_chunks id")
+
+    sub.add_parser("drop-index", help="Drop the ANN index")
+    sub.add_parser("status", help="Show row count and index details")
+
+    local = sub.add_parser("local-index", help="Build or catch up the local memory-mapped replica")
+    local.add_argument("--path", default=settings.LOCAL_INDEX_PATH)
+    local.add_argument("--dtype", choices=DTYPES, default=settings.LOCAL_INDEX_DTYPE)
+    local.add_argument("--rebuild", action="store_true", help="Write a fresh generation instead of catching up")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Entry point for index management."""
+    args = parse_args(argv)
+    try:
+        if args.command == "init":
+            ensure_schema()
+            print("Schema is up to date")
+        elif args.command == "create-index":
+            create_vector_index(
+                index_type=args.type,
+                m=args.m,
+                ef_construction=args.ef_construction,
+                lists=args.lists,
+                concurrently=not args.blocking,
+            )
+            print(f"Created {args.type} index")
+        elif args.command == "quantize":
+            add_quantized_column(args.mode)
+            filled = backfill_quantized(args.mode, batch_size=args.batch_size)
+            create_quantized_index(
+                args.mode, m=args.m, ef_construction=args.ef_construction, concurrently=not args.blocking,
+            )
+            print(f"Backfilled {filled} rows and indexed {QUANTIZED_COLUMNS[args.mode]}; "
+                  f"set VECTOR_QUANTIZATION={args.mode} to search it")
+        elif args.command == "reembed":
+            stats = reembed_chunks(batch_size=args.batch_size, after_id=args.after_id)
+            print(f"Re-embedded {stats['rows']} chunks with {settings.EMBEDDING_MODEL} "
+                  f"({stats['cache_hits']} from chunk_embeddings, last id {stats['last_id']}); "
+                  "rebuild the local index with `manage-index local-index --rebuild` if it is enabled")
+        elif args.command == "drop-index":
+            drop_vector_index()
+            print("Dropped vector index")
+        elif args.command == "local-index":
+            local_index = LocalVectorIndex(args.path, dims=settings.EMBEDDING_DIMENSIONS, dtype=args.dtype)
+            print(json.dumps(local_index.refresh(rebuild=args.rebuild)))
+            print(json.dumps(local_index.stats(), indent=2))
+        print(json.dumps(index_status(), indent=2))
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Persisted manifest of synced files and their content digests."""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SyncManifest:
+    """JSON manifest mapping each synced file to its stat info and SHA-256.
+
+    ``is_unchanged`` only needs an ``os.stat``, so restarting on an
+    unchanged corpus never reads file contents. Chunk-level diffs are made
+    against the rows in Postgres, not the manifest. Writes are batched and
+    replace the file atomically.
+    """
+
+    def __init__(self, path: str, save_interval: float = 5.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._files: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._files = json.load(f).get("files", {})
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable sync manifest {self.path}: {e}")
+            self._files = {}
+
+    def files(self):
+        with self._lock:
+            return list(self._files)
+
+    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._files.get(file_path)
+            return dict(entry) if entry else None
+
+    def is_unchanged(self, file_path: str) -> bool:
+        """True if the file's size and mtime match the manifest."""
+        entry = self.get(file_path)
+        if entry is None:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns
+
+    def record(self, file_path: str, sha256: str, stat: Optional[os.stat_result] = None):
+        """Record a successfully synced file."""
+        stat = stat or os.stat(file_path)
+        with self._lock:
+            self._files[file_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "sha256": sha256,
+            }
+            self._dirty = True
+        self._maybe_save()
+
+    def touch(self, file_path: str):
+        """Refresh stat info for a file whose content did not change."""
+        stat = os.stat(file_path)
+        with self._lock:
+            entry = self._files.get(file_path)
+            if entry is None:
+                return
+            entry["size"] = stat.st_size
+            entry["mtime"] = stat.st_mtime_ns
+            self._dirty = True
+        self._maybe_save()
+
+    def remove(self, file_path: str):
+        with self._lock:
+            if self._files.pop(file_path, None) is not None:
+                self._dirty = True
+        self._maybe_save()
+
+    def move(self, old_path: str, new_path: str):
+        with self._lock:
+            entry = self._files.pop(old_path, None)
+            if entry is None:
+                return
+            self._files[new_path] = entry
+            self._dirty = True
+        self._maybe_save()
+
+    def _maybe_save(self):
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Write the manifest to disk if it changed."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = json.dumps({"version": 1, "files": self._files})
+                self._dirty = False
+                self._last_save = time.monotonic()
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,479 @@
+"""Staged, parallel document ingestion pipeline.
+
+Files flow through three stages connected by bounded queues:
+
+1. load + split, in a process pool (PDF parsing and splitting are CPU bound),
+   then a diff against the chunks already stored for that file. PDFs are
+   read a window of pages at a time, so a file is never held in memory
+   whole and its first chunks reach the next stage while the rest is parsed
+2. embedding of new or changed chunks in fixed-size batches, in a
+   concurrency-limited thread pool; text already embedded with the current
+   model (in any file) is taken from the chunk_embeddings store instead
+3. a single writer that commits one multi-row INSERT per batch
+
+When a downstream stage falls behind, the queue in front of it fills up and
+blocks the stage before it, so memory stays bounded and ``submit`` blocks
+callers instead of piling up work.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pypdf
+from langchain_community.document_loaders import UnstructuredMarkdownLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from ..config.settings import settings
+from ..db.chunk_embeddings import content_hash
+from ..db.operations import (
+    apply_chunk_changes,
+    delete_file_chunks,
+    embed_chunks_cached,
+    fetch_file_chunk_rows,
+    rename_file_chunks,
+    write_chunks,
+)
+from .manifest import SyncManifest, file_digest
+
+_STOP = object()
+
+
+def calculate_chunk_ids(chunks: list[Document]) -> list[Document]:
+    """Calculate unique IDs for document chunks."""
+    last_page_id = None
+    current_chunk_index = 0
+
+    for chunk in chunks:
+        source = chunk.metadata.get("source")
+        page = chunk.metadata.get("page", 0)
+        current_page_id = f"{source}:{page}"
+
+        if current_page_id == last_page_id:
+            current_chunk_index += 1
+        else:
+            current_chunk_index = 0
+
+        chunk_id = f"{current_page_id}:{current_chunk_index}"
+        last_page_id = current_page_id
+        chunk.metadata["id"] = chunk_id
+
+    return chunks
+
+
+class FileSyncPlan:
+    """Diff a file's fresh chunks, fed in page order, against its stored rows.
+
+    ``stored`` lists the file's ``(row_id, chunk_id, md5)``. Each ``add()``
+    returns the chunks of one window to embed and the ``(row_id, metadata)``
+    re-keys for stored rows whose text moved (e.g. shifted by an edit
+    earlier in the file), so they keep their embedding; ``finish()``
+    returns the rows no chunk claimed, for deletion. A row is claimed at
+    most once, so windows can be applied as they arrive.
+    """
+
+    def __init__(self, stored: List[Tuple[int, str, str]]):
+        self._by_id: Dict[str, List[Tuple[int, str]]] = {}
+        self._by_hash: Dict[str, List[int]] = {}
+        for row_id, chunk_id, content_hash in stored:
+            self._by_id.setdefault(chunk_id, []).append((row_id, content_hash))
+            self._by_hash.setdefault(content_hash, []).append(row_id)
+        self._rows = [row_id for row_id, _, _ in stored]
+        self._claimed = set()
+        self.unchanged = 0
+        self.relabeled = 0
+
+    def add(self, chunks: list[Document]) -> Tuple[list[Document], List[Tuple[int, Dict[str, Any]]]]:
+        pending = []
+        for chunk in chunks:
+            digest = content_hash(chunk.page_content)
+            for row_id, stored_hash in self._by_id.get(chunk.metadata["id"], ()):
+                if stored_hash == digest and row_id not in self._claimed:
+                    self._claimed.add(row_id)
+                    self.unchanged += 1
+                    break
+            else:
+                pending.append((chunk, digest))
+
+        to_embed, relabel = [], []
+        for chunk, digest in pending:
+            candidates = self._by_hash.get(digest, [])
+            while candidates and candidates[-1] in self._claimed:
+                candidates.pop()
+            if candidates:
+                row_id = candidates.pop()
+                self._claimed.add(row_id)
+                relabel.append((row_id, chunk.metadata))
+            else:
+                to_embed.append(chunk)
+        self.relabeled += len(relabel)
+        return to_embed, relabel
+
+    def finish(self) -> List[int]:
+        """Stored rows that no chunk of the file kept or re-keyed."""
+        return [row_id for row_id in self._rows if row_id not in self._claimed]
+
+
+def _split(documents: list[Document]) -> list[Document]:
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+        add_start_index=True,
+    )
+    # Documents are split independently, so chunk IDs (per page) can be assigned per window
+    return calculate_chunk_ids(text_splitter.split_documents(documents))
+
+
+def load_markdown(file_path: str) -> list[Document]:
+    """Load a Markdown file and split it into chunks with IDs."""
+    return _split(UnstructuredMarkdownLoader(file_path).load())
+
+
+# The PDF a loader process last read: (pid, path, size, mtime), open file, reader
+_open_pdf: Optional[Tuple[tuple, Any, pypdf.PdfReader]] = None
+
+
+def _pdf_reader(file_path: str) -> pypdf.PdfReader:
+    """A reader for ``file_path``, reused across the windows this process loads.
+
+    Building a reader flattens the whole page tree, so a fresh one per window
+    would make a file's load time quadratic in its page count. Keyed by pid
+    too: a forked pool worker must not share its parent's file offset.
+    """
+    global _open_pdf
+    stat = os.stat(file_path)
+    key = (os.getpid(), file_path, stat.st_size, stat.st_mtime_ns)
+    if _open_pdf is None or _open_pdf[0] != key:
+        if _open_pdf is not None and _open_pdf[0][0] == key[0]:
+            _open_pdf[1].close()
+        _open_pdf = None
+        f = open(file_path, "rb")
+        _open_pdf = (key, f, pypdf.PdfReader(f))
+    return _open_pdf[2]
+
+
+def pdf_page_count(file_path: str) -> int:
+    with open(file_path, "rb") as f:
+        return len(pypdf.PdfReader(f).pages)
+
+
+def load_pdf_pages(file_path: str, start: int, stop: int) -> list[Document]:
+    """Load pages ``[start, stop)`` of a PDF and split them into chunks with IDs.
+
+    Produces the same pages as ``PyPDFLoader`` (whose ``lazy_load`` still
+    extracts every page up front). The reader's object cache is dropped
+    after each window, so parsed content streams don't accumulate.
+    """
+    reader = _pdf_reader(file_path)
+    try:
+        pages = [
+            Document(page_content=reader.pages[page].extract_text(), metadata={"source": file_path, "page": page})
+            for page in range(start, stop)
+        ]
+    finally:
+        reader.resolved_objects.clear()
+    return _split(pages)
+
+
+def load_tasks(file_path: str, pages_per_window: Optional[int] = None) -> List[Tuple[Callable, tuple]]:
+    """The ``(function, args)`` calls that load a file window by window, in order."""
+    if file_path.endswith(".md"):
+        return [(load_markdown, (file_path,))]
+    pages_per_window = pages_per_window or settings.INGEST_PAGES_PER_WINDOW
+    pages = pdf_page_count(file_path)
+    return [
+        (load_pdf_pages, (file_path, start, min(start + pages_per_window, pages)))
+        for start in range(0, pages, pages_per_window)
+    ]
+
+
+def iter_file_chunks(file_path: str, pages_per_window: Optional[int] = None) -> Iterator[list[Document]]:
+    """Yield a file's chunks one window at a time, in order."""
+    for function, args in load_tasks(file_path, pages_per_window):
+        yield function(*args)
+
+
+def load_and_split(file_path: str) -> list[Document]:
+    """Load a single file and split it into chunks with IDs."""
+    return [chunk for chunks in iter_file_chunks(file_path) for chunk in chunks]
+
+
+class IngestionPipeline:
+    """Parallel, incremental load → embed → write pipeline with backpressure.
+
+    With a ``manifest``, files whose bytes are unchanged are skipped, and
+    only chunks whose text changed are re-embedded; the manifest entry is
+    written once every batch of the file has been committed.
+
+    By default files stream in ``pages_per_window`` pages at a time, with up
+    to ``workers`` windows parsing ahead, and their chunks go to embedding
+    in ``batch_size`` batches as soon as a batch fills. A custom ``loader``
+    returns a whole file's chunks at once instead.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        embed_workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        loader: Optional[Callable[[str], list[Document]]] = None,
+        manifest: Optional[SyncManifest] = None,
+        pages_per_window: Optional[int] = None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_workers = embed_workers or settings.INGEST_EMBED_WORKERS
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        queue_size = queue_size or settings.INGEST_QUEUE_SIZE
+        self.loader = loader
+        self.manifest = manifest
+        self.pages_per_window = pages_per_window or settings.INGEST_PAGES_PER_WINDOW
+
+        self._files: "queue.Queue" = queue.Queue(maxsize=self.workers * 2)
+        self._embed_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._write_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+        self._resubmit = set()
+        self._stats = {
+            "files": 0, "unchanged": 0, "chunks": 0, "reused": 0,
+            "deleted": 0, "added": 0, "embedded": 0, "embed_cache_hits": 0, "errors": 0,
+        }
+        self._start_time = None
+
+    def start(self):
+        """Start the worker pools and threads."""
+        self._start_time = time.time()
+        self._process_pool = ProcessPoolExecutor(max_workers=self.workers)
+        for i in range(self.workers):
+            self._spawn(self._load_worker, f"ingest-load-{i}")
+        for i in range(self.embed_workers):
+            self._spawn(self._embed_worker, f"ingest-embed-{i}")
+        self._spawn(self._write_worker, "ingest-write")
+        return self
+
+    def _spawn(self, target, name: str):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def submit(self, file_path: str):
+        """Queue a file for ingestion, blocking while the pipeline is full.
+
+        A file that is already being processed is queued again once the
+        current run finishes, so bursts of modify events collapse into one.
+        """
+        with self._lock:
+            if file_path in self._in_flight:
+                self._resubmit.add(file_path)
+                return
+            self._in_flight[file_path] = {"pending": 0, "failed": False}
+        self._files.put(file_path)
+
+    def remove(self, file_path: str):
+        """Delete every chunk of a file that no longer exists."""
+        deleted = delete_file_chunks(file_path)
+        self._count(deleted=deleted)
+        if self.manifest is not None:
+            self.manifest.remove(file_path)
+        print(f"Removed {deleted} chunks for deleted file: {file_path}")
+
+    def move(self, old_path: str, new_path: str):
+        """Re-point the chunks of a renamed file without re-embedding them."""
+        renamed = rename_file_chunks(old_path, new_path)
+        if self.manifest is not None:
+            self.manifest.move(old_path, new_path)
+        print(f"Moved {renamed} chunks from {old_path} to {new_path}")
+
+    def join(self):
+        """Wait until every submitted file has been written."""
+        self._files.join()
+        self._embed_queue.join()
+        self._write_queue.join()
+        if self.manifest is not None:
+            self.manifest.save()
+
+    def close(self):
+        """Drain the pipeline and stop all workers."""
+        self.join()
+        for _ in range(self.workers):
+            self._files.put(_STOP)
+        for _ in range(self.embed_workers):
+            self._embed_queue.put(_STOP)
+        self._write_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return throughput counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = time.time() - self._start_time if self._start_time else 0.0
+        stats["elapsed"] = round(elapsed, 2)
+        stats["chunks_per_second"] = round(stats["added"] / elapsed, 1) if elapsed > 0 else 0.0
+        lookups = stats["embedded"] + stats["embed_cache_hits"]
+        stats["embed_cache_hit_rate"] = round(stats["embed_cache_hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def _batch_done(self, file_path: str, failed: bool = False):
+        """Account for one finished batch; finalize the file after its last one."""
+        with self._lock:
+            state = self._in_flight[file_path]
+            state["pending"] -= 1
+            state["failed"] = state["failed"] or failed
+            if state["pending"] > 0:
+                return
+            del self._in_flight[file_path]
+            resubmit = file_path in self._resubmit
+            self._resubmit.discard(file_path)
+
+        if not state["failed"] and "sha256" in state and self._delete_orphans(file_path, state["delete_rows"]):
+            if self.manifest is not None:
+                self.manifest.record(file_path, state["sha256"], state["stat"])
+        if resubmit:
+            # Re-queue off this thread: a blocking put here could deadlock the stages
+            threading.Thread(target=self.submit, args=(file_path,), daemon=True).start()
+
+    def _delete_orphans(self, file_path: str, delete_rows: List[int]) -> bool:
+        """Delete the file's stored rows no new chunk claimed, once all its batches are written.
+
+        Until then the old rows keep the file searchable, so a failed embed
+        or write never leaves it without chunks.
+        """
+        try:
+            if delete_rows:
+                apply_chunk_changes([], delete_rows)
+            self._count(deleted=len(delete_rows))
+            return True
+        except Exception as e:
+            self._count(errors=1)
+            print(f"Error deleting replaced chunks of {file_path}: {e}")
+            return False
+
+    def _load_worker(self):
+        while True:
+            file_path = self._files.get()
+            if file_path is _STOP:
+                self._files.task_done()
+                return
+            with self._lock:
+                state = self._in_flight[file_path]
+                state["pending"] = 1  # held by this stage until batches are queued
+            try:
+                self._load_file(file_path, state)
+                self._batch_done(file_path)
+            except Exception as e:
+                self._count(errors=1)
+                print(f"Error processing {file_path}: {e}")
+                self._batch_done(file_path, failed=True)
+            finally:
+                self._files.task_done()
+
+    def _load_file(self, file_path: str, state: Dict[str, Any]):
+        stat = os.stat(file_path)
+        sha256 = file_digest(file_path)
+        entry = self.manifest.get(file_path) if self.manifest is not None else None
+        if entry is not None and entry["sha256"] == sha256:
+            # Only the timestamp changed
+            self.manifest.touch(file_path)
+            self._count(unchanged=1)
+            return
+
+        print(f"Processing file: {file_path}")
+        plan = FileSyncPlan(fetch_file_chunk_rows(file_path))
+        buffered: list[Document] = []
+        for chunks in self._load_windows(file_path):
+            to_embed, relabel = plan.add(chunks)
+            if relabel:
+                apply_chunk_changes(relabel, [])
+            self._count(chunks=len(chunks))
+            buffered.extend(to_embed)
+            while len(buffered) >= self.batch_size:
+                self._queue_batch(file_path, state, buffered[:self.batch_size])
+                del buffered[:self.batch_size]
+        if buffered:
+            self._queue_batch(file_path, state, buffered)
+
+        self._count(files=1, reused=plan.unchanged + plan.relabeled)
+        # Only rows no chunk claimed, deleted after the file's last batch is written
+        state.update(sha256=sha256, stat=stat, delete_rows=plan.finish())
+
+    def _load_windows(self, file_path: str) -> Iterator[list[Document]]:
+        """A file's chunks window by window, parsing up to ``workers`` windows ahead."""
+        if self.loader is not None:
+            yield self._process_pool.submit(self.loader, file_path).result()
+            return
+        tasks = deque(load_tasks(file_path, self.pages_per_window))
+        running = deque()
+
+        def fill():
+            while tasks and len(running) < self.workers:
+                function, args = tasks.popleft()
+                running.append(self._process_pool.submit(function, *args))
+
+        fill()
+        try:
+            while running:
+                chunks = running.popleft().result()
+                fill()
+                yield chunks
+        finally:
+            for future in running:
+                future.cancel()
+
+    def _queue_batch(self, file_path: str, state: Dict[str, Any], batch: list[Document]):
+        with self._lock:
+            state["pending"] += 1
+        # Blocks while embedding is behind, which also pauses parsing of this file
+        self._embed_queue.put((file_path, batch))
+
+    def _embed_worker(self):
+        while True:
+            item = self._embed_queue.get()
+            if item is _STOP:
+                self._embed_queue.task_done()
+                return
+            file_path, batch = item
+            try:
+                embeddings, hits = embed_chunks_cached(batch)
+                self._count(embedded=len(batch) - hits, embed_cache_hits=hits)
+                self._write_queue.put((file_path, batch, embeddings))
+            except Exception as e:
+                self._count(errors=1)
+                print(f"Error embedding chunks of {file_path}: {e}")
+                self._batch_done(file_path, failed=True)
+            finally:
+                self._embed_queue.task_done()
+
+    def _write_worker(self):
+        while True:
+            item = self._write_queue.get()
+            if item is _STOP:
+                self._write_queue.task_done()
+                return
+            file_path, chunks, embeddings = item
+            try:
+                self._count(added=write_chunks(chunks, embeddings))
+                self._batch_done(file_path)
+            except Exception as e:
+                self._count(errors=1)
+                print(f"Error writing chunks of {file_path}: {e}")
+                self._batch_done(file_path, failed=True)
+            finally:
+                self._write_queue.task_done()
@@ -1,26 +1,64 @@
-"""Document synchronization script - watches for new files and processes them."""
+"""Document synchronization script - watches for file changes and syncs them."""
+import argparse
 import os
 import time
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from langchain_community.document_loaders import UnstructuredMarkdownLoader, PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
 
 from ..config.settings import settings
+from ..db.connection import get_pool, close_pool
 from ..db.operations import save_to_pgvector
+from .manifest import SyncManifest
+from .pipeline import IngestionPipeline, iter_file_chunks
+
+SUPPORTED_EXTENSIONS = (".md", ".pdf")
+
+
+def is_supported(path: str) -> bool:
+    """True for file types the sync handles."""
+    return os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
 
 
 class NewFileHandler(FileSystemEventHandler):
-    """Handler for new file events."""
+    """Handler for file creation, modification, move and deletion events."""
+    
+    def __init__(self, pipeline: IngestionPipeline = None):
+        super().__init__()
+        self.pipeline = pipeline
     
     def on_created(self, event):
         """Handle file creation events."""
-        if not event.is_directory:
-            file_ext = os.path.splitext(event.src_path)[1].lower()
-            if file_ext in [".md", ".pdf"]:
-                print(f"New file detected: {event.src_path}")
-                self.wait_and_process(event.src_path)
+        if not event.is_directory and is_supported(event.src_path):
+            print(f"New file detected: {event.src_path}")
+            self.wait_and_process(event.src_path)
+    
+    def on_modified(self, event):
+        """Re-sync edited files; unchanged content is skipped by hash."""
+        if not event.is_directory and is_supported(event.src_path) and self.pipeline is not None:
+            manifest = self.pipeline.manifest
+            if manifest is not None and manifest.is_unchanged(event.src_path):
+                return
+            print(f"Modified file detected: {event.src_path}")
+            self.wait_and_process(event.src_path)
+    
+    def on_moved(self, event):
+        """Re-key chunks of renamed files instead of re-embedding them."""
+        if event.is_directory or self.pipeline is None:
+            return
+        src_ok, dest_ok = is_supported(event.src_path), is_supported(event.dest_path)
+        if src_ok and dest_ok:
+            print(f"File moved: {event.src_path} -> {event.dest_path}")
+            self.pipeline.move(event.src_path, event.dest_path)
+        elif src_ok:
+            self.pipeline.remove(event.src_path)
+        elif dest_ok:
+            self.wait_and_process(event.dest_path)
+    
+    def on_deleted(self, event):
+        """Delete the chunks of removed files."""
+        if not event.is_directory and is_supported(event.src_path) and self.pipeline is not None:
+            print(f"Deleted file detected: {event.src_path}")
+            self.pipeline.remove(event.src_path)
 
     def wait_and_process(self, file_path, retries=5, delay=1):
         """Wait for the file to be released by the OS before processing."""
@@ -35,83 +73,86 @@ class NewFileHandler(FileSystemEventHandler):
             print(f"Could not access file {file_path} after {retries} retries.")
             return
 
-        process_file(file_path)
+        if self.pipeline is not None:
+            # Hand off to the pipeline so the watchdog thread is not blocked
+            self.pipeline.submit(file_path)
+        else:
+            process_file(file_path)
 
 
 def process_file(file_path: str):
     """Process a single file - load, chunk, and save to database."""
     print(f"Processing file: {file_path}")
-    
-    # 1. Load specific file
-    if file_path.endswith(".md"):
-        loader = UnstructuredMarkdownLoader(file_path)
-    else:
-        loader = PyPDFLoader(file_path)
-    
-    documents = loader.load()
-
-    # 2. Split into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-        add_start_index=True,
-    )
-    chunks = text_splitter.split_documents(documents)
-
-    # 3. Add unique IDs to chunks to prevent duplicates
-    chunks_with_ids = calculate_chunk_ids(chunks)
-
-    # 4. Save only new chunks
-    save_to_pgvector(chunks_with_ids)
+    # One window of pages at a time, so large files are never held in memory whole
+    for chunks_with_ids in iter_file_chunks(file_path):
+        # Save only new chunks
+        save_to_pgvector(chunks_with_ids)
     print(f"File processed successfully: {file_path}")
 
 
-def calculate_chunk_ids(chunks: list[Document]) -> list[Document]:
-    """Calculate unique IDs for document chunks."""
-    last_page_id = None
-    current_chunk_index = 0
-
-    for chunk in chunks:
-        source = chunk.metadata.get("source")
-        page = chunk.metadata.get("page", 0)
-        current_page_id = f"{source}:{page}"
-
-        if current_page_id == last_page_id:
-            current_chunk_index += 1
-        else:
-            current_chunk_index = 0
-
-        chunk_id = f"{current_page_id}:{current_chunk_index}"
-        last_page_id = current_page_id
-        chunk.metadata["id"] = chunk_id
-
-    return chunks
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Sync documents into the vector database.")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Processes used to load and split files (default: CPU count)",
+    )
+    parser.add_argument(
+        "--embed-workers", type=int, default=settings.INGEST_EMBED_WORKERS,
+        help="Concurrent embedding requests sent to Ollama",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.INGEST_BATCH_SIZE,
+        help="Chunks per embedding call and per INSERT",
+    )
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
     """Main function to sync documents."""
+    args = parse_args(argv)
     data_path = settings.DATA_PATH
     
     if not os.path.exists(data_path):
         os.makedirs(data_path)
         print(f"Created data directory: {data_path}")
 
-    # Initial sync for existing files
-    print("Performing initial sync...")
+    # Open pooled connections once instead of per batch
+    get_pool().warm_up()
+
+    manifest = SyncManifest(settings.SYNC_MANIFEST_PATH)
+    pipeline = IngestionPipeline(
+        workers=args.workers,
+        embed_workers=args.embed_workers,
+        batch_size=args.batch_size,
+        manifest=manifest,
+    ).start()
+
+    # Initial sync: only files whose size or mtime changed are read
+    print(f"Performing initial sync with {args.workers} workers...")
+    present = set()
+    unchanged = 0
     for filename in os.listdir(data_path):
         file_path = os.path.join(data_path, filename)
-        if os.path.isfile(file_path) and file_path.endswith(('.md', '.pdf')):
-            try:
-                process_file(file_path)
-            except Exception as e:
-                print(f"Error processing {file_path}: {e}")
+        if os.path.isfile(file_path) and is_supported(file_path):
+            present.add(file_path)
+            if manifest.is_unchanged(file_path):
+                unchanged += 1
+            else:
+                pipeline.submit(file_path)
+    for file_path in manifest.files():
+        if file_path not in present:
+            pipeline.remove(file_path)
+    pipeline.join()
+    print(f"Skipped {unchanged} unchanged files")
+    print(f"Initial sync complete: {pipeline.stats()}")
+    print(f"Connection pool stats: {get_pool().stats()}")
 
     # Start watching for new files
     print(f"\nWatching for new files in: {data_path}")
     print("Press Ctrl+C to stop...")
     
-    event_handler = NewFileHandler()
+    event_handler = NewFileHandler(pipeline)
     observer = Observer()
     observer.schedule(event_handler, data_path, recursive=False)
     observer.start()
@@ -123,6 +164,8 @@ def main():
         observer.stop()
         print("\nStopping file watcher...")
     observer.join()
+    pipeline.close()
+    close_pool()
 
 
 if __name__ == "__main__":
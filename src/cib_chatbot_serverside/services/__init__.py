@@ -1,5 +1,18 @@
 """Services package."""
-from .rag_service import RAGService
+from .rag_service import RAGService, get_rag_service
 from .llm_service import LLMService
+from .scheduler import LLMOverloadedError, get_llm_scheduler
+from .sessions import DEFAULT_SESSION, SessionStore
+from .warmup import WarmUp, get_warmup
 
-__all__ = ["RAGService", "LLMService"]
+__all__ = [
+    "RAGService",
+    "get_rag_service",
+    "LLMService",
+    "LLMOverloadedError",
+    "get_llm_scheduler",
+    "DEFAULT_SESSION",
+    "SessionStore",
+    "WarmUp",
+    "get_warmup",
+]
@@ -0,0 +1,129 @@
+"""Context assembly: merge overlapping chunks, drop near-duplicates, pack to a token budget."""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.documents import Document
+
+from ..utils.tokens import estimate_tokens, CHARS_PER_TOKEN
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class Passage:
+    """A contiguous span of one source page built from one or more chunks."""
+    text: str
+    score: float
+    metadata: Dict[str, Any]
+    start: int = -1
+    chunk_ids: List[str] = field(default_factory=list)
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+def _passage_key(metadata: Dict[str, Any]) -> Tuple[Any, Any]:
+    return metadata.get("source") or metadata.get("file_name"), metadata.get("page")
+
+
+def merge_adjacent(results: List[Tuple[Document, float]]) -> List[Passage]:
+    """Merge chunks of the same file and page whose character ranges touch or overlap.
+
+    The splitter's ``chunk_overlap`` makes neighbouring chunks repeat text;
+    merging on ``start_index`` keeps each character once.
+    """
+    groups: Dict[Tuple[Any, Any], List[Passage]] = {}
+    loose: List[Passage] = []
+    for doc, score in results:
+        passage = Passage(
+            text=doc.page_content,
+            score=score,
+            metadata=doc.metadata,
+            start=doc.metadata.get("start_index", -1),
+            chunk_ids=[doc.metadata.get("id", "")],
+        )
+        if passage.start is None or passage.start < 0:
+            loose.append(passage)
+        else:
+            groups.setdefault(_passage_key(doc.metadata), []).append(passage)
+
+    merged: List[Passage] = []
+    for passages in groups.values():
+        passages.sort(key=lambda p: p.start)
+        current = passages[0]
+        for nxt in passages[1:]:
+            if nxt.start <= current.end:
+                if nxt.end > current.end:
+                    current.text += nxt.text[current.end - nxt.start:]
+                current.score = max(current.score, nxt.score)
+                current.chunk_ids.extend(nxt.chunk_ids)
+            else:
+                merged.append(current)
+                current = nxt
+        merged.append(current)
+    return merged + loose
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(passages: List[Passage], threshold: float = 0.8) -> List[Passage]:
+    """Keep the best-scored passage of every group of near-identical passages."""
+    kept: List[Tuple[Passage, set]] = []
+    for passage in sorted(passages, key=lambda p: p.score, reverse=True):
+        shingles = _shingles(passage.text)
+        duplicate = False
+        for _, other in kept:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append((passage, shingles))
+    return [passage for passage, _ in kept]
+
+
+def pack_context(
+    results: List[Tuple[Document, float]],
+    token_budget: int,
+    separator: str = CONTEXT_SEPARATOR,
+) -> Tuple[str, List[Passage], Dict[str, int]]:
+    """Build the context text for the prompt from search results.
+
+    Returns ``(context_text, passages, stats)`` where ``stats`` compares the
+    packed context against naively joining every chunk.
+    """
+    naive_tokens = estimate_tokens(separator.join(doc.page_content for doc, _ in results))
+    passages = drop_near_duplicates(merge_adjacent(results))
+
+    separator_tokens = estimate_tokens(separator)
+    packed: List[Passage] = []
+    used = 0
+    for passage in passages:
+        cost = estimate_tokens(passage.text) + (separator_tokens if packed else 0)
+        if used + cost <= token_budget:
+            packed.append(passage)
+            used += cost
+        elif not packed:
+            # Always include the best passage, trimmed to the budget
+            passage.text = passage.text[:token_budget * CHARS_PER_TOKEN]
+            packed.append(passage)
+            used = estimate_tokens(passage.text)
+
+    context_text = separator.join(passage.text for passage in packed)
+    packed_tokens = estimate_tokens(context_text)
+    stats = {
+        "chunks": len(results),
+        "passages": len(packed),
+        "naive_tokens": naive_tokens,
+        "packed_tokens": packed_tokens,
+        "tokens_saved": max(naive_tokens - packed_tokens, 0),
+    }
+    return context_text, packed, stats
@@ -0,0 +1,140 @@
+"""Token-budgeted conversation history with rolling summarization."""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, BaseMessage
+
+from ..utils.logging import setup_logger
+from ..utils.tokens import estimate_message_tokens, estimate_tokens
+
+logger = setup_logger("history")
+
+Summarizer = Callable[[str, List[BaseMessage]], Awaitable[str]]
+
+_ROLES = {"human": HumanMessage, "ai": AIMessage}
+
+
+def _dump_messages(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+    return [{"role": message.type, "content": message.content} for message in messages]
+
+
+def _load_messages(items: List[Dict[str, str]]) -> List[BaseMessage]:
+    return [_ROLES[item["role"]](content=item["content"]) for item in items]
+
+
+class ConversationHistory:
+    """Keeps recent turns verbatim and folds older turns into a running summary.
+
+    When the verbatim turns plus the summary exceed ``token_budget``, the
+    oldest turns are moved out of the prompt immediately and summarized by a
+    background task, so the request that triggered it never waits on the
+    extra LLM call. The prompt cost of history therefore stays roughly
+    constant however long the conversation runs. ``on_change`` is awaited
+    after each background summary update, so a persisted copy can follow.
+    """
+
+    def __init__(
+        self,
+        summarizer: Optional[Summarizer] = None,
+        token_budget: int = 1024,
+        min_recent_turns: int = 2,
+    ):
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        self.min_recent_turns = min_recent_turns
+        self.messages: List[BaseMessage] = []
+        self.summary = ""
+        self._to_summarize: List[BaseMessage] = []
+        self._task: Optional[asyncio.Task] = None
+        self.on_change: Optional[Callable[[], Awaitable[None]]] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.messages or self.summary or self._to_summarize)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def prompt_messages(self) -> List[BaseMessage]:
+        """Messages to send to the LLM: the summary (if any) and recent turns."""
+        if not self.summary:
+            return list(self.messages)
+        return [SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}")] + self.messages
+
+    def token_count(self) -> int:
+        """Estimated prompt tokens used by the history."""
+        return estimate_message_tokens(self.prompt_messages())
+
+    def add_turn(self, query: str, response: str):
+        """Record an exchange and schedule summarization if over budget."""
+        self.messages.append(HumanMessage(content=query))
+        self.messages.append(AIMessage(content=response))
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        budget = self.token_budget - estimate_tokens(self.summary)
+        keep = self.min_recent_turns * 2
+        overflow: List[BaseMessage] = []
+        while len(self.messages) > keep and estimate_message_tokens(self.messages) > budget:
+            overflow.extend(self.messages[:2])
+            del self.messages[:2]
+
+        if not overflow:
+            return
+        self._to_summarize.extend(overflow)
+        logger.debug(f"Moved {len(overflow)} messages out of the prompt for summarization")
+        self._schedule_summary()
+
+    def _schedule_summary(self):
+        if self.summarizer is None:
+            self._to_summarize.clear()
+            return
+        if self._task is None or self._task.done():
+            try:
+                self._task = asyncio.get_running_loop().create_task(self._summarize_pending())
+            except RuntimeError:
+                # No event loop (sync caller): the turns wait for the next async add_turn
+                pass
+
+    async def _summarize_pending(self):
+        while self._to_summarize:
+            batch, self._to_summarize = self._to_summarize, []
+            try:
+                self.summary = await self.summarizer(self.summary, batch)
+                logger.info(f"History summary updated ({estimate_tokens(self.summary)} tokens)")
+            except Exception as e:
+                logger.error(f"History summarization failed: {e}")
+                self._to_summarize = batch + self._to_summarize
+                return
+            if self.on_change is not None:
+                await self.on_change()
+
+    def dump(self) -> Dict[str, Any]:
+        """JSON-serializable state: recent turns, turns awaiting summary and the summary."""
+        return {
+            "messages": _dump_messages(self.messages),
+            "pending": _dump_messages(self._to_summarize),
+            "summary": self.summary,
+        }
+
+    def restore(self, state: Dict[str, Any]):
+        """Replace the history with a ``dump()``; turns still awaiting summary are summarized again."""
+        self.clear()
+        self.messages = _load_messages(state.get("messages", []))
+        self._to_summarize = _load_messages(state.get("pending", []))
+        self.summary = state.get("summary", "")
+        if self._to_summarize:
+            self._schedule_summary()
+
+    async def wait_for_summary(self):
+        """Wait for any in-flight background summarization (useful in tests)."""
+        if self._task is not None:
+            await self._task
+
+    def clear(self):
+        """Drop all turns and the summary."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self.messages.clear()
+        self._to_summarize.clear()
+        self.summary = ""
@@ -1,35 +1,175 @@
 """LLM service for chat interactions."""
-from typing import List
-from langchain_ollama import ChatOllama
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, BaseMessage
+from contextlib import aclosing
+from typing import Dict, List, AsyncIterator, Optional
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, BaseMessage
 
 from ..config.settings import settings
+from ..utils.embedding_cache import get_embedding_cache, normalize_text
 from ..utils.logging import setup_logger
+from ..utils.metrics import STAGE_LATENCY
+from ..utils.singleflight import SingleFlight
+from .scheduler import get_llm_scheduler
 
 logger = setup_logger("llm_service")
 
 
+def _messages_key(messages: List[BaseMessage]) -> tuple:
+    """Identity of a prompt: the generation depends only on the messages."""
+    return tuple((message.type, str(message.content)) for message in messages)
+
+
 class LLMService:
     """Service for interacting with the LLM."""
     
     def __init__(self):
+        # Imported here: langchain_ollama is slow to import and only needed once a service is built
+        from langchain_ollama import ChatOllama, OllamaEmbeddings
+        
         logger.info("Initializing LLM...", extra={'stage': 'STARTUP'})
         self.llm = ChatOllama(
             model=settings.LLM_MODEL,
             base_url=settings.OLLAMA_BASE_URL,
             temperature=settings.LLM_TEMPERATURE,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE or None,
         )
+        self.embeddings = OllamaEmbeddings(
+            model=settings.EMBEDDING_MODEL,
+            base_url=settings.OLLAMA_BASE_URL,
+        )
+        # Identical concurrent prompts/queries share one Ollama call
+        self.generate_flight = SingleFlight("generate", enabled=settings.REQUEST_COALESCING_ENABLED)
+        self.embed_flight = SingleFlight("embed", enabled=settings.REQUEST_COALESCING_ENABLED)
         logger.info("LLM initialized successfully")
     
     def invoke(self, messages: List[BaseMessage]) -> AIMessage:
         """Invoke the LLM with a list of messages."""
         logger.info("Invoking LLM...", extra={'stage': 'LLM_INVOCATION'})
-        logger.debug(f"Total messages to LLM: {len(messages)}")
+        logger.debug("Total messages to LLM: %d", len(messages))
         
         response = self.llm.invoke(messages)
         
-        logger.info(f"LLM response received", extra={'stage': 'LLM_RESPONSE'})
-        logger.debug(f"Response length: {len(response.content)} characters")
-        logger.debug(f"Response content:\n{response.content}")
+        logger.info("LLM response received", extra={'stage': 'LLM_RESPONSE'})
+        logger.debug("Response length: %d characters", len(response.content))
+        logger.debug("Response content:\n%s", response.content, extra={'payload': True})
+        
+        return response
+    
+    async def ainvoke(self, messages: List[BaseMessage]) -> AIMessage:
+        """Invoke the LLM without blocking the event loop.
+
+        Waits for a slot from the LLM scheduler and raises LLMOverloadedError
+        when the queue is full or the wait times out.
+        """
+        logger.info("Invoking LLM (async)...", extra={'stage': 'LLM_INVOCATION'})
+        logger.debug("Total messages to LLM: %d", len(messages))
+        
+        response = await self.generate_flight.do(_messages_key(messages), lambda: self._agenerate(messages))
+        
+        logger.info("LLM response received", extra={'stage': 'LLM_RESPONSE'})
+        logger.debug("Response length: %d characters", len(response.content))
+        logger.debug("Response content:\n%s", response.content, extra={'payload': True})
         
         return response
+    
+    async def astream(self, messages: List[BaseMessage]) -> AsyncIterator[AIMessageChunk]:
+        """Stream the LLM response chunk by chunk.
+
+        Concurrent identical prompts subscribe to one generation. Closing the
+        iterator early closes the HTTP stream to Ollama once no other
+        subscriber is reading it, which stops the generation.
+        """
+        logger.info("Streaming LLM response...", extra={'stage': 'LLM_INVOCATION'})
+        logger.debug("Total messages to LLM: %d", len(messages))
+        
+        shared = self.generate_flight.stream(_messages_key(messages), lambda: self._astream_generation(messages))
+        async with aclosing(shared) as stream:
+            async for chunk in stream:
+                yield chunk
+    
+    async def _agenerate(self, messages: List[BaseMessage]) -> AIMessage:
+        async with get_llm_scheduler().slot():
+            return await self.llm.ainvoke(messages)
+    
+    async def _astream_generation(self, messages: List[BaseMessage]) -> AsyncIterator[AIMessageChunk]:
+        # The slot is held until the last token, since Ollama is busy until then
+        async with get_llm_scheduler().slot():
+            async with aclosing(self.llm.astream(messages)) as stream:
+                async for chunk in stream:
+                    yield chunk
+    
+    async def preload_chat_model(self):
+        """Have Ollama load the chat model now instead of on the first question.
+
+        An empty chat request only loads the model; ``OLLAMA_KEEP_ALIVE``
+        keeps it resident afterwards.
+        """
+        from ollama import AsyncClient
+        
+        with STAGE_LATENCY.time(stage="preload_chat"):
+            await AsyncClient(host=self.llm.base_url).chat(
+                model=self.llm.model, messages=[], keep_alive=settings.OLLAMA_KEEP_ALIVE or None
+            )
+        logger.info("Chat model %s loaded", self.llm.model, extra={'stage': 'STARTUP'})
+    
+    async def preload_embedding_model(self):
+        """Have Ollama load the embedding model with one throwaway embedding."""
+        from ollama import AsyncClient
+        
+        with STAGE_LATENCY.time(stage="preload_embed"):
+            await AsyncClient(host=self.embeddings.base_url).embed(
+                model=self.embeddings.model, input="warm up", keep_alive=settings.OLLAMA_KEEP_ALIVE or None
+            )
+        logger.info("Embedding model %s loaded", self.embeddings.model, extra={'stage': 'STARTUP'})
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """Generate a query embedding without blocking the event loop.
+
+        Repeated queries are served from the embedding cache and skip Ollama;
+        identical queries already being embedded wait for that result.
+        """
+        with STAGE_LATENCY.time(stage="embed"):
+            cache = get_embedding_cache()
+            embedding = await cache.aget(text, self.embeddings.model)
+            if embedding is not None:
+                logger.debug("Query embedding served from cache")
+                return embedding
+            
+            model = self.embeddings.model
+            return await self.embed_flight.do((model, normalize_text(text)), lambda: self._embed(text, model))
+    
+    async def aembed_documents(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """Embed many texts with batched Ollama calls, in input order.
+
+        Cached and repeated texts are embedded once; the rest go out
+        ``batch_size`` (default ``BATCH_EMBED_SIZE``) per request.
+        """
+        cache = get_embedding_cache()
+        model = self.embeddings.model
+        embeddings = await cache.aget_many(texts, model)
+        # Normalized text -> positions still needing an embedding
+        pending: Dict[str, List[int]] = {}
+        for index, embedding in enumerate(embeddings):
+            if embedding is None:
+                pending.setdefault(normalize_text(texts[index]), []).append(index)
+        
+        keys = list(pending)
+        batch_size = batch_size or settings.BATCH_EMBED_SIZE
+        with STAGE_LATENCY.time(stage="embed_batch"):
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                batch_texts = [texts[pending[key][0]] for key in batch]
+                vectors = await self.embeddings.aembed_documents(batch_texts)
+                await cache.aput_many(batch_texts, model, vectors)
+                for key, vector in zip(batch, vectors):
+                    for index in pending[key]:
+                        embeddings[index] = vector
+        logger.info(
+            "Embedded %d texts (%d cached) in %d batch calls", len(texts), len(texts) - sum(map(len, pending.values())),
+            -(-len(keys) // batch_size), extra={'stage': 'EMBEDDING_GENERATION'}
+        )
+        return embeddings
+    
+    async def _embed(self, text: str, model: str) -> List[float]:
+        embedding = await self.embeddings.aembed_query(text)
+        await get_embedding_cache().aput(text, model, embedding)
+        return embedding
@@ -1,14 +1,30 @@
 """RAG (Retrieval-Augmented Generation) service."""
+import asyncio
+import logging
 import time
-from typing import List, Tuple, Dict, Any
+from contextlib import aclosing
+from typing import List, Tuple, Dict, Any, AsyncIterator, Optional
 from langchain_core.documents import Document
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import HumanMessage, SystemMessage, BaseMessage
 
-from ..db.operations import similarity_search_with_scores
-from ..config.prompts import prompt_manager
+from ..db.operations import (
+    abatch_hybrid_search_by_vector,
+    abatch_similarity_search_by_vector,
+    ahybrid_search_by_vector,
+    asimilarity_search_by_vector,
+)
+from ..config.prompts import PromptConfig, prompt_manager
 from ..config.settings import settings
 from ..utils.logging import setup_logger
+from ..utils.embedding_cache import normalize_text
+from ..utils.metrics import ANSWERS, LLM_TOKENS, STAGE_LATENCY
+from ..utils.singleflight import SingleFlight
+from ..utils.tokens import CHARS_PER_TOKEN, estimate_message_tokens, estimate_tokens
+from .context import pack_context
+from .history import ConversationHistory
 from .llm_service import LLMService
+from .semantic_cache import get_semantic_cache
+from .sessions import DEFAULT_SESSION, SessionStore
 
 logger = setup_logger("rag_service")
 
@@ -18,90 +34,488 @@ class RAGService:
     
     def __init__(self):
         self.llm_service = LLMService()
-        self.chat_history: List[HumanMessage | AIMessage] = []
+        self.sessions = SessionStore(
+            new_history=self._new_history,
+            max_sessions=settings.SESSION_CACHE_SIZE,
+            idle_ttl=settings.SESSION_IDLE_TTL,
+            persistent=settings.SESSION_STORE == "postgres",
+        )
+        self.search_flight = SingleFlight("search", enabled=settings.REQUEST_COALESCING_ENABLED)
     
-    def process_query(self, query: str) -> Dict[str, Any]:
-        """Process a user query using RAG."""
-        total_start_time = time.time()
-        
-        # Load configuration
+    def _new_history(self) -> ConversationHistory:
+        return ConversationHistory(
+            summarizer=self._summarize_history,
+            token_budget=settings.HISTORY_TOKEN_BUDGET,
+            min_recent_turns=settings.HISTORY_MIN_RECENT_TURNS,
+        )
+    
+    async def _summarize_history(self, summary: str, messages: List[BaseMessage]) -> str:
+        """Fold older turns into the running conversation summary."""
+        template = prompt_manager.get().history_summary_prompt
+        conversation = "\n".join(
+            f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+            for message in messages
+        )
+        prompt = template.format(
+            summary=summary or "(none)",
+            conversation=conversation,
+            max_tokens=settings.HISTORY_SUMMARY_TOKENS,
+        )
+        response = await self.llm_service.ainvoke([HumanMessage(content=prompt)])
+        # Guard the budget even if the model ignores the length instruction
+        return response.content.strip()[:settings.HISTORY_SUMMARY_TOKENS * CHARS_PER_TOKEN]
+    
+    async def _search(
+        self, config: PromptConfig, query_embedding: List[float], query: str, top_k: int
+    ) -> List[Tuple[Document, float]]:
+        """Run the retrieval mode selected in the prompt config.
+
+        Identical searches already in flight are joined rather than repeated;
+        the key covers every setting that changes the results.
+        """
+        key = (
+            normalize_text(query), top_k, config.retrieval_mode, config.reranking_enabled,
+            config.hybrid_vector_weight, config.hybrid_text_weight, config.hybrid_rrf_k, config.hybrid_candidates,
+        )
+        return await self.search_flight.do(key, lambda: self._run_search(config, query_embedding, query, top_k))
+    
+    @staticmethod
+    async def _run_search(
+        config: PromptConfig, query_embedding: List[float], query: str, top_k: int
+    ) -> List[Tuple[Document, float]]:
+        if config.retrieval_mode == "hybrid":
+            return await ahybrid_search_by_vector(
+                query_embedding,
+                query,
+                k=top_k,
+                vector_weight=config.hybrid_vector_weight,
+                text_weight=config.hybrid_text_weight,
+                rrf_k=config.hybrid_rrf_k,
+                candidates=config.hybrid_candidates,
+                rerank=config.reranking_enabled,
+            )
+        return await asimilarity_search_by_vector(
+            query_embedding, query, k=top_k, rerank=config.reranking_enabled
+        )
+    
+    async def _prepare(self, query: str, history: ConversationHistory) -> Dict[str, Any]:
+        """Retrieve context and build the LLM messages for a query."""
+        # One configuration snapshot for the whole request
         config = prompt_manager.get()
-        prompt_template = config["prompt_template"]
-        similarity_threshold = config.get("similarity_threshold", settings.SIMILARITY_THRESHOLD)
-        top_k = config.get("top_k_results", settings.TOP_K_RESULTS)
-        system = SystemMessage(content=config["system_message"])
+        top_k = config.top_k_results
         
-        logger.info("=" * 80, extra={'stage': 'NEW_CHAT_REQUEST'})
-        logger.info(f"New chat request received")
-        logger.info(f"User query: {query}", extra={'stage': 'USER_INPUT'})
-        logger.debug(f"Query length: {len(query)} characters")
-        logger.debug(f"Current chat history length: {len(self.chat_history)} messages")
+        logger.info("New chat request received", extra={'stage': 'NEW_CHAT_REQUEST'})
+        logger.info("User query: %s", query, extra={'stage': 'USER_INPUT', 'payload': True})
+        logger.debug("Query length: %d characters", len(query))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Current chat history length: %d messages (~%d tokens)", len(history), history.token_count()
+            )
         
         # Perform similarity search
-        search_start_time = time.time()
-        results = similarity_search_with_scores(query, k=top_k)
-        search_time = time.time() - search_start_time
-        logger.info(f"Total search time: {search_time:.4f} seconds")
+        search_start_time = time.perf_counter()
+        logger.info("Generating query embedding...", extra={'stage': 'EMBEDDING_GENERATION'})
+        query_embedding = await self.llm_service.aembed_query(query)
+        logger.debug("Embedding generated in %.4f seconds", time.perf_counter() - search_start_time)
+        results = await self._search(config, query_embedding, query, top_k)
+        search_time = time.perf_counter() - search_start_time
+        STAGE_LATENCY.observe(search_time, stage="search")
+        logger.info("Total search time: %.4f seconds", search_time)
         
-        # Determine response strategy
+        return self._assemble(config, query, query_embedding, results, history.prompt_messages(), search_time)
+    
+    def _assemble(
+        self,
+        config: PromptConfig,
+        query: str,
+        query_embedding: List[float],
+        results: List[Tuple[Document, float]],
+        history_messages: List[BaseMessage],
+        search_time: float,
+    ) -> Dict[str, Any]:
+        """Choose the response strategy and build the LLM messages for retrieved results."""
         logger.info("Evaluating response strategy...", extra={'stage': 'RESPONSE_STRATEGY'})
+        system = SystemMessage(content=config.system_message)
+        similarity_threshold = config.similarity_threshold
         
-        if len(results) == 0 or results[0][1] < similarity_threshold:
+        # Hybrid results are in fused-rank order, so the best similarity may not be first
+        best_score = max((score for _, score in results), default=0.0)
+        if len(results) == 0 or best_score < similarity_threshold:
             logger.info("Strategy: Using general knowledge (low relevance or no results)")
-            logger.debug(
-                f"Reason: {'No results found' if len(results) == 0 else f'Best similarity score ({results[0][1]:.4f}) below threshold ({similarity_threshold})'}"
-            )
+            if results:
+                logger.debug("Reason: Best similarity score (%.4f) below threshold (%s)", best_score, similarity_threshold)
+            else:
+                logger.debug("Reason: No results found")
             
-            messages = [system] + self.chat_history + [HumanMessage(content=query)]
+            messages = [system] + history_messages + [HumanMessage(content=query)]
             context_used = False
         else:
             logger.info("Strategy: Using RAG context")
-            logger.debug(f"Best similarity score: {results[0][1]:.4f}")
+            logger.debug("Best similarity score: %.4f", best_score)
             
-            context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
-            logger.info(f"Context prepared", extra={'stage': 'CONTEXT_PREPARATION'})
-            logger.debug(f"Total context length: {len(context_text)} characters")
-            logger.debug(f"Context sources: {[doc.metadata.get('file_name', 'unknown') for doc, _ in results]}")
+            context_text, passages, pack_stats = pack_context(results, config.context_window_size)
+            logger.info(
+                "Context prepared: %d passages from %d chunks, %d tokens (%d tokens saved)",
+                pack_stats['passages'], pack_stats['chunks'], pack_stats['packed_tokens'], pack_stats['tokens_saved'],
+                extra={'stage': 'CONTEXT_PREPARATION', **pack_stats}
+            )
+            logger.debug("Total context length: %d characters", len(context_text))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Context sources: %s", [p.metadata.get('file_name', 'unknown') for p in passages])
             
-            prompt = prompt_template.format(context=context_text, question=query)
-            logger.debug(f"Final prompt length: {len(prompt)} characters")
+            prompt = config.prompt_template.format(context=context_text, question=query)
+            logger.debug("Final prompt length: %d characters", len(prompt))
             
-            messages = [system] + self.chat_history + [HumanMessage(content=prompt)]
+            messages = [system] + history_messages + [HumanMessage(content=prompt)]
             context_used = True
         
+        prompt_tokens = estimate_message_tokens(messages)
+        logger.info("Estimated prompt tokens: %d", prompt_tokens)
+        
+        return {
+            "messages": messages,
+            "results": results,
+            "context_used": context_used,
+            "search_time": search_time,
+            "prompt_tokens": prompt_tokens,
+            "query_embedding": query_embedding,
+            "source_key": tuple(doc.metadata.get("id", "") for doc, _ in results),
+            "has_history": bool(history_messages),
+        }
+    
+    @staticmethod
+    def _cache_lookup(prepared: Dict[str, Any]) -> Dict[str, Any] | None:
+        """Look up a semantically equivalent cached answer, if the query is cacheable."""
+        semantic_cache = get_semantic_cache()
+        if not semantic_cache.enabled:
+            return None
+        if prepared["has_history"]:
+            # Follow-up questions depend on earlier turns, not just the query
+            semantic_cache.record_bypass()
+            return None
+        return semantic_cache.lookup(prepared["query_embedding"], prepared["source_key"])
+    
+    @staticmethod
+    def _cache_store(prepared: Dict[str, Any], result: Dict[str, Any], generation: int):
+        if prepared["has_history"]:
+            return
+        get_semantic_cache().store(prepared["query_embedding"], prepared["source_key"], result, generation)
+    
+    async def _finish(self, session_id: str, history: ConversationHistory, query: str, response_text: str):
+        """Record a completed exchange in the session's history and persist it."""
+        history.add_turn(query, response_text)
+        logger.debug("Chat history updated. New length: %d messages", len(history))
+        await self.sessions.save(session_id, history)
+    
+    @staticmethod
+    def _record_metrics(
+        prepared: Dict[str, Any],
+        total_time: float,
+        llm_time: float | None = None,
+        usage: Dict[str, Any] | None = None,
+        output_tokens: int = 0,
+    ):
+        """Feed the request's timings, strategy and token counts to /metrics.
+
+        ``llm_time`` is None for answers served from the semantic cache.
+        Token counts come from Ollama's usage metadata when it is reported.
+        """
+        STAGE_LATENCY.observe(total_time, stage="total")
+        if llm_time is not None:
+            STAGE_LATENCY.observe(llm_time, stage="llm")
+        RAGService._record_answer(prepared, llm_time is None, usage, output_tokens)
+    
+    @staticmethod
+    def _record_answer(
+        prepared: Dict[str, Any], cached: bool, usage: Dict[str, Any] | None = None, output_tokens: int = 0
+    ):
+        """Count the answer by strategy and, for generated ones, its tokens."""
+        if cached:
+            ANSWERS.inc(strategy="cache")
+            return
+        ANSWERS.inc(strategy="context" if prepared["context_used"] else "general")
+        usage = usage or {}
+        LLM_TOKENS.inc(usage.get("input_tokens", prepared["prompt_tokens"]), direction="in")
+        LLM_TOKENS.inc(usage.get("output_tokens", output_tokens), direction="out")
+    
+    @staticmethod
+    def _sources(results: List[Tuple[Document, float]]) -> List[str]:
+        return [doc.metadata.get('file_name', 'unknown') for doc, _ in results] if results else []
+    
+    async def process_query(self, query: str, session_id: str = DEFAULT_SESSION) -> Dict[str, Any]:
+        """Process a user query using RAG, in the conversation ``session_id``.
+
+        Every blocking step (embedding, vector search, generation) is awaited,
+        so concurrent requests overlap instead of stalling the event loop.
+        """
+        total_start_time = time.perf_counter()
+        generation = get_semantic_cache().generation
+        history = await self.sessions.get(session_id)
+        prepared = await self._prepare(query, history)
+        results = prepared["results"]
+        context_used = prepared["context_used"]
+        search_time = prepared["search_time"]
+        
+        cached = self._cache_lookup(prepared)
+        if cached is not None:
+            await self._finish(session_id, history, query, cached["response"])
+            elapsed = time.perf_counter() - total_start_time
+            self._record_metrics(prepared, elapsed)
+            logger.info("Answer served from semantic cache in %.4f seconds", elapsed)
+            return cached
+        
         # Invoke LLM
-        llm_start_time = time.time()
-        response = self.llm_service.invoke(messages)
-        llm_time = time.time() - llm_start_time
+        llm_start_time = time.perf_counter()
+        response = await self.llm_service.ainvoke(prepared["messages"])
+        llm_time = time.perf_counter() - llm_start_time
         
         response_text = response.content
         
         # Update chat history
-        self.chat_history.append(HumanMessage(content=query))
-        self.chat_history.append(AIMessage(content=response_text))
-        logger.debug(f"Chat history updated. New length: {len(self.chat_history)} messages")
+        await self._finish(session_id, history, query, response_text)
         
         # Final summary
-        total_time = time.time() - total_start_time
-        logger.info("=" * 80, extra={'stage': 'REQUEST_SUMMARY'})
-        logger.info(f"Request completed successfully")
-        logger.info(f"Total processing time: {total_time:.4f} seconds")
-        logger.info(f"  - Search time: {search_time:.4f} seconds")
-        logger.info(f"  - LLM time: {llm_time:.4f} seconds")
-        logger.info(f"Context used: {context_used}")
-        logger.info(f"Results found: {len(results)}")
-        if results:
-            logger.info(f"Best similarity: {results[0][1]:.4f}")
-            logger.info(f"Source files: {[doc.metadata.get('file_name', 'unknown') for doc, _ in results]}")
-        logger.info("=" * 80)
+        total_time = time.perf_counter() - total_start_time
+        self._record_metrics(
+            prepared, total_time, llm_time,
+            usage=getattr(response, "usage_metadata", None),
+            output_tokens=estimate_tokens(response_text),
+        )
+        # One structured record instead of a line per metric
+        logger.info(
+            "Request completed successfully in %.4f seconds (search %.4f s, LLM %.4f s)",
+            total_time, search_time, llm_time,
+            extra={
+                'stage': 'REQUEST_SUMMARY',
+                'total_time': round(total_time, 4),
+                'search_time': round(search_time, 4),
+                'llm_time': round(llm_time, 4),
+                'context_used': context_used,
+                'results_found': len(results),
+                'best_similarity': results[0][1] if results else None,
+            }
+        )
         
-        return {
+        result = {
             "response": response_text,
             "context_used": context_used,
-            "sources": [doc.metadata.get('file_name', 'unknown') for doc, _ in results] if results else []
+            "sources": self._sources(results)
         }
+        self._cache_store(prepared, result, generation)
+        return result
     
-    def clear_history(self):
-        """Clear the chat history."""
-        self.chat_history.clear()
+    async def stream_query(self, query: str, session_id: str = DEFAULT_SESSION) -> AsyncIterator[Dict[str, Any]]:
+        """Process a user query in the conversation ``session_id`` and yield the answer token by token.
+
+        Yields ``{"type": "token", "content": ...}`` events while the model
+        generates, then a single ``{"type": "done", ...}`` event carrying the
+        sources and timing metrics. Chat history is only updated once the
+        stream completes; closing the generator early (e.g. on client
+        disconnect) cancels the underlying Ollama request.
+        """
+        total_start_time = time.perf_counter()
+        generation = get_semantic_cache().generation
+        history = await self.sessions.get(session_id)
+        prepared = await self._prepare(query, history)
+        results = prepared["results"]
+        
+        cached = self._cache_lookup(prepared)
+        if cached is not None:
+            await self._finish(session_id, history, query, cached["response"])
+            elapsed = time.perf_counter() - total_start_time
+            self._record_metrics(prepared, elapsed)
+            yield {"type": "token", "content": cached["response"]}
+            yield {
+                "type": "done",
+                "context_used": cached["context_used"],
+                "sources": cached["sources"],
+                "cached": True,
+                "metrics": {"time_to_first_token": round(elapsed, 4), "total_time": round(elapsed, 4)},
+            }
+            return
+        
+        llm_start_time = time.perf_counter()
+        first_token_time = None
+        final_usage = None
+        chunk_count = 0
+        parts: List[str] = []
+        
+        async with aclosing(self.llm_service.astream(prepared["messages"])) as stream:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage_metadata", None)
+                if usage:
+                    final_usage = usage
+                if not chunk.content:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - llm_start_time
+                    STAGE_LATENCY.observe(first_token_time, stage="llm_first_token")
+                chunk_count += 1
+                parts.append(chunk.content)
+                yield {"type": "token", "content": chunk.content}
+        
+        llm_time = time.perf_counter() - llm_start_time
+        response_text = "".join(parts)
+        await self._finish(session_id, history, query, response_text)
+        self._cache_store(
+            prepared,
+            {"response": response_text, "context_used": prepared["context_used"], "sources": self._sources(results)},
+            generation,
+        )
+        
+        # Ollama reports the exact count on the final chunk; fall back to chunks
+        tokens = (final_usage or {}).get("output_tokens", chunk_count)
+        generation_time = llm_time - (first_token_time or 0)
+        tokens_per_second = tokens / generation_time if generation_time > 0 else 0.0
+        total_time = time.perf_counter() - total_start_time
+        self._record_metrics(prepared, total_time, llm_time, usage=final_usage, output_tokens=chunk_count)
+        
+        logger.info(
+            "Streaming request completed successfully in %.4f seconds (%d tokens, %.2f tokens/sec)",
+            total_time, tokens, tokens_per_second,
+            extra={
+                'stage': 'REQUEST_SUMMARY',
+                'total_time': round(total_time, 4),
+                'search_time': round(prepared['search_time'], 4),
+                'time_to_first_token': round(first_token_time or 0, 4),
+                'llm_time': round(llm_time, 4),
+                'tokens': tokens,
+                'context_used': prepared['context_used'],
+            }
+        )
+        
+        yield {
+            "type": "done",
+            "context_used": prepared["context_used"],
+            "sources": self._sources(results),
+            "metrics": {
+                "time_to_first_token": round(first_token_time or 0.0, 4),
+                "tokens": tokens,
+                "tokens_per_second": round(tokens_per_second, 2),
+                "total_time": round(total_time, 4),
+            },
+        }
+    
+    @staticmethod
+    async def _batch_search(
+        config: PromptConfig, query_embeddings: List[List[float]], queries: List[str]
+    ) -> List[List[Tuple[Document, float]]]:
+        """Retrieve for every query in one SQL statement, in the configured mode."""
+        if config.retrieval_mode == "hybrid":
+            return await abatch_hybrid_search_by_vector(
+                query_embeddings,
+                queries,
+                k=config.top_k_results,
+                vector_weight=config.hybrid_vector_weight,
+                text_weight=config.hybrid_text_weight,
+                rrf_k=config.hybrid_rrf_k,
+                candidates=config.hybrid_candidates,
+                rerank=config.reranking_enabled,
+            )
+        return await abatch_similarity_search_by_vector(
+            query_embeddings, queries, k=config.top_k_results, rerank=config.reranking_enabled
+        )
+    
+    async def process_batch(self, queries: List[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Answer many independent questions with shared embedding and retrieval.
+
+        All questions are embedded with batched calls and retrieved with a
+        single SQL statement; generations then run at most ``concurrency``
+        (capped at ``BATCH_CONCURRENCY``) at a time, leaving the remaining
+        LLM slots to interactive users. Batch questions are stateless: chat
+        history is neither used nor updated, but answers do go through the
+        semantic cache, so a batch pre-warms it.
+
+        Returns one result per question, in order. A question that failed
+        carries an ``error`` message instead of a ``response``; embedding or
+        retrieval failures fail every question.
+        """
+        batch_start_time = time.perf_counter()
+        config = prompt_manager.get()
+        generation = get_semantic_cache().generation
+        concurrency = min(concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_CONCURRENCY)
+        logger.info(
+            "Batch of %d questions received (generation concurrency %d)", len(queries), concurrency,
+            extra={'stage': 'BATCH_REQUEST'}
+        )
+        
+        try:
+            search_start_time = time.perf_counter()
+            embeddings = await self.llm_service.aembed_documents(queries)
+            all_results = await self._batch_search(config, embeddings, queries)
+            search_time = time.perf_counter() - search_start_time
+        except Exception as e:
+            logger.error(f"Batch retrieval failed: {e}", exc_info=True)
+            return [{"index": index, "error": f"Retrieval failed: {e}"} for index in range(len(queries))]
+        logger.info("Batch retrieval completed in %.4f seconds", search_time)
+        
+        slots = asyncio.Semaphore(concurrency)
+        
+        async def answer(index: int, query: str, embedding: List[float], results) -> Dict[str, Any]:
+            prepared = self._assemble(config, query, embedding, results, [], search_time)
+            cached = self._cache_lookup(prepared)
+            if cached is not None:
+                self._record_answer(prepared, cached=True)
+                return {"index": index, **cached}
+            try:
+                async with slots:
+                    response = await self.llm_service.ainvoke(prepared["messages"])
+            except Exception as e:
+                logger.error(f"Batch question {index} failed: {e}", extra={'stage': 'BATCH_REQUEST'})
+                return {"index": index, "error": str(e)}
+            self._record_answer(
+                prepared, cached=False,
+                usage=getattr(response, "usage_metadata", None),
+                output_tokens=estimate_tokens(response.content),
+            )
+            result = {
+                "response": response.content,
+                "context_used": prepared["context_used"],
+                "sources": self._sources(results),
+            }
+            self._cache_store(prepared, result, generation)
+            return {"index": index, **result}
+        
+        answers = await asyncio.gather(*(
+            answer(index, query, embedding, results)
+            for index, (query, embedding, results) in enumerate(zip(queries, embeddings, all_results))
+        ))
+        
+        failed = sum(1 for item in answers if "error" in item)
+        total_time = time.perf_counter() - batch_start_time
+        STAGE_LATENCY.observe(total_time, stage="batch_total")
+        logger.info(
+            "Batch completed in %.4f seconds: %d answered, %d failed", total_time, len(answers) - failed, failed,
+            extra={
+                'stage': 'REQUEST_SUMMARY',
+                'total_time': round(total_time, 4),
+                'search_time': round(search_time, 4),
+                'questions': len(answers),
+                'failed': failed,
+            }
+        )
+        return answers
+    
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """Deduplicated-call counters for each coalescing layer."""
+        return {
+            "embed": self.llm_service.embed_flight.stats(),
+            "search": self.search_flight.stats(),
+            "generate": self.llm_service.generate_flight.stats(),
+        }
+    
+    async def clear_history(self, session_id: str = DEFAULT_SESSION):
+        """Clear the chat history of one session."""
+        await self.sessions.clear(session_id)
         logger.info("Chat history cleared")
+
+
+_rag_service: Optional[RAGService] = None
+
+
+def get_rag_service() -> RAGService:
+    """Get the API's shared RAGService, built on first use rather than at import."""
+    global _rag_service
+    if _rag_service is None:
+        _rag_service = RAGService()
+    return _rag_service
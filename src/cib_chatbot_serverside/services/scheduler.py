@@ -0,0 +1,179 @@
+"""Admission control and fair scheduling for LLM generations."""
+import asyncio
+import contextvars
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from ..config.settings import settings
+from ..utils.logging import setup_logger
+from ..utils.metrics import LLM_QUEUE_WAIT, LLM_REJECTED
+
+logger = setup_logger("llm_scheduler")
+
+_client_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("client_id", default=None)
+
+
+def set_client_id(client_id: Optional[str]):
+    """Identify the caller of the current request for per-client fairness."""
+    _client_id.set(client_id)
+
+
+class LLMOverloadedError(Exception):
+    """Raised when a generation cannot be admitted; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: int, reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class LLMScheduler:
+    """Limit concurrent generations and queue the rest fairly.
+
+    At most ``max_concurrent`` generations run at once, matching what the
+    Ollama box can actually serve; running more only makes every one of them
+    slower. Up to ``queue_size`` more wait, each client in its own FIFO, and
+    freed slots go round-robin across clients so one noisy caller cannot
+    starve the others (it may also hold at most ``per_client`` queue places).
+    Callers beyond that, or waiting longer than ``max_wait`` seconds, are
+    rejected with LLMOverloadedError instead of timing out later. Must be
+    used from a single event loop.
+    """
+
+    def __init__(self, max_concurrent: int = 4, queue_size: int = 32, per_client: int = 8, max_wait: float = 30.0):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.per_client = per_client
+        self.max_wait = max_wait
+        self._active = 0
+        # Client -> waiting futures, in round-robin order
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._queued = 0
+        # Moving average of how long a generation holds its slot
+        self._service_time = 1.0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_time_max = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is likely to have drained."""
+        backlog = (self._queued + 1) / max(1, self.max_concurrent)
+        return max(1, math.ceil(self._service_time * backlog))
+
+    def _reject(self, reason: str, message: str) -> LLMOverloadedError:
+        self.rejected += 1
+        LLM_REJECTED.inc(reason=reason)
+        retry_after = self.retry_after()
+        logger.warning("%s; retry after %d s", message, retry_after, extra={'stage': 'LLM_ADMISSION', 'reason': reason})
+        return LLMOverloadedError(message, retry_after, reason)
+
+    def check_admission(self, client_id: Optional[str] = None):
+        """Fail fast if a new generation for this client would be rejected right now."""
+        client = client_id or _client_id.get() or "anonymous"
+        if self._active < self.max_concurrent and self._queued == 0:
+            return
+        if self._queued >= self.queue_size:
+            raise self._reject("queue_full", "LLM queue is full")
+        if len(self._queues.get(client, ())) >= self.per_client:
+            raise self._reject("client_queue_full", "Too many queued requests from this client")
+
+    @asynccontextmanager
+    async def slot(self, client_id: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold one generation slot for the duration of the block."""
+        client = client_id or _client_id.get() or "anonymous"
+        start = time.perf_counter()
+        await self._acquire(client)
+        wait = time.perf_counter() - start
+        LLM_QUEUE_WAIT.observe(wait)
+        self.admitted += 1
+        self.wait_time_max = max(self.wait_time_max, wait)
+        if wait > 0:
+            logger.debug("LLM slot acquired after %.4f seconds", wait)
+        held_since = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.perf_counter() - held_since)
+            self._release()
+
+    async def _acquire(self, client: str):
+        self.check_admission(client)
+        if self._active < self.max_concurrent and self._queued == 0:
+            self._active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(waiter)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            self._discard(client, waiter)
+            self.timeouts += 1
+            raise self._reject("timeout", f"No LLM slot became free within {self.max_wait:g} seconds") from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the caller went away
+                self._release()
+            else:
+                self._discard(client, waiter)
+            raise
+
+    def _discard(self, client: str, waiter: asyncio.Future):
+        queue = self._queues.get(client)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[client]
+
+    def _release(self):
+        # Hand the slot straight to the next client in round-robin order
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Slot usage, queue depth and admission counters."""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self._active,
+            "queued": self._queued,
+            "queued_clients": len(self._queues),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_time_max": round(self.wait_time_max, 4),
+            "avg_service_time": round(self._service_time, 4),
+        }
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Get the process-wide LLM scheduler (all LLMService instances share the Ollama box)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            max_concurrent=settings.LLM_MAX_CONCURRENCY,
+            queue_size=settings.LLM_QUEUE_SIZE,
+            per_client=settings.LLM_QUEUE_PER_CLIENT,
+            max_wait=settings.LLM_QUEUE_TIMEOUT,
+        )
+    return _scheduler
@@ -0,0 +1,131 @@
+"""Semantic response cache for near-paraphrased questions."""
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config.settings import settings
+from ..utils.logging import setup_logger
+
+logger = setup_logger("semantic_cache")
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+class SemanticCache:
+    """Bounded cache of answers keyed by question embedding and retrieved sources.
+
+    A lookup only compares against entries that retrieved exactly the same
+    chunks, so the linear cosine scan stays small. Entries written while an
+    invalidation happened in between are dropped, so an answer generated from
+    the old corpus never lands in the cache after ingestion.
+    """
+
+    def __init__(self, max_size: int = 512, max_distance: float = 0.05, enabled: bool = True):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.enabled = enabled and max_size > 0
+        self._entries: "OrderedDict[int, Tuple[Tuple[str, ...], List[float], Dict[str, Any]]]" = OrderedDict()
+        self._by_sources: Dict[Tuple[str, ...], List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, embedding: List[float], source_key: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """Return a cached result for a close-enough question with the same sources."""
+        if not self.enabled:
+            return None
+        query = _normalize(embedding)
+        with self._lock:
+            best_id, best_distance = None, None
+            for entry_id in self._by_sources.get(source_key, ()):
+                _, cached_embedding, _ = self._entries[entry_id]
+                distance = 1.0 - sum(a * b for a, b in zip(query, cached_embedding))
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    best_id, best_distance = entry_id, distance
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            logger.debug(f"Semantic cache hit at cosine distance {best_distance:.4f}")
+            return dict(self._entries[best_id][2])
+
+    def store(self, embedding: List[float], source_key: Tuple[str, ...], result: Dict[str, Any], generation: int):
+        """Cache a result computed while the cache was at ``generation``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (source_key, _normalize(embedding), dict(result))
+            self._by_sources.setdefault(source_key, []).append(entry_id)
+            while len(self._entries) > self.max_size:
+                old_id, (old_key, _, _) = self._entries.popitem(last=False)
+                ids = self._by_sources[old_key]
+                ids.remove(old_id)
+                if not ids:
+                    del self._by_sources[old_key]
+                self.evictions += 1
+
+    def record_bypass(self):
+        """Count a request that skipped the cache because it depends on history."""
+        with self._lock:
+            self.bypassed += 1
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the document corpus changed."""
+        with self._lock:
+            self._entries.clear()
+            self._by_sources.clear()
+            self.generation += 1
+            self.invalidations += 1
+        logger.info("Semantic cache invalidated", extra={'stage': 'CACHE'})
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache: Optional[SemanticCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get the process-wide semantic cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache(
+                    max_size=settings.SEMANTIC_CACHE_SIZE,
+                    max_distance=settings.SEMANTIC_CACHE_MAX_DISTANCE,
+                    enabled=settings.SEMANTIC_CACHE_ENABLED,
+                )
+    return _cache
@@ -0,0 +1,165 @@
+"""Per-session conversation histories: a hot in-process LRU over the chat_sessions table."""
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..db.sessions import delete_session, ensure_sessions_table, expire_sessions, load_session, save_session
+from ..utils.logging import setup_logger
+from ..utils.singleflight import SingleFlight
+from .history import ConversationHistory
+
+logger = setup_logger("sessions")
+
+# Session used by direct callers (scripts, tests) that don't pass one
+DEFAULT_SESSION = "default"
+
+
+class SessionStore:
+    """Conversation histories keyed by session ID.
+
+    The most recently used ``max_sessions`` histories stay in memory; with
+    ``persistent`` every completed turn is also written to Postgres, so any
+    worker can continue a conversation another one started. Each write
+    notifies the other workers (``invalidate``) to drop their cached copy.
+    Sessions idle for ``idle_ttl`` seconds are forgotten. Database errors
+    are logged and the conversation carries on from the cached copy.
+    """
+
+    def __init__(
+        self,
+        new_history: Callable[[], ConversationHistory],
+        max_sessions: int = 1000,
+        idle_ttl: float = 86400.0,
+        persistent: bool = True,
+    ):
+        self.new_history = new_history
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.persistent = persistent
+        # Tags this process's notifications so it ignores its own writes
+        self.origin = uuid.uuid4().hex
+        self._sessions: "OrderedDict[str, Tuple[ConversationHistory, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loads = SingleFlight("session_load")
+        self._table_ready = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expired = 0
+        self.errors = 0
+
+    async def get(self, session_id: str) -> ConversationHistory:
+        """The history of ``session_id``, loaded from Postgres on a cache miss."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and time.monotonic() - entry[1] <= self.idle_ttl:
+                self._sessions.move_to_end(session_id)
+                self._sessions[session_id] = (entry[0], time.monotonic())
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        return await self._loads.do(session_id, lambda: self._load(session_id))
+
+    async def _load(self, session_id: str) -> ConversationHistory:
+        history = self.new_history()
+        history.on_change = lambda: self.save(session_id, history)
+        if self.persistent:
+            try:
+                state = await asyncio.to_thread(self._db, load_session, session_id, self.idle_ttl)
+                if state is not None:
+                    history.restore(state)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Loading session {session_id} failed: {e}", extra={'stage': 'SESSIONS'})
+        with self._lock:
+            self._sessions[session_id] = (history, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return history
+
+    def _db(self, operation, *args):
+        if not self._table_ready:
+            ensure_sessions_table()
+            self._table_ready = True
+        return operation(*args)
+
+    async def save(self, session_id: str, history: ConversationHistory):
+        """Persist the session after a completed turn or summary update."""
+        if not self.persistent:
+            return
+        try:
+            await asyncio.to_thread(self._db, save_session, session_id, history.dump(), self.origin)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Saving session {session_id} failed: {e}", extra={'stage': 'SESSIONS'})
+
+    async def clear(self, session_id: str):
+        """Forget a session in this worker and in Postgres."""
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            entry[0].clear()
+        if self.persistent:
+            try:
+                await asyncio.to_thread(self._db, delete_session, session_id, self.origin)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Deleting session {session_id} failed: {e}", extra={'stage': 'SESSIONS'})
+
+    def invalidate(self, payloads: Optional[List[str]]):
+        """Drop cached sessions another worker changed (``None``: drop them all).
+
+        Called from the notification listener thread with ``origin:session_id``
+        payloads.
+        """
+        with self._lock:
+            if payloads is None:
+                self.invalidations += len(self._sessions)
+                self._sessions.clear()
+                return
+            for payload in payloads:
+                origin, _, session_id = payload.partition(":")
+                if origin != self.origin and self._sessions.pop(session_id, None) is not None:
+                    self.invalidations += 1
+
+    async def expire(self) -> int:
+        """Drop idle sessions from the cache and from Postgres; returns how many."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, (_, used) in self._sessions.items() if now - used > self.idle_ttl]
+            for key in idle:
+                del self._sessions[key]
+        expired = len(idle)
+        if self.persistent:
+            # Postgres holds every session, including the idle ones cached here
+            try:
+                expired = await asyncio.to_thread(self._db, expire_sessions, self.idle_ttl)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Expiring sessions failed: {e}", extra={'stage': 'SESSIONS'})
+        self.expired += expired
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = len(self._sessions)
+        lookups = self.hits + self.misses
+        return {
+            "persistent": self.persistent,
+            "cached": cached,
+            "max_sessions": self.max_sessions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "expired": self.expired,
+            "errors": self.errors,
+        }
@@ -0,0 +1,72 @@
+"""Startup warm-up and readiness reporting."""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ..config.settings import settings
+from ..utils.logging import setup_logger
+
+logger = setup_logger("warmup")
+
+
+class WarmUp:
+    """Run the startup warm-up steps concurrently and track readiness.
+
+    Each step is bounded by ``timeout``. A failed or timed-out step is
+    recorded and logged but does not block readiness: everything it warms
+    (pool connections, loaded models) is also opened on demand, only slower.
+    """
+
+    def __init__(self, timeout: float = 120.0):
+        self.timeout = timeout
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None
+
+    async def run(self, steps: Dict[str, Callable[[], Awaitable[Any]]]):
+        """Run every step and mark the service ready once all have settled."""
+        self.started_at = time.time()
+        self.steps = {name: {"status": "pending"} for name in steps}
+        await asyncio.gather(*(self._run_step(name, step) for name, step in steps.items()))
+        self.finished_at = time.time()
+        failed = [name for name, step in self.steps.items() if step["status"] != "ok"]
+        logger.info(
+            "Warm-up finished in %.2f seconds%s", self.finished_at - self.started_at,
+            f" ({', '.join(failed)} failed)" if failed else "", extra={'stage': 'STARTUP'},
+        )
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[Any]]):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), self.timeout)
+            self.steps[name] = {"status": "ok"}
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            self.steps[name] = {"status": "failed", "error": error}
+            logger.error(f"Warm-up step {name} failed: {error}", extra={'stage': 'STARTUP'})
+        self.steps[name]["seconds"] = round(time.perf_counter() - start, 4)
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness plus per-step outcome and timing."""
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "failed": [name for name, step in self.steps.items() if step["status"] == "failed"],
+            "steps": self.steps,
+        }
+
+
+_warmup: Optional[WarmUp] = None
+
+
+def get_warmup() -> WarmUp:
+    """Get the process-wide warm-up tracker."""
+    global _warmup
+    if _warmup is None:
+        _warmup = WarmUp(timeout=settings.WARMUP_TIMEOUT)
+    return _warmup
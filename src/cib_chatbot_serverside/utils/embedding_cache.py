@@ -0,0 +1,249 @@
+"""Bounded LRU/TTL cache for query embeddings."""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..config.settings import settings
+from .logging import setup_logger
+
+logger = setup_logger("embedding_cache")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize query text for use as a cache key."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class EmbeddingCache:
+    """In-memory LRU cache of embeddings with a TTL and optional SQLite tier.
+
+    Keys are ``(model, normalized text)``. When ``path`` is set, entries are
+    also written to a SQLite file so the cache survives restarts; memory
+    misses fall through to disk before going to Ollama. Async callers use
+    ``aget``/``aput``, which do the SQLite I/O in a worker thread. Several
+    server workers can share the file; when it is locked, a read counts as
+    a miss and a write is skipped.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 86400.0, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes use of the SQLite connection, which is shared across threads
+        self._db_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_errors = 0
+
+        if path:
+            self._open_disk_tier(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _open_disk_tier(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=1.0)
+        try:
+            # Readers don't wait for writers in other worker processes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, embedding BLOB NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (model, text))"
+            )
+            self._db.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+        except sqlite3.OperationalError as e:
+            # Another worker is initializing the same file; it creates the table
+            self._db.rollback()
+            logger.warning(f"Embedding cache disk tier setup skipped: {e}", extra={'stage': 'STARTUP'})
+        logger.info(f"Embedding cache disk tier opened at {path}", extra={'stage': 'STARTUP'})
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Return a cached embedding, or None on a miss."""
+        if not self.enabled:
+            return None
+        key = (model, normalize_text(text))
+        embedding = self._memory_get(key)
+        if embedding is None and self._db is not None:
+            embedding = self._disk_get(key)
+        if embedding is None:
+            self._count_miss()
+        return embedding
+
+    async def aget(self, text: str, model: str) -> Optional[List[float]]:
+        """``get`` for the event loop: a memory miss reads SQLite in a worker thread."""
+        return (await self.aget_many([text], model))[0]
+
+    async def aget_many(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Look up several texts, reading all memory misses from SQLite in one worker thread."""
+        if not self.enabled:
+            return [None] * len(texts)
+        keys = [(model, normalize_text(text)) for text in texts]
+        embeddings = [self._memory_get(key) for key in keys]
+        missing = [index for index, embedding in enumerate(embeddings) if embedding is None]
+        if missing and self._db is not None:
+            found = await asyncio.to_thread(lambda: [self._disk_get(keys[index]) for index in missing])
+            for index, embedding in zip(missing, found):
+                embeddings[index] = embedding
+        for embedding in embeddings:
+            if embedding is None:
+                self._count_miss()
+        return embeddings
+
+    def put(self, text: str, model: str, embedding: List[float]):
+        """Store an embedding in memory and, if enabled, on disk."""
+        if not self.enabled:
+            return
+        key = (model, normalize_text(text))
+        created_at = time.time()
+        with self._lock:
+            self._store(key, list(embedding), created_at)
+        if self._db is not None:
+            self._disk_put([(key, embedding, created_at)])
+
+    async def aput(self, text: str, model: str, embedding: List[float]):
+        """``put`` for the event loop."""
+        await self.aput_many([text], model, [embedding])
+
+    async def aput_many(self, texts: List[str], model: str, embeddings: List[List[float]]):
+        """Store several embeddings, writing them to SQLite in one worker thread and transaction."""
+        if not self.enabled:
+            return
+        created_at = time.time()
+        rows = [((model, normalize_text(text)), list(embedding), created_at) for text, embedding in zip(texts, embeddings)]
+        with self._lock:
+            for key, embedding, _ in rows:
+                self._store(key, embedding, created_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_put, rows)
+
+    def _memory_get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            embedding, created_at = entry
+            if now - created_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+            del self._entries[key]
+            self.expirations += 1
+            return None
+
+    def _count_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _disk_get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        """Read one entry from SQLite; a locked database is a miss."""
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT embedding, created_at FROM embeddings WHERE model = ? AND text = ?",
+                    key,
+                ).fetchone()
+        except sqlite3.OperationalError as e:
+            self._disk_error("read", e)
+            return None
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        embedding = array("d", row[0]).tolist()
+        with self._lock:
+            self._store(key, embedding, row[1])
+            self.hits += 1
+            self.disk_hits += 1
+        return embedding
+
+    def _disk_put(self, rows: List[Tuple[Tuple[str, str], List[float], float]]):
+        """Write entries to SQLite in one transaction; skipped if the database is locked."""
+        try:
+            with self._db_lock:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, text, embedding, created_at) VALUES (?, ?, ?, ?)",
+                        [(key[0], key[1], array("d", embedding).tobytes(), created_at)
+                         for key, embedding, created_at in rows],
+                    )
+                    self._db.commit()
+                except sqlite3.OperationalError:
+                    self._db.rollback()
+                    raise
+        except sqlite3.OperationalError as e:
+            self._disk_error("write", e)
+
+    def _disk_error(self, operation: str, error: Exception):
+        with self._lock:
+            self.disk_errors += 1
+        logger.warning(f"Embedding cache disk {operation} failed: {error}", extra={'stage': 'EMBEDDING_CACHE'})
+
+    def _store(self, key: Tuple[str, str], embedding: List[float], created_at: float):
+        self._entries[key] = (embedding, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all cached embeddings, including the disk tier."""
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "disk_errors": self.disk_errors,
+                "disk_tier": bool(self._db is not None),
+            }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide embedding cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(
+                    max_size=settings.EMBEDDING_CACHE_SIZE,
+                    ttl=settings.EMBEDDING_CACHE_TTL,
+                    path=settings.EMBEDDING_CACHE_PATH or None,
+                )
+    return _cache
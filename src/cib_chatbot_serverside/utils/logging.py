@@ -1,50 +1,230 @@
-"""Logging configuration utilities."""
+"""Logging configuration utilities.
+
+Loggers hand records to an in-memory queue; a single background thread
+formats them and writes them to a daily-rotated file, so request handlers
+never block on disk I/O. Use %-style arguments (``logger.debug("x=%s", x)``)
+so messages below the configured level are never formatted.
+"""
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
-from ..config.settings import settings
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Optional
 
-# Ensure logs directory exists
-if not os.path.exists(settings.LOGS_DIR):
-    os.makedirs(settings.LOGS_DIR)
+from ..config.settings import settings
 
 log_filename = os.path.join(
-    settings.LOGS_DIR, 
-    f"rag_chatbot_{datetime.now().strftime('%Y-%m-%d')}.log"
+    settings.LOGS_DIR,
+    "rag_chatbot.jsonl" if settings.LOG_FORMAT == "json" else "rag_chatbot.log",
 )
 
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_payload_sampled: contextvars.ContextVar[Optional[bool]] = contextvars.ContextVar("payload_sampled", default=None)
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
 
 class DetailedFormatter(logging.Formatter):
     """Custom formatter that adds stage information."""
     
-    def format(self, record):
+    def formatMessage(self, record):
+        text = super().formatMessage(record)
         if hasattr(record, 'stage'):
-            record.msg = f"\n{'='*60}\n[STAGE: {record.stage}]\n{'='*60}\n{record.msg}"
-        return super().format(record)
+            # Decorate the output only; the record is shared with other handlers
+            header, _, message = text.partition("\n")
+            text = f"{header}\n{'='*60}\n[STAGE: {record.stage}]\n{'='*60}\n{message}"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with ``extra=`` fields as top-level keys."""
+    
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "func": record.funcName,
+            "line": record.lineno,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def sample_request_payloads(rate: Optional[float] = None) -> bool:
+    """Decide, once per request, whether its verbose payload logs are kept.
+
+    Call at the start of a request; records logged with
+    ``extra={'payload': True}`` in that context are then all kept or all
+    dropped, so sampled requests have complete traces.
+    """
+    rate = settings.LOG_PAYLOAD_SAMPLE_RATE if rate is None else rate
+    sampled = random.random() < rate
+    _payload_sampled.set(sampled)
+    return sampled
+
+
+def set_request_id(request_id: Optional[str]):
+    """Tag every record logged in the current context (and tasks/threads it spawns)."""
+    _request_id.set(request_id)
+
+
+def get_request_id() -> Optional[str]:
+    """The ID of the request being handled in the current context, if any."""
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Copy the context's request ID onto the record before it leaves the thread."""
+    
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            request_id = _request_id.get()
+            if request_id is not None:
+                record.request_id = request_id
+        return True
+
+
+class PayloadSampler(logging.Filter):
+    """Drop ``payload`` records unless the current request was sampled."""
+    
+    def filter(self, record):
+        if not getattr(record, "payload", False):
+            return True
+        sampled = _payload_sampled.get()
+        if sampled is None:
+            # Outside a request (scripts): sample per record
+            return random.random() < settings.LOG_PAYLOAD_SAMPLE_RATE
+        return sampled
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record):
+        # Merge args now (they may be mutated later) but leave the expensive
+        # formatting to the writer thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record):
+        if _listener is None and self is _queue_handler:
+            _start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_shut_down = False
+
+
+def _build_file_handler() -> logging.Handler:
+    os.makedirs(settings.LOGS_DIR, exist_ok=True)
+    file_handler = logging.handlers.TimedRotatingFileHandler(
+        log_filename,
+        when="midnight",
+        backupCount=settings.LOG_BACKUP_DAYS,
+        encoding='utf-8',
+    )
+    file_handler.setLevel(logging.DEBUG)
+    if settings.LOG_FORMAT == "json":
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(DetailedFormatter(
+            '%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d\n%(message)s\n'
+        ))
+    return file_handler
+
+
+def _get_queue_handler() -> NonBlockingQueueHandler:
+    """Create the shared queue handler; the writer starts with the first record."""
+    global _queue_handler
+    with _lock:
+        if _queue_handler is None:
+            _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+            _queue_handler.addFilter(PayloadSampler())
+            _queue_handler.addFilter(RequestIdFilter())
+        return _queue_handler
+
+
+def _start_listener():
+    """Open the log file and start the background writer, once.
+
+    Deferred until something is actually logged, so importing the package
+    creates no directories or threads.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None or _shut_down:
+            return
+        
+        # Optional: uncomment to enable console logging
+        # console_handler = logging.StreamHandler()
+        # console_handler.setLevel(logging.INFO)
+        # console_handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)-8s | %(message)s'))
+        
+        _listener = logging.handlers.QueueListener(
+            _queue_handler.queue, _build_file_handler(), respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the background writer."""
+    global _listener, _shut_down
+    with _lock:
+        _shut_down = True
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    """Queue depth and records dropped because the queue was full."""
+    handler = _queue_handler
+    if handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": handler.queue.qsize(), "dropped": handler.dropped}
 
 
 def setup_logger(name: str) -> logging.Logger:
-    """Setup and return a logger with file and console handlers."""
+    """Setup and return a logger that writes through the background queue."""
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, settings.LOG_LEVEL))
     
     if logger.handlers:
         return logger
-
-    file_handler = logging.FileHandler(log_filename, encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-    file_format = DetailedFormatter(
-        '%(asctime)s | %(levelname)-8s | %(name)s | %(funcName)s:%(lineno)d\n%(message)s\n'
-    )
-    file_handler.setFormatter(file_format)
-    
-    # Optional: uncomment to enable console logging
-    # console_handler = logging.StreamHandler()
-    # console_handler.setLevel(logging.INFO)
-    # console_format = logging.Formatter('%(asctime)s | %(levelname)-8s | %(message)s')
-    # console_handler.setFormatter(console_format)
-    # logger.addHandler(console_handler)
     
-    logger.addHandler(file_handler)
+    logger.addHandler(_get_queue_handler())
     
     return logger
@@ -0,0 +1,160 @@
+"""In-flight request coalescing ("singleflight").
+
+When identical work is requested while an earlier copy is still running,
+callers join the running computation instead of starting another one: a
+burst of the same question costs one embedding, one vector search and one
+generation. Nothing is kept once the computation finishes; this is not a
+cache.
+"""
+import asyncio
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from .metrics import COALESCED
+
+T = TypeVar("T")
+
+
+class _Call:
+    """A running computation and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    """Items produced so far by a shared stream, replayed to every subscriber."""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """Share one in-flight computation among concurrent callers with the same key.
+
+    ``do()`` coalesces coroutines and ``stream()`` async iterators; late
+    stream subscribers first receive the items already produced. The shared
+    work runs in its own task, so one caller going away (e.g. a client
+    disconnect) does not fail the others; it is cancelled only once every
+    caller has left. Must be used from a single event loop.
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def _joined(self):
+        self.shared += 1
+        COALESCED.inc(layer=self.name)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return ``await fn()``, or the result of the identical call already running."""
+        if not self.enabled:
+            return await fn()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.leaders += 1
+        else:
+            self._joined()
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Everyone gave up; new callers must not join a cancelled task
+                self._forget(self._calls, key, call)
+                call.task.cancel()
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Yield the items of ``factory()``, shared with identical streams in flight."""
+        if not self.enabled:
+            async with aclosing(factory()) as source:
+                async for item in source:
+                    yield item
+            return
+
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, factory))
+            self.leaders += 1
+        else:
+            self._joined()
+
+        broadcast.subscribers += 1
+        index = 0
+        try:
+            while True:
+                if index < len(broadcast.items):
+                    index += 1
+                    yield broadcast.items[index - 1]
+                elif broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                else:
+                    await broadcast.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # Closing the source stops the upstream generation; wait for it
+                # so the upstream request is closed when aclose() returns
+                self._forget(self._streams, key, broadcast)
+                broadcast.task.cancel()
+                await asyncio.wait([broadcast.task])
+
+    async def _pump(self, key: Hashable, broadcast: _Broadcast, factory: Callable[[], AsyncIterator[T]]):
+        try:
+            async with aclosing(factory()) as source:
+                async for item in source:
+                    broadcast.items.append(item)
+                    broadcast.notify()
+        except asyncio.CancelledError:
+            broadcast.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            broadcast.done = True
+            broadcast.notify()
+            self._forget(self._streams, key, broadcast)
+
+    @staticmethod
+    def _forget(registry: Dict[Hashable, Any], key: Hashable, entry: Any):
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters: computations started and calls that joined one."""
+        calls = self.leaders + self.shared
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls) + len(self._streams),
+            "executed": self.leaders,
+            "coalesced": self.shared,
+            "coalesced_rate": round(self.shared / calls, 4) if calls else 0.0,
+        }
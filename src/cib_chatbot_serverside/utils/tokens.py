@@ -0,0 +1,17 @@
+"""Cheap token count estimates for prompt budgeting."""
+from typing import Iterable
+
+from langchain_core.messages import BaseMessage
+
+# Llama-family tokenizers average roughly four characters per token on English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in ``text``."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(messages: Iterable[BaseMessage]) -> int:
+    """Estimate tokens for a list of chat messages, including per-message overhead."""
+    return sum(estimate_tokens(message.content) + 4 for message in messages)
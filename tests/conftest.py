@@ -0,0 +1,181 @@
+"""Shared test fixtures with stubbed Ollama and database calls."""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+EMBED_LATENCY = 0.05
+DB_LATENCY = 0.05
+LLM_LATENCY = 0.2
+
+# Set before the package reads its settings: records logged while test
+# modules are imported already start the log writer (subprocesses inherit it)
+TEST_LOGS_DIR = tempfile.mkdtemp(prefix="cib-chatbot-test-logs-")
+os.environ["LOGS_DIR"] = TEST_LOGS_DIR
+
+
+class FakeEmbeddings:
+    """Embeddings stand-in that sleeps like a network round trip."""
+
+    model = "fake-embed"
+
+    def __init__(self):
+        self.calls = 0
+        self.batches = []
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        await asyncio.sleep(EMBED_LATENCY)
+        return [0.1, 0.2, 0.3]
+
+    async def aembed_documents(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(EMBED_LATENCY)
+        return [[0.1, 0.2, float(len(text))] for text in texts]
+
+
+class FakeChatModel:
+    """Chat model stand-in that sleeps like a generation."""
+
+    def __init__(self, answer="stub answer", token_delay=0.01):
+        self.answer = answer
+        self.token_delay = token_delay
+        self.calls = 0
+        self.stream_closed = False
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(LLM_LATENCY)
+        return AIMessage(content=self.answer)
+
+    async def astream(self, messages):
+        self.calls += 1
+        tokens = self.answer.split(" ")
+        try:
+            for i, token in enumerate(tokens):
+                await asyncio.sleep(self.token_delay)
+                yield AIMessageChunk(content=token if i == 0 else " " + token)
+            yield AIMessageChunk(
+                content="",
+                usage_metadata={"input_tokens": 10, "output_tokens": len(tokens), "total_tokens": 10 + len(tokens)},
+            )
+        finally:
+            self.stream_closed = True
+
+
+def fake_search(query_embedding, query, k=3, **options):
+    """Blocking search stand-in, mirroring psycopg2."""
+    time.sleep(DB_LATENCY)
+    return [(Document(page_content="ctx", metadata={"file_name": "doc.pdf"}), 0.9)]
+
+
+def fake_batch_search(query_embeddings, queries, k=3, **options):
+    """Blocking batch search stand-in: one round trip for all queries."""
+    time.sleep(DB_LATENCY)
+    return [
+        [(Document(page_content=f"ctx for {query}", metadata={"file_name": "doc.pdf"}), 0.9)]
+        for query in queries
+    ]
+
+
+def stub_service(service):
+    """Replace the Ollama clients of a RAGService with fakes."""
+    service.llm_service.embeddings = FakeEmbeddings()
+    service.llm_service.llm = FakeChatModel()
+    return service
+
+
+@pytest.fixture(autouse=True, scope="session")
+def logs_in_tmp_path():
+    """Keep log files out of the repo's logs/ and delete them after the run."""
+    from cib_chatbot_serverside.config.settings import settings
+    from cib_chatbot_serverside.utils.logging import shutdown_logging
+
+    assert settings.LOGS_DIR == TEST_LOGS_DIR
+    yield
+    shutdown_logging()
+    shutil.rmtree(TEST_LOGS_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_embedding_cache():
+    """Give every test an empty in-memory embedding cache."""
+    from cib_chatbot_serverside.utils import embedding_cache
+
+    embedding_cache._cache = embedding_cache.EmbeddingCache(max_size=128, ttl=60)
+    yield embedding_cache._cache
+    embedding_cache._cache = None
+
+
+@pytest.fixture(autouse=True)
+def fresh_semantic_cache():
+    """Give every test a disabled semantic cache unless it opts in."""
+    from cib_chatbot_serverside.services import semantic_cache
+
+    semantic_cache._cache = semantic_cache.SemanticCache(enabled=False)
+    yield
+    semantic_cache._cache = None
+
+
+@pytest.fixture(autouse=True)
+def fresh_llm_scheduler():
+    """Give every test an idle LLM scheduler with the configured limits."""
+    from cib_chatbot_serverside.services import scheduler
+
+    scheduler._scheduler = None
+    yield
+    scheduler._scheduler = None
+
+
+@pytest.fixture(autouse=True)
+def no_local_index():
+    """Keep searches on the (patched) Postgres path unless a test installs an index."""
+    from cib_chatbot_serverside.db import local_index
+
+    with patch.object(local_index.settings, "LOCAL_INDEX_ENABLED", False):
+        local_index._index = None
+        yield
+    local_index._index = None
+
+
+@pytest.fixture(autouse=True)
+def memory_sessions():
+    """Keep conversations in memory; there is no Postgres in the test environment."""
+    from cib_chatbot_serverside.config.settings import settings
+
+    with patch.object(settings, "SESSION_STORE", "memory"):
+        yield
+
+
+@pytest.fixture
+def fake_db():
+    """Patch the pgvector search with a blocking fake."""
+    with patch("cib_chatbot_serverside.db.operations.similarity_search_by_vector", fake_search), \
+            patch("cib_chatbot_serverside.db.operations.hybrid_search_by_vector", fake_search), \
+            patch("cib_chatbot_serverside.db.operations.batch_similarity_search_by_vector", fake_batch_search), \
+            patch("cib_chatbot_serverside.db.operations.batch_hybrid_search_by_vector", fake_batch_search):
+        yield
+
+
+@pytest.fixture
+def rag_service(fake_db):
+    """A RAGService wired to fake Ollama clients and a fake database."""
+    from cib_chatbot_serverside.services import RAGService
+
+    return stub_service(RAGService())
+
+
+@pytest.fixture
+def app_service(fake_db):
+    """A fresh, stubbed instance as the API's shared RAGService."""
+    from cib_chatbot_serverside.services import rag_service
+
+    rag_service._rag_service = stub_service(rag_service.RAGService())
+    yield rag_service._rag_service
+    rag_service._rag_service = None
@@ -0,0 +1,62 @@
+"""Concurrency tests for the async chat pipeline with a stubbed Ollama."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from .conftest import EMBED_LATENCY, DB_LATENCY, LLM_LATENCY
+
+
+@pytest.mark.asyncio
+async def test_process_query_returns_context_answer(rag_service):
+    """A single async query goes through embed, search and generation."""
+    result = await rag_service.process_query("What is in the doc?")
+
+    assert result["response"] == "stub answer"
+    assert result["context_used"] is True
+    assert result["sources"] == ["doc.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_overlap(rag_service):
+    """Throughput scales with concurrency instead of queueing serially."""
+    per_request = EMBED_LATENCY + DB_LATENCY + LLM_LATENCY
+
+    start = time.perf_counter()
+    await rag_service.process_query("warm up")
+    single = time.perf_counter() - start
+
+    concurrency = 8
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(rag_service.process_query(f"question {i}") for i in range(concurrency))
+    )
+    elapsed = time.perf_counter() - start
+
+    assert len(results) == concurrency
+    assert single >= per_request
+    # Serial execution would take concurrency * per_request seconds.
+    assert elapsed < concurrency * per_request / 3
+
+
+@pytest.mark.asyncio
+async def test_health_not_blocked_by_chat(app_service):
+    """The event loop keeps serving /api/health while a chat is generating."""
+    from cib_chatbot_serverside.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        chat = asyncio.create_task(client.post("/api/chat", json={"message": "hi"}))
+        await asyncio.sleep(0.01)
+
+        start = time.perf_counter()
+        health = await client.get("/api/health")
+        health_time = time.perf_counter() - start
+
+        chat_response = await chat
+
+    assert health.status_code == 200
+    assert health_time < LLM_LATENCY
+    assert chat_response.status_code == 200
+    assert chat_response.json()["response"] == "stub answer"
@@ -0,0 +1,93 @@
+"""Tests for batch question answering."""
+
+import httpx
+import pytest
+
+from cib_chatbot_serverside.config.settings import settings
+from cib_chatbot_serverside.services import DEFAULT_SESSION
+
+
+@pytest.mark.asyncio
+async def test_batch_embeds_together_and_answers_in_order(rag_service, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_EMBED_SIZE", 2)
+    questions = ["q0", "q1", "q2", "q1"]
+
+    results = await rag_service.process_batch(questions)
+
+    assert [item["index"] for item in results] == [0, 1, 2, 3]
+    assert all(item["response"] == "stub answer" and item["context_used"] for item in results)
+    embeddings = rag_service.llm_service.embeddings
+    # Duplicates are embedded once, two texts per Ollama call
+    assert embeddings.batches == [["q0", "q1"], ["q2"]]
+    assert embeddings.calls == 0
+    # Batch questions leave the chat history alone
+    assert (await rag_service.sessions.get(DEFAULT_SESSION)).messages == []
+
+
+@pytest.mark.asyncio
+async def test_batch_generation_parallelism_is_bounded(rag_service, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_CONCURRENCY", 2)
+    llm = rag_service.llm_service.llm
+    active = peak = 0
+    original = llm.ainvoke
+
+    async def tracking_ainvoke(messages):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            return await original(messages)
+        finally:
+            active -= 1
+
+    llm.ainvoke = tracking_ainvoke
+    await rag_service.process_batch([f"question {i}" for i in range(6)], concurrency=10)
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_partial_failures(rag_service):
+    llm = rag_service.llm_service.llm
+    original = llm.ainvoke
+
+    async def flaky_ainvoke(messages):
+        if "bad" in messages[-1].content:
+            raise RuntimeError("model crashed")
+        return await original(messages)
+
+    llm.ainvoke = flaky_ainvoke
+    results = await rag_service.process_batch(["good one", "bad one", "good two"])
+
+    assert [("error" in item) for item in results] == [False, True, False]
+    assert results[1]["error"] == "model crashed"
+    assert results[2]["response"] == "stub answer"
+
+
+@pytest.mark.asyncio
+async def test_batch_retrieval_failure_fails_every_question(rag_service):
+    async def broken(texts):
+        raise ConnectionError("ollama down")
+
+    rag_service.llm_service.embeddings.aembed_documents = broken
+    results = await rag_service.process_batch(["a", "b"])
+
+    assert [item["index"] for item in results] == [0, 1]
+    assert all("ollama down" in item["error"] for item in results)
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint(app_service):
+    from cib_chatbot_serverside.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/chat/batch", json={"messages": ["one", "two"]})
+        empty = await client.post("/api/chat/batch", json={"messages": []})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["succeeded"] == 2 and body["failed"] == 0
+    assert [item["index"] for item in body["results"]] == [0, 1]
+    assert body["results"][0]["sources"] == ["doc.pdf"]
+    assert empty.status_code == 422
@@ -0,0 +1,89 @@
+"""Tests for the offline load-testing helpers in benchmarks/."""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from langchain_ollama import ChatOllama, OllamaEmbeddings
+
+from benchmarks.fake_ollama import FakeOllama, fake_embedding
+from benchmarks.load_test import compare, run_load, summarize
+from benchmarks.stores import InMemoryVectorStore, sample_queries, synthetic_corpus
+
+
+def test_summarize_percentiles():
+    stats = summarize([i / 100 for i in range(1, 101)])
+    assert stats["count"] == 100
+    assert stats["p50"] == pytest.approx(0.505)
+    assert stats["p99"] == pytest.approx(0.9901)
+    assert summarize([]) == {"count": 0}
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"stages": {"llm": {"count": 10, "p95": 1.0}, "search": {"count": 10, "p95": 0.1}}, "throughput": 10.0}
+    current = {"stages": {"llm": {"count": 10, "p95": 1.05}, "search": {"count": 10, "p95": 0.2}}, "throughput": 8.0}
+
+    regressions = compare(current, baseline, tolerance=0.1)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("search:")
+    assert regressions[1].startswith("throughput:")
+    assert compare(baseline, baseline) == []
+
+
+def test_fake_ollama_speaks_the_client_wire_format():
+    with FakeOllama(embed_latency=0, generate_latency=0, token_latency=0, tokens=3, dims=8) as fake:
+        llm = ChatOllama(model="fake", base_url=fake.base_url)
+        embeddings = OllamaEmbeddings(model="fake", base_url=fake.base_url)
+
+        async def exercise():
+            answer = await llm.ainvoke("hello")
+            chunks = [chunk async for chunk in llm.astream("hello")]
+            vector = await embeddings.aembed_query("hello world")
+            return answer, chunks, vector
+
+        answer, chunks, vector = asyncio.run(exercise())
+
+    assert answer.content == "token0 token1 token2"
+    assert answer.usage_metadata["output_tokens"] == 3
+    assert "".join(chunk.content for chunk in chunks) == "token0 token1 token2"
+    assert chunks[-1].usage_metadata["output_tokens"] == 3
+    assert vector == fake_embedding("hello world", 8)
+    assert fake.requests == {"embed": 1, "chat": 2}
+
+
+def test_in_memory_store_finds_the_source_chunk():
+    corpus = synthetic_corpus(200)
+    store = InMemoryVectorStore(corpus, latency=0, dims=256)
+    chunk = corpus[17]
+
+    results = store.search(fake_embedding(chunk.page_content, 256), chunk.page_content, k=3)
+
+    assert results[0][0] is chunk
+    assert results[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert len(sample_queries(corpus, 5)) == 5
+
+
+@pytest.mark.parametrize("options", [{"concurrency": 3, "requests": 10}, {"rate": 200, "requests": 10}])
+def test_run_load_counts_requests_and_errors(options):
+    app = FastAPI()
+
+    @app.post("/api/chat")
+    async def chat(body: dict):
+        if body["message"] == "fail":
+            raise HTTPException(status_code=500)
+        await asyncio.sleep(0.001)
+        return {"response": "ok"}
+
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_load(client, ["a", "b", "c", "d", "fail"], **options)
+
+    report = asyncio.run(drive())
+
+    assert report["requests"] == 10
+    assert report["errors"] == 2
+    assert len(report["samples"]["client_total"]) == 8
+    assert report["throughput"] > 0
@@ -0,0 +1,111 @@
+"""Tests for the PostgreSQL connection pool using fake connections."""
+import threading
+import time
+
+import pytest
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+from cib_chatbot_serverside.db.connection import ConnectionPool
+
+
+class FakeInfo:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    """Minimal stand-in for a psycopg2 connection."""
+
+    def __init__(self):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    return ConnectionPool(connect=connect, **kwargs), created
+
+
+def test_warm_up_opens_min_size_connections():
+    pool, created = make_pool(min_size=3, max_size=5)
+    pool.warm_up()
+
+    assert len(created) == 3
+    assert pool.stats()["idle"] == 3
+
+    with pool.connection():
+        pass
+    # Checkout reuses a warm connection instead of opening a new one
+    assert len(created) == 3
+
+
+def test_connections_are_reused_and_rolled_back():
+    pool, created = make_pool(min_size=0, max_size=2)
+    with pool.connection() as conn:
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+    with pool.connection() as again:
+        pass
+
+    assert again is conn
+    assert conn.rollbacks == 1
+    assert len(created) == 1
+
+
+def test_closed_connection_is_replaced_on_checkout():
+    pool, created = make_pool(min_size=1, max_size=1)
+    pool.warm_up()
+    created[0].closed = 1
+
+    with pool.connection() as conn:
+        assert conn is not created[0]
+    assert pool.stats()["discarded"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_checkout_waits_for_release_and_records_stats():
+    pool, _ = make_pool(min_size=0, max_size=1, timeout=5)
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def holder():
+        with pool.connection():
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    acquired.wait()
+
+    threading.Timer(0.1, release.set).start()
+    with pool.connection():
+        stats = pool.stats()
+    thread.join()
+
+    assert stats["in_use"] == 1
+    assert pool.stats()["waits"] == 1
+    assert pool.stats()["wait_time_max"] >= 0.05
+
+
+def test_checkout_times_out_when_exhausted():
+    pool, _ = make_pool(min_size=0, max_size=1, timeout=0.05)
+    with pool.connection():
+        start = time.monotonic()
+        with pytest.raises(PoolError):
+            with pool.connection():
+                pass
+        assert time.monotonic() - start >= 0.05
+    assert pool.stats()["in_use"] == 0
@@ -0,0 +1,67 @@
+"""Tests for context packing: merging, deduplication and the token budget."""
+from langchain_core.documents import Document
+
+from cib_chatbot_serverside.services.context import (
+    CONTEXT_SEPARATOR,
+    drop_near_duplicates,
+    merge_adjacent,
+    pack_context,
+)
+from cib_chatbot_serverside.utils.tokens import estimate_tokens
+
+TEXT = "".join(f"sentence number {i} of the handbook. " for i in range(100))
+
+
+def chunk(start, end, score, source="handbook.pdf", page=0):
+    metadata = {"source": source, "page": page, "start_index": start, "id": f"{source}:{page}:{start}"}
+    return Document(page_content=TEXT[start:end], metadata=metadata), score
+
+
+def test_overlapping_chunks_are_merged_once():
+    results = [chunk(0, 1000, 0.9), chunk(800, 1800, 0.7), chunk(3000, 3500, 0.5)]
+
+    passages = merge_adjacent(results)
+
+    assert len(passages) == 2
+    assert passages[0].text == TEXT[0:1800]
+    assert passages[0].score == 0.9
+    assert passages[0].chunk_ids == ["handbook.pdf:0:0", "handbook.pdf:0:800"]
+    assert passages[1].text == TEXT[3000:3500]
+
+
+def test_chunks_of_other_pages_are_not_merged():
+    passages = merge_adjacent([chunk(0, 500, 0.9), chunk(400, 900, 0.8, page=1)])
+
+    assert len(passages) == 2
+
+
+def test_near_duplicates_keep_best_score():
+    results = [
+        (Document(page_content=TEXT[:1000], metadata={"source": "a.pdf"}), 0.6),
+        (Document(page_content=TEXT[:1000] + " extra", metadata={"source": "b.pdf"}), 0.8),
+        (Document(page_content="something else entirely", metadata={"source": "c.pdf"}), 0.5),
+    ]
+
+    passages = drop_near_duplicates(merge_adjacent(results))
+
+    assert [p.metadata["source"] for p in passages] == ["b.pdf", "c.pdf"]
+
+
+def test_pack_respects_budget_and_reports_savings():
+    results = [chunk(0, 1000, 0.9), chunk(800, 1800, 0.8), chunk(2000, 3000, 0.7), chunk(3000, 4000, 0.1)]
+
+    context_text, passages, stats = pack_context(results, token_budget=600)
+
+    assert estimate_tokens(context_text) <= 600
+    assert stats["chunks"] == 4
+    assert stats["packed_tokens"] < stats["naive_tokens"]
+    assert stats["tokens_saved"] == stats["naive_tokens"] - stats["packed_tokens"]
+    assert context_text.count(CONTEXT_SEPARATOR) == len(passages) - 1
+
+
+def test_best_passage_is_trimmed_when_over_budget():
+    context_text, passages, _ = pack_context([chunk(0, 4000, 0.9)], token_budget=100)
+
+    assert len(passages) == 1
+    assert estimate_tokens(context_text) <= 100
+    assert TEXT.startswith(context_text)
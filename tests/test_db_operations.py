@@ -0,0 +1,343 @@
+"""Tests for the similarity search query shape."""
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import psycopg2.errors
+import pytest
+
+from cib_chatbot_serverside.db import notifications, operations, schema
+
+
+class RecordingCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def execute(self, sql, params=None):
+        self.calls.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class RecordingPool:
+    def __init__(self, cursor):
+        self.cur = cursor
+
+    @contextmanager
+    def connection(self):
+        pool = self
+
+        class Conn:
+            def cursor(self):
+                return pool.cur
+
+            def commit(self):
+                pass
+
+            def rollback(self):
+                pass
+
+        yield Conn()
+
+
+@pytest.fixture(autouse=True)
+def text_search_column():
+    """Start every test with the content_tsv column known to exist."""
+    operations._text_search_column = (time.monotonic(), True)
+    yield
+    operations._text_search_column = None
+
+
+def test_search_is_index_friendly_and_tunable():
+    cur = RecordingCursor([("text", {"id": "a:0:0"}, "a.pdf", 0.8)])
+    with patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        results = operations.similarity_search_by_vector([0.5, 0.25], "query", k=1, ef_search=100, probes=7)
+
+    assert len(cur.calls) == 1
+    sql, params = cur.calls[0]
+    assert "SET LOCAL hnsw.ef_search" in sql
+    assert "SET LOCAL ivfflat.probes" in sql
+    # No per-row similarity filter in front of the ORDER BY ... LIMIT
+    assert "WHERE 1 - (embedding" not in sql
+    assert params["ef_search"] == 100
+    assert params["probes"] == 7
+    assert params["embedding"] == "[0.5,0.25]"
+    assert results[0][0].metadata["file_name"] == "a.pdf"
+    assert results[0][1] == 0.8
+
+
+def test_hybrid_search_fuses_both_lists_in_one_statement():
+    cur = RecordingCursor([
+        ("keyword hit", {"id": "b:0:0"}, "b.pdf", 0.3, 0.016),
+        ("vector hit", {"id": "a:0:0"}, "a.pdf", 0.8, 0.015),
+    ])
+    with patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        results = operations.hybrid_search_by_vector(
+            [0.5, 0.25], "error code E42", k=2, vector_weight=0.7, text_weight=0.3, rrf_k=60, candidates=10,
+        )
+
+    assert len(cur.calls) == 1
+    sql, params = cur.calls[0]
+    assert "embedding <=> %(embedding)s::vector" in sql
+    assert "content_tsv @@ tsq" in sql
+    assert "FULL OUTER JOIN" in sql
+    assert params["query"] == "error code E42"
+    assert params["vector_weight"] == 0.7
+    assert params["text_weight"] == 0.3
+    assert params["candidates"] == 10
+    assert params["limit"] == 2
+    # Fused order is kept; the score is still the cosine similarity
+    assert [doc.metadata["file_name"] for doc, _ in results] == ["b.pdf", "a.pdf"]
+    assert results[0][1] == 0.3
+    assert results[0][0].metadata["rrf_score"] == 0.016
+
+
+def test_hybrid_search_falls_back_without_tsvector_column_and_remembers():
+    class MissingColumnCursor(RecordingCursor):
+        def execute(self, sql, params=None):
+            super().execute(sql, params)
+            if "content_tsv" in sql:
+                raise psycopg2.errors.UndefinedColumn("column \"content_tsv\" does not exist")
+
+    cur = MissingColumnCursor([("text", {"id": "a:0:0"}, "a.pdf", 0.8), ("other", {"id": "b:0:0"}, "b.pdf", 0.7)])
+    with patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        results = operations.hybrid_search_by_vector([0.5, 0.25], "other", k=1)
+        assert len(cur.calls) == 2
+        # Later requests go straight to vector search
+        operations.hybrid_search_by_vector([0.5, 0.25], "other", k=1)
+        assert len(cur.calls) == 3
+
+    assert "content_tsv" not in cur.calls[1][0]
+    # The caller's reranking is kept on the fallback
+    assert results[0][0].page_content == "other"
+
+
+def test_hybrid_search_checks_for_tsvector_column_once():
+    class CatalogCursor(RecordingCursor):
+        def fetchone(self):
+            return (False,)
+
+    operations._text_search_column = None
+    cur = CatalogCursor([])
+    with patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        operations.batch_hybrid_search_by_vector([[0.5, 0.25]], ["q"], k=1, rerank=False)
+        operations.batch_hybrid_search_by_vector([[0.5, 0.25]], ["q"], k=1, rerank=False)
+
+    statements = [sql for sql, _ in cur.calls]
+    assert sum("information_schema.columns" in sql for sql in statements) == 1
+    assert not any("content_tsv @@" in sql for sql in statements)
+    assert len(statements) == 3
+
+
+def test_batch_search_retrieves_every_query_in_one_statement():
+    cur = RecordingCursor([
+        (1, "first a", {"id": "a:0:0"}, "a.pdf", 0.9),
+        (1, "first b", {"id": "a:0:1"}, "a.pdf", 0.8),
+        (3, "third", {"id": "b:0:0"}, "b.pdf", 0.7),
+    ])
+    with patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        results = operations.batch_similarity_search_by_vector(
+            [[0.5, 0.25], [0.1, 0.2], [0.3, 0.4]], ["q1", "q2", "q3"], k=2, rerank=False,
+        )
+
+    assert len(cur.calls) == 1
+    sql, params = cur.calls[0]
+    assert "unnest(%(embeddings)s::vector[]) WITH ORDINALITY" in sql
+    assert "CROSS JOIN LATERAL" in sql
+    assert "ORDER BY embedding <=> q.embedding" in sql
+    assert params["embeddings"] == ["[0.5,0.25]", "[0.1,0.2]", "[0.3,0.4]"]
+    assert params["limit"] == 2
+    # One list per query, in input order, empty where nothing matched
+    assert [[doc.page_content for doc, _ in hits] for hits in results] == [["first a", "first b"], [], ["third"]]
+    assert results[2][0][0].metadata["file_name"] == "b.pdf"
+
+
+def test_batch_hybrid_search_passes_each_query_text():
+    cur = RecordingCursor([(2, "keyword hit", {"id": "b:0:0"}, "b.pdf", 0.3, 0.016)])
+    with patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        results = operations.batch_hybrid_search_by_vector([[0.5, 0.25], [0.1, 0.2]], ["q1", "error E42"], k=2)
+
+    assert len(cur.calls) == 1
+    sql, params = cur.calls[0]
+    assert "unnest(%(embeddings)s::vector[], %(queries)s::text[])" in sql
+    assert "websearch_to_tsquery(%(ts_config)s::regconfig, q.query)" in sql
+    assert params["queries"] == ["q1", "error E42"]
+    assert results[0] == []
+    assert results[1][0][0].metadata["rrf_score"] == 0.016
+
+
+def test_batch_search_with_no_queries_skips_the_database():
+    with patch.object(operations, "get_pool", side_effect=AssertionError("no query expected")):
+        assert operations.batch_similarity_search_by_vector([], []) == []
+        assert operations.batch_hybrid_search_by_vector([], []) == []
+
+
+@pytest.mark.parametrize("mode, order_by", [
+    ("binary", "embedding_bit <~> binary_quantize(%(embedding)s::vector)::bit("),
+    ("halfvec", "embedding_half <=> (%(embedding)s::vector)::halfvec("),
+])
+def test_quantized_search_rescores_a_shortlist_at_full_precision(mode, order_by):
+    cur = RecordingCursor([("text", {"id": "a:0:0"}, "a.pdf", 0.8)])
+    with patch.object(operations.settings, "VECTOR_QUANTIZATION", mode), \
+            patch.object(operations.settings, "VECTOR_RESCORE_CANDIDATES", 50), \
+            patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        results = operations.similarity_search_by_vector([0.5, 0.25], "query", k=3, ef_search=20)
+
+    sql, params = cur.calls[0]
+    # Candidates come from the compact column's index...
+    assert f"ORDER BY {order_by}" in sql
+    assert "LIMIT %(rescore)s" in sql
+    # ...and only they are ordered by the exact distance
+    assert "embedding <=> %(embedding)s::vector AS distance" in sql
+    assert params["rescore"] == 50
+    assert params["limit"] == 6
+    assert params["ef_search"] == 50
+    assert results[0][1] == 0.8
+
+
+@pytest.mark.parametrize("search, query_vector", [
+    (lambda: operations.batch_similarity_search_by_vector([[0.5, 0.25]], ["q"], k=3, rerank=False), "q.embedding"),
+    (lambda: operations.hybrid_search_by_vector([0.5, 0.25], "q", k=3), "%(embedding)s::vector"),
+    (lambda: operations.batch_hybrid_search_by_vector([[0.5, 0.25]], ["q"], k=3), "q.embedding"),
+])
+def test_batch_and_hybrid_searches_use_the_quantized_shortlist(search, query_vector):
+    cur = RecordingCursor([])
+    with patch.object(operations.settings, "VECTOR_QUANTIZATION", "binary"), \
+            patch.object(operations.settings, "VECTOR_RESCORE_CANDIDATES", 50), \
+            patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        search()
+
+    sql, params = cur.calls[0]
+    assert f"ORDER BY embedding_bit <~> binary_quantize({query_vector})::bit(" in sql
+    assert "LIMIT %(rescore)s" in sql
+    assert f"embedding <=> {query_vector} AS distance" in sql
+    assert params["rescore"] == 50
+    assert params["ef_search"] >= 50
+
+
+def test_write_chunks_fills_the_quantized_column():
+    from langchain_core.documents import Document
+
+    statements = []
+    cur = RecordingCursor([])
+    with patch.object(operations.settings, "VECTOR_QUANTIZATION", "binary"), \
+            patch.object(operations, "get_pool", lambda: RecordingPool(cur)), \
+            patch.object(operations.psycopg2.extras, "execute_values", lambda c, sql, rows, **kw: statements.append(sql) or [(1,)]):
+        operations.write_chunks([Document(page_content="x", metadata={"source": "data/a.pdf"})], [[0.5, 0.25]])
+
+    assert "embedding_bit)" in statements[0]
+    assert "binary_quantize(embedding::vector)::bit(" in statements[0]
+
+
+def test_backfill_updates_in_batches_until_done():
+    class BatchCursor(RecordingCursor):
+        def __init__(self, counts):
+            super().__init__([])
+            self.counts = list(counts)
+
+        def execute(self, sql, params=None):
+            super().execute(sql, params)
+            self.rowcount = self.counts.pop(0)
+
+    cur = BatchCursor([100, 100, 40])
+    with patch.object(schema, "get_pool", lambda: RecordingPool(cur)):
+        assert schema.backfill_quantized("halfvec", batch_size=100) == 240
+
+    assert len(cur.calls) == 3
+    sql, params = cur.calls[0]
+    assert "SET embedding_half = (embedding)::halfvec(" in sql
+    assert "WHERE embedding_half IS NULL LIMIT %s" in sql
+    assert params == (100,)
+    with pytest.raises(ValueError):
+        schema.backfill_quantized("int8")
+
+
+def test_ingestion_embeds_each_unseen_text_once_and_stores_it():
+    from langchain_core.documents import Document
+
+    from cib_chatbot_serverside.db.chunk_embeddings import content_hash
+
+    stored = {content_hash("seen"): [1.0, 0.0]}
+    added, sent = [], []
+
+    def embed(chunks):
+        sent.extend(chunk.page_content for chunk in chunks)
+        return [[0.0, float(i)] for i in range(len(chunks))]
+
+    chunks = [Document(page_content=text) for text in ["seen", "new", "other", "new"]]
+    with patch.object(operations, "fetch_chunk_embeddings", lambda model, hashes: {
+                h: stored[h] for h in hashes if h in stored}), \
+            patch.object(operations, "store_chunk_embeddings", lambda model, rows: added.extend(rows)), \
+            patch.object(operations, "embed_chunks", embed):
+        embeddings, hits = operations.embed_chunks_cached(chunks)
+
+    assert sent == ["new", "other"]
+    assert embeddings == [[1.0, 0.0], [0.0, 0.0], [0.0, 1.0], [0.0, 0.0]]
+    assert hits == 2
+    assert [key for key, _ in added] == [content_hash("new"), content_hash("other")]
+
+
+def test_ingestion_embeds_everything_when_the_store_is_down():
+    from langchain_core.documents import Document
+
+    def down(*args):
+        raise psycopg2.OperationalError("connection refused")
+
+    with patch.object(operations, "fetch_chunk_embeddings", down), \
+            patch.object(operations, "embed_chunks", lambda chunks: [[0.5]] * len(chunks)):
+        assert operations.embed_chunks_cached([Document(page_content="x")] * 2) == ([[0.5], [0.5]], 0)
+
+
+def test_reembed_rewrites_rows_in_batches_through_the_store():
+    class PagedCursor(RecordingCursor):
+        def __init__(self, pages):
+            super().__init__([])
+            self.pages = list(pages)
+            self.rowcount = 0
+
+        def fetchall(self):
+            return self.pages.pop(0)
+
+    cur = PagedCursor([[(1, "a"), (2, "a")], [(5, "b")], []])
+    updates = []
+    with patch.object(operations, "get_pool", lambda: RecordingPool(cur)), \
+            patch.object(operations.settings, "EMBEDDING_DIMENSIONS", 2), \
+            patch.object(operations.settings, "VECTOR_QUANTIZATION", "halfvec"), \
+            patch.object(operations, "embed_chunks_cached", lambda chunks: ([[0.1, 0.2]] * len(chunks), len(chunks) - 1)), \
+            patch.object(operations.psycopg2.extras, "execute_values",
+                         lambda c, sql, rows, **kw: updates.append((sql, rows))):
+        stats = operations.reembed_chunks(batch_size=2)
+
+    assert stats == {"rows": 3, "cache_hits": 1, "last_id": 5}
+    assert [rows for _, rows in updates] == [[(1, [0.1, 0.2]), (2, [0.1, 0.2])], [(5, [0.1, 0.2])]]
+    assert "embedding_half = (v.embedding::vector)::halfvec(2)" in updates[0][0]
+    # Keyset pagination from the last rewritten id
+    assert [params[0] for sql, params in cur.calls if sql.startswith("SELECT id, content")] == [0, 2, 5]
+
+
+def test_chunk_change_notifications_name_the_rows():
+    cur = RecordingCursor([])
+    with patch.object(notifications, "NOTIFY_IDS_PER_PAYLOAD", 2):
+        notifications.notify_chunks_changed(cur, [3, 4, 10])
+
+    (sql, (channel, payloads)), = cur.calls
+    assert "unnest(%s::text[])" in sql
+    assert payloads == ["3,4", "10"]
+    assert notifications.changed_row_ids(payloads) == [3, 4, 10]
+    # A reconnect or a foreign payload means any row may have changed
+    assert notifications.changed_row_ids(None) is None
+    assert notifications.changed_row_ids(["12 rows"]) is None
+
+
+def test_deleting_a_file_notifies_the_deleted_rows():
+    cur = RecordingCursor([(7,), (8,)])
+    with patch.object(operations, "get_pool", lambda: RecordingPool(cur)):
+        assert operations.delete_file_chunks("data/a.pdf") == 2
+
+    assert "RETURNING id" in cur.calls[0][0]
+    assert cur.calls[1][1] == (notifications.CHUNKS_CHANGED_CHANNEL, ["7,8"])
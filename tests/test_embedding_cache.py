@@ -0,0 +1,100 @@
+"""Tests for the query embedding cache."""
+import pytest
+
+from cib_chatbot_serverside.utils.embedding_cache import EmbeddingCache
+
+
+def test_hit_after_put_with_normalized_key():
+    cache = EmbeddingCache(max_size=4, ttl=60)
+    assert cache.get("What is RAG?", "m") is None
+    cache.put("What is RAG?", "m", [1.0, 2.0])
+
+    assert cache.get("  What   is RAG? ", "m") == [1.0, 2.0]
+    # Different model, different key
+    assert cache.get("What is RAG?", "other") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_lru_eviction():
+    cache = EmbeddingCache(max_size=2, ttl=60)
+    cache.put("a", "m", [1.0])
+    cache.put("b", "m", [2.0])
+    cache.get("a", "m")
+    cache.put("c", "m", [3.0])
+
+    assert cache.get("b", "m") is None
+    assert cache.get("a", "m") == [1.0]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    import cib_chatbot_serverside.utils.embedding_cache as module
+
+    now = [1000.0]
+    monkeypatch.setattr(module.time, "time", lambda: now[0])
+    cache = EmbeddingCache(max_size=2, ttl=10)
+    cache.put("a", "m", [1.0])
+    now[0] += 11
+
+    assert cache.get("a", "m") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    cache = EmbeddingCache(max_size=2, ttl=60, path=path)
+    cache.put("a", "m", [0.1, 0.2])
+
+    restarted = EmbeddingCache(max_size=2, ttl=60, path=path)
+    assert restarted.get("a", "m") == [0.1, 0.2]
+    assert restarted.stats()["disk_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_disk_tier_runs_off_the_event_loop(tmp_path):
+    import threading
+
+    path = str(tmp_path / "embeddings.sqlite3")
+    await EmbeddingCache(max_size=2, ttl=60, path=path).aput_many(["a", "b"], "m", [[0.1], [0.2]])
+    restarted = EmbeddingCache(max_size=2, ttl=60, path=path)
+    loop_thread = threading.get_ident()
+    disk_threads = []
+    disk_get = restarted._disk_get
+    restarted._disk_get = lambda key: disk_threads.append(threading.get_ident()) or disk_get(key)
+
+    assert await restarted.aget_many(["a", "b", "c"], "m") == [[0.1], [0.2], None]
+    assert disk_threads and loop_thread not in disk_threads
+    assert restarted.stats()["disk_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_locked_disk_tier_is_a_miss_not_an_error(tmp_path):
+    import sqlite3
+
+    class LockedDatabase:
+        def execute(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+        executemany = execute
+
+        def rollback(self):
+            pass
+
+    cache = EmbeddingCache(max_size=2, ttl=60, path=str(tmp_path / "embeddings.sqlite3"))
+    cache._db = LockedDatabase()
+    await cache.aput("a", "m", [0.1])
+    cache._entries.clear()
+
+    assert await cache.aget("a", "m") is None
+    assert cache.stats()["disk_errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_skips_ollama(rag_service):
+    embeddings = rag_service.llm_service.embeddings
+    await rag_service.process_query("same question")
+    await rag_service.process_query("same question")
+
+    assert embeddings.calls == 1
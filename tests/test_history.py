@@ -0,0 +1,82 @@
+"""Tests for token-budgeted conversation history."""
+import asyncio
+
+import pytest
+
+from cib_chatbot_serverside.services import DEFAULT_SESSION
+from cib_chatbot_serverside.services.history import ConversationHistory
+
+
+async def short_summarizer(summary, messages):
+    """Fixed-size summary, like an LLM honoring a length limit."""
+    return f"{len(messages)} messages summarized"
+
+
+@pytest.mark.asyncio
+async def test_old_turns_are_summarized_within_budget():
+    history = ConversationHistory(summarizer=short_summarizer, token_budget=100, min_recent_turns=1)
+    for i in range(20):
+        history.add_turn(f"question {i} " + "x" * 80, f"answer {i} " + "y" * 80)
+        await history.wait_for_summary()
+
+    assert history.summary
+    assert len(history.messages) == 2
+    assert history.messages[0].content.startswith("question 19")
+    assert history.prompt_messages()[0].content.startswith("Summary of the earlier conversation")
+
+
+@pytest.mark.asyncio
+async def test_prompt_size_stays_constant_over_long_conversation():
+    history = ConversationHistory(summarizer=short_summarizer, token_budget=200, min_recent_turns=2)
+    counts = []
+    for i in range(200):
+        history.add_turn("q" * 120, "a" * 240)
+        await history.wait_for_summary()
+        counts.append(history.token_count())
+
+    assert max(counts[50:]) == max(counts[10:50])
+
+
+@pytest.mark.asyncio
+async def test_summarization_is_off_the_critical_path():
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_summarizer(summary, messages):
+        started.set()
+        await release.wait()
+        return "summary"
+
+    history = ConversationHistory(summarizer=slow_summarizer, token_budget=10, min_recent_turns=1)
+    history.add_turn("a" * 100, "b" * 100)
+    history.add_turn("c" * 100, "d" * 100)  # returns without waiting on the summarizer
+
+    await started.wait()
+    assert history.summary == ""
+    release.set()
+    await history.wait_for_summary()
+    assert history.summary == "summary"
+
+
+@pytest.mark.asyncio
+async def test_rag_service_sends_bounded_history(rag_service):
+    history = await rag_service.sessions.get(DEFAULT_SESSION)
+    history.token_budget = 50
+    history.min_recent_turns = 1
+    history.summarizer = short_summarizer
+
+    for i in range(10):
+        await rag_service.process_query(f"question {i} " + "z" * 100)
+        await history.wait_for_summary()
+
+    assert len(history.messages) == 2
+    assert history.summary
+
+
+def test_clear_resets_everything():
+    history = ConversationHistory(token_budget=10, min_recent_turns=0)
+    history.add_turn("a" * 100, "b")
+    history.clear()
+
+    assert not history
+    assert history.prompt_messages() == []
@@ -0,0 +1,121 @@
+"""Tests for batched ingestion in save_to_pgvector."""
+from contextlib import contextmanager
+
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+
+from cib_chatbot_serverside.db import operations
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.db.statements.append(sql)
+        if "ANY(%s)" in sql:
+            self._rows = [(chunk_id,) for chunk_id in params[0] if chunk_id in self.db.committed]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class FakeDB:
+    """Records statements and tracks which chunk IDs are committed."""
+
+    def __init__(self, committed=()):
+        self.committed = set(committed)
+        self.pending = set()
+        self.statements = []
+        self.commits = 0
+        self.fail_on_insert = None
+        self.inserts = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed |= self.pending
+        self.pending = set()
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = set()
+
+    def execute_values(self, cur, sql, rows, page_size=None, fetch=False):
+        self.inserts += 1
+        if self.fail_on_insert == self.inserts:
+            raise RuntimeError("connection lost")
+        self.pending |= {row[2].adapted["id"] for row in rows}
+        return [(i,) for i in range(len(rows))]
+
+
+class FakePool:
+    def __init__(self, db):
+        self.db = db
+
+    @contextmanager
+    def connection(self):
+        yield self.db
+
+
+class FakeEmbeddingFunction:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return [[0.0] * 3 for _ in texts]
+
+
+def make_chunks(n):
+    return [
+        Document(page_content=f"text {i}", metadata={"id": f"doc.pdf:0:{i}", "source": "data/doc.pdf"})
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def fake_env():
+    db = FakeDB()
+    embedder = FakeEmbeddingFunction()
+    with patch.object(operations, "get_pool", lambda: FakePool(db)), \
+            patch.object(operations, "_embedding_function", embedder), \
+            patch.object(operations.psycopg2.extras, "execute_values", db.execute_values):
+        yield db, embedder
+
+
+def test_bulk_insert_batches(fake_env):
+    db, embedder = fake_env
+    db.committed = {"doc.pdf:0:0", "doc.pdf:0:1"}
+
+    stats = operations.save_to_pgvector(make_chunks(10), batch_size=4)
+
+    assert sum("ANY(%s)" in sql for sql in db.statements) == 1
+    assert embedder.batches == [4, 4]
+    assert db.inserts == 2
+    assert stats["skipped"] == 2
+    assert stats["added"] == 8
+    assert len(db.committed) == 10
+
+
+def test_resume_after_partial_commit(fake_env):
+    db, embedder = fake_env
+    db.fail_on_insert = 2
+
+    with pytest.raises(RuntimeError):
+        operations.save_to_pgvector(make_chunks(6), batch_size=2)
+    assert len(db.committed) == 2
+
+    db.fail_on_insert = None
+    embedder.batches.clear()
+    stats = operations.save_to_pgvector(make_chunks(6), batch_size=2)
+
+    assert stats["skipped"] == 2
+    assert embedder.batches == [2, 2]
+    assert len(db.committed) == 6
@@ -0,0 +1,293 @@
+"""Tests for the memory-mapped local vector index."""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from cib_chatbot_serverside.db import local_index, operations
+from cib_chatbot_serverside.db.local_index import LocalVectorIndex
+
+DIMS = 16
+
+
+def make_row(row_id, vector, source="a.pdf"):
+    metadata = {"id": f"{source}:0:{row_id}", "source": f"data/{source}"}
+    embedding = "[" + ",".join(map(str, vector)) + "]"
+    digest = hashlib.md5((json.dumps(metadata, sort_keys=True) + source + embedding).encode()).hexdigest()
+    return (row_id, f"chunk {row_id}", metadata, source, digest, embedding)
+
+
+def random_rows(count, seed=0, start=1):
+    rng = np.random.default_rng(seed)
+    return [make_row(start + i, rng.standard_normal(DIMS)) for i in range(count)]
+
+
+class FakeTable:
+    """Answers the local index's queries from a dict of document_chunks rows."""
+
+    def __init__(self, rows):
+        self.rows = {row[0]: row for row in rows}
+        self.statements = []
+
+    @contextmanager
+    def connection(self):
+        table = self
+
+        class Cursor:
+            itersize = None
+
+            def execute(self, sql, params=None):
+                table.statements.append(sql)
+                if "content" not in sql:
+                    self.result = [(row[0], row[4]) for row in table.rows.values()]
+                elif params:
+                    self.result = [table.rows[i] for i in sorted(params[0]) if i in table.rows]
+                else:
+                    self.result = [table.rows[i] for i in sorted(table.rows)]
+
+            def fetchall(self):
+                return self.result
+
+            def __iter__(self):
+                return iter(self.result)
+
+            def close(self):
+                pass
+
+        class Conn:
+            def cursor(self, name=None):
+                return Cursor()
+
+            def rollback(self):
+                pass
+
+        yield Conn()
+
+
+def chunk_ids(results):
+    return [doc.metadata["id"] for doc, _ in results]
+
+
+def brute_force(rows, query, k):
+    matrix = np.array([json.loads(row[5]) for row in rows])
+    scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+    return [rows[i][2]["id"] for i in np.argsort(-scores)[:k]]
+
+
+def test_search_matches_exact_cosine_ranking(tmp_path):
+    rows = random_rows(300)
+    index = LocalVectorIndex(str(tmp_path), dims=DIMS)
+    index.build(rows)
+    query = np.random.default_rng(7).standard_normal(DIMS)
+
+    results = index.search(query.tolist(), 5, min_similarity=-1)
+
+    assert chunk_ids(results) == brute_force(rows, query, 5)
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    doc = results[0][0]
+    assert doc.page_content.startswith("chunk ")
+    assert doc.metadata["file_name"] == "a.pdf"
+    # Same low-score cut-off as the SQL path
+    assert all(score > 0.3 for _, score in index.search(query.tolist(), 50, min_similarity=0.3))
+
+
+def test_float16_keeps_the_ranking(tmp_path):
+    rows = random_rows(300)
+    query = np.random.default_rng(7).standard_normal(DIMS).tolist()
+    full = LocalVectorIndex(str(tmp_path / "f32"), dims=DIMS)
+    half = LocalVectorIndex(str(tmp_path / "f16"), dims=DIMS, dtype="float16")
+    full.build(rows)
+    half.build(rows)
+
+    assert chunk_ids(half.search(query, 3, -1)) == chunk_ids(full.search(query, 3, -1))
+    assert half.stats()["vector_bytes"] * 2 == full.stats()["vector_bytes"]
+
+
+def test_batch_search_returns_one_list_per_query(tmp_path):
+    rows = random_rows(100)
+    index = LocalVectorIndex(str(tmp_path), dims=DIMS)
+    index.build(rows)
+    queries = np.random.default_rng(3).standard_normal((4, DIMS))
+
+    grouped = index.search_many(queries.tolist(), 3, min_similarity=-1)
+
+    assert [chunk_ids(results) for results in grouped] == [brute_force(rows, q, 3) for q in queries]
+
+
+def test_refresh_appends_new_rows_and_tombstones_stale_ones(tmp_path):
+    table = FakeTable(random_rows(40))
+    writer = LocalVectorIndex(str(tmp_path), dims=DIMS)
+    reader = LocalVectorIndex(str(tmp_path), dims=DIMS, check_interval=0)
+
+    with patch.object(local_index, "get_pool", lambda: table):
+        assert writer.refresh()["rows"] == 40
+        deleted = table.rows.pop(5)
+        relabeled = make_row(6, json.loads(table.rows[6][5]), source="b.pdf")
+        table.rows[6] = relabeled
+        added = make_row(41, np.ones(DIMS))
+        table.rows[41] = added
+        stats = writer.refresh()
+
+    assert (stats["generation"], stats["added"], stats["removed"]) == (1, 2, 2)
+    # Another worker mapping the same files sees the change without touching Postgres
+    assert chunk_ids(reader.search(np.ones(DIMS).tolist(), 1, -1)) == [added[2]["id"]]
+    moved = reader.search(json.loads(relabeled[5]), 1, -1)
+    assert moved[0][0].metadata["file_name"] == "b.pdf"
+    everything = reader.search(np.ones(DIMS).tolist(), 100, -1)
+    assert len(everything) == 40
+    assert deleted[2]["id"] not in chunk_ids(everything)
+
+
+def test_notified_rows_are_refreshed_without_scanning_the_table(tmp_path):
+    table = FakeTable(random_rows(40))
+    index = LocalVectorIndex(str(tmp_path), dims=DIMS)
+
+    with patch.object(local_index, "get_pool", lambda: table):
+        index.refresh()
+        del table.rows[5]
+        table.rows[6] = make_row(6, json.loads(table.rows[6][5]), source="b.pdf")
+        table.rows[41] = make_row(41, np.ones(DIMS))
+        table.statements.clear()
+        stats = index.refresh(row_ids=[5, 6, 41])
+        # Another worker told about the same rows finds them current
+        again = index.refresh(row_ids=[5, 6, 41])
+
+    assert (stats["added"], stats["removed"]) == (2, 2)
+    assert (again["added"], again["removed"]) == (0, 0)
+    # Only the named rows were read, never every row's hash
+    assert all("WHERE id = ANY" in sql for sql in table.statements)
+    everything = index.search(np.ones(DIMS).tolist(), 100, -1)
+    assert len(everything) == 40
+    assert "a.pdf:0:5" not in chunk_ids(everything)
+    assert chunk_ids(everything)[0] == "a.pdf:0:41"
+
+
+def test_reembedded_rows_get_their_new_vectors(tmp_path):
+    table = FakeTable(random_rows(40))
+    index = LocalVectorIndex(str(tmp_path), dims=DIMS)
+
+    with patch.object(local_index, "get_pool", lambda: table):
+        index.refresh()
+        # Same metadata, new embedding: what `manage-index reembed` writes
+        table.rows[3] = make_row(3, np.ones(DIMS))
+        stats = index.refresh(row_ids=[3])
+
+    assert (stats["added"], stats["removed"]) == (1, 1)
+    assert chunk_ids(index.search(np.ones(DIMS).tolist(), 1, -1)) == ["a.pdf:0:3"]
+
+
+def test_full_refresh_waits_for_a_refresh_in_progress(tmp_path):
+    table = FakeTable(random_rows(40))
+    index = LocalVectorIndex(str(tmp_path), dims=DIMS)
+
+    with patch.object(local_index, "get_pool", lambda: table):
+        index.refresh()
+        with open(tmp_path / ".lock", "a") as lock:
+            # Another worker is applying a notification's rows...
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # ...when this one reconnects and asks for a full diff
+            results = []
+            catch_up = threading.Thread(target=lambda: results.append(index.refresh()))
+            catch_up.start()
+            catch_up.join(0.2)
+            assert catch_up.is_alive()
+            del table.rows[7]
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        catch_up.join(5)
+
+    assert results[0]["removed"] == 1
+    assert "a.pdf:0:7" not in chunk_ids(index.search(np.ones(DIMS).tolist(), 100, -1))
+
+
+def test_platforms_without_flock_search_postgres_only(tmp_path):
+    with patch.object(local_index, "fcntl", None), \
+            patch.object(local_index.settings, "LOCAL_INDEX_ENABLED", True):
+        assert local_index.get_local_index() is None
+        with pytest.raises(RuntimeError):
+            LocalVectorIndex(str(tmp_path), dims=DIMS).refresh()
+
+
+def test_many_deletions_compact_into_a_new_generation(tmp_path):
+    table = FakeTable(random_rows(20))
+    index = LocalVectorIndex(str(tmp_path), dims=DIMS)
+
+    with patch.object(local_index, "get_pool", lambda: table):
+        index.refresh()
+        for row_id in range(1, 11):
+            del table.rows[row_id]
+        stats = index.refresh()
+
+    assert stats["generation"] == 2
+    assert index.stats()["rows"] == index.stats()["live"] == 10
+    assert sorted(os.listdir(tmp_path)) == [".lock", "chunks-2", "manifest.json", "rows-2", "vectors-2"]
+
+
+def test_refresh_discards_a_crashed_partial_append(tmp_path):
+    table = FakeTable(random_rows(10))
+    index = LocalVectorIndex(str(tmp_path), dims=DIMS)
+
+    with patch.object(local_index, "get_pool", lambda: table):
+        index.refresh()
+        with open(tmp_path / "vectors-1", "ab") as f:
+            f.write(b"\x00" * 100)
+        table.rows[11] = make_row(11, np.ones(DIMS))
+        index.refresh()
+
+    assert chunk_ids(index.search(np.ones(DIMS).tolist(), 1, -1)) == ["a.pdf:0:11"]
+
+
+def test_similarity_search_uses_local_index_and_falls_back_to_postgres(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), dims=DIMS)
+    query = np.ones(DIMS).tolist()
+
+    def no_postgres():
+        raise AssertionError("Postgres should not be queried")
+
+    with patch.object(local_index.settings, "LOCAL_INDEX_ENABLED", True), \
+            patch.object(local_index, "_index", index):
+        # Nothing built yet: Postgres answers
+        with patch.object(operations, "get_pool", lambda: FakeSearchPool()):
+            fallback = operations.similarity_search_by_vector(query, "chunk", k=1)
+        assert fallback[0][0].page_content == "from postgres"
+
+        index.build(random_rows(30) + [make_row(99, np.ones(DIMS))])
+        with patch.object(operations, "get_pool", no_postgres):
+            results = operations.similarity_search_by_vector(query, "chunk 99", k=2)
+            grouped = operations.batch_similarity_search_by_vector([query], ["chunk"], k=1, rerank=False)
+
+    assert results[0][0].metadata["id"] == "a.pdf:0:99"
+    assert len(results) == 2
+    assert chunk_ids(grouped[0]) == ["a.pdf:0:99"]
+    assert index.stats()["searches"] == 2
+
+
+class FakeSearchPool:
+    @contextmanager
+    def connection(self):
+        class Cursor:
+            def execute(self, sql, params=None):
+                pass
+
+            def fetchall(self):
+                return [("from postgres", {"id": "p:0:0"}, "p.pdf", 0.9)]
+
+            def close(self):
+                pass
+
+        class Conn:
+            def cursor(self):
+                return Cursor()
+
+        yield Conn()
+
+
+def test_rejects_unknown_dtype(tmp_path):
+    with pytest.raises(ValueError):
+        LocalVectorIndex(str(tmp_path), dtype="int8")
@@ -0,0 +1,76 @@
+"""Tests for the queue-based structured logging pipeline."""
+import json
+import logging
+import queue
+
+from cib_chatbot_serverside.utils.logging import (
+    DetailedFormatter,
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    PayloadSampler,
+    sample_request_payloads,
+)
+
+
+def make_record(msg="value=%s", args=("x",), **extra):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_detailed_formatter_does_not_mutate_record():
+    record = make_record(stage="SEARCH")
+    formatter = DetailedFormatter('%(levelname)s\n%(message)s')
+
+    first = formatter.format(record)
+    second = formatter.format(record)
+
+    assert first == second
+    assert first.count("[STAGE: SEARCH]") == 1
+    assert record.msg == "value=%s"
+
+
+def test_json_formatter_emits_extras():
+    entry = json.loads(JsonFormatter().format(make_record(stage="SEARCH", tokens=3)))
+
+    assert entry["message"] == "value=x"
+    assert entry["stage"] == "SEARCH"
+    assert entry["tokens"] == 3
+    assert entry["level"] == "INFO"
+
+
+def test_arguments_are_not_formatted_below_level():
+    class Expensive:
+        formatted = False
+
+        def __str__(self):
+            Expensive.formatted = True
+            return "expensive"
+
+    logger = logging.getLogger("test_lazy")
+    logger.setLevel(logging.INFO)
+    logger.debug("payload: %s", Expensive())
+
+    assert Expensive.formatted is False
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for _ in range(5):
+        handler.handle(make_record())
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    assert handler.queue.get().msg == "value=x"
+
+
+def test_payload_records_follow_request_sample():
+    sampler = PayloadSampler()
+    payload = make_record(payload=True)
+
+    sample_request_payloads(rate=0.0)
+    assert sampler.filter(payload) is False
+    assert sampler.filter(make_record()) is True
+
+    sample_request_payloads(rate=1.0)
+    assert sampler.filter(payload) is True
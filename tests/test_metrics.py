@@ -0,0 +1,69 @@
+"""Tests for the metrics registry and the /metrics endpoint."""
+import httpx
+import pytest
+
+from cib_chatbot_serverside.utils.metrics import ANSWERS, STAGE_LATENCY, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_latency_seconds", "Test latency", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, stage="db")
+
+    text = registry.render()
+
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{stage="db",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{stage="db",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{stage="db",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{stage="db"} 3' in text
+    assert 'test_latency_seconds_sum{stage="db"} 5.55' in text
+
+
+def test_counter_rejects_wrong_labels():
+    registry = MetricsRegistry()
+    answers = registry.counter("test_answers_total", "Answers", ["strategy"])
+    answers.inc(strategy="context")
+
+    with pytest.raises(ValueError):
+        answers.inc(kind="context")
+    assert answers.value(strategy="context") == 1
+
+
+def test_collector_gauges_and_label_escaping():
+    registry = MetricsRegistry()
+    registry.register_collector(lambda: [("test_gauge", "Gauge", "gauge", [({"name": 'a"b'}, 2)])])
+
+    assert 'test_gauge{name="a\\"b"} 2' in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_chat_stages(app_service):
+    from cib_chatbot_serverside.main import app
+
+    answers_before = ANSWERS.value(strategy="context")
+    llm_before = STAGE_LATENCY.count(stage="llm")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        chat = await client.post("/api/chat", json={"message": "hi"}, headers={"X-Request-ID": "req-42"})
+        response = await client.get("/metrics")
+
+    assert chat.headers["X-Request-ID"] == "req-42"
+    assert ANSWERS.value(strategy="context") == answers_before + 1
+    assert STAGE_LATENCY.count(stage="llm") == llm_before + 1
+    assert response.headers["content-type"].startswith("text/plain")
+    for name in ("rag_stage_duration_seconds_bucket", "rag_llm_tokens_total", "db_pool_connections", "cache_hits"):
+        assert name in response.text
+    assert 'http_requests_total{method="POST",path="/api/chat",status="200"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_invalid_request_id_is_replaced(app_service):
+    from cib_chatbot_serverside.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/health", headers={"X-Request-ID": "bad id\twith spaces"})
+
+    assert len(response.headers["X-Request-ID"]) == 32
@@ -0,0 +1,246 @@
+"""Tests for the parallel, incremental ingestion pipeline with stubbed DB and Ollama."""
+import os
+import threading
+import time
+
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+
+from cib_chatbot_serverside.db.chunk_embeddings import content_hash
+from cib_chatbot_serverside.scripts import pipeline as pipeline_module
+from cib_chatbot_serverside.scripts.manifest import SyncManifest, file_digest
+from cib_chatbot_serverside.scripts.pipeline import (
+    FileSyncPlan,
+    IngestionPipeline,
+    calculate_chunk_ids,
+    iter_file_chunks,
+    load_and_split,
+)
+
+from benchmarks.stores import synthetic_pdf
+
+
+def fake_loader(file_path):
+    """Module-level so the process pool can pickle it: one chunk per line."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        lines = [line for line in f.read().splitlines() if line]
+    chunks = [Document(page_content=line, metadata={"source": file_path, "page": 0}) for line in lines]
+    return calculate_chunk_ids(chunks)
+
+
+class FakeStore:
+    """In-memory document_chunks: row ID -> (chunk ID, source, text)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.next_row = 1
+        self.embedded = []
+        self.batches = []
+        # chunk_embeddings: text embedded once, in any file
+        self.embedding_store = {}
+        self.active = 0
+        self.max_active = 0
+
+    def texts(self):
+        return sorted(text for _, _, text in self.rows.values())
+
+    def fetch_file_chunk_rows(self, source):
+        with self.lock:
+            return [(row, i, content_hash(text)) for row, (i, src, text) in self.rows.items() if src == source]
+
+    def apply_chunk_changes(self, relabel, delete_rows):
+        with self.lock:
+            for row in delete_rows:
+                self.rows.pop(row, None)
+            for row, metadata in relabel:
+                _, source, text = self.rows[row]
+                self.rows[row] = (metadata["id"], source, text)
+
+    def delete_file_chunks(self, source):
+        with self.lock:
+            rows = [row for row, (_, src, _) in self.rows.items() if src == source]
+            for row in rows:
+                del self.rows[row]
+            return len(rows)
+
+    def rename_file_chunks(self, old, new):
+        return 0
+
+    def embed_chunks_cached(self, chunks):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            missing = list(dict.fromkeys(c.page_content for c in chunks if c.page_content not in self.embedding_store))
+            self.embedded.extend(missing)
+            self.embedding_store.update((text, [0.0]) for text in missing)
+            self.batches.append(len(chunks))
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return [self.embedding_store[c.page_content] for c in chunks], len(chunks) - len(missing)
+
+    def write_chunks(self, chunks, embeddings):
+        with self.lock:
+            for chunk in chunks:
+                self.rows[self.next_row] = (chunk.metadata["id"], chunk.metadata["source"], chunk.page_content)
+                self.next_row += 1
+        return len(chunks)
+
+
+@pytest.fixture
+def store():
+    fake = FakeStore()
+    names = [
+        "fetch_file_chunk_rows", "apply_chunk_changes", "delete_file_chunks",
+        "rename_file_chunks", "embed_chunks_cached", "write_chunks",
+    ]
+    patches = [patch.object(pipeline_module, name, getattr(fake, name)) for name in names]
+    for p in patches:
+        p.start()
+    yield fake
+    for p in patches:
+        p.stop()
+
+
+def write_file(path, lines):
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return str(path)
+
+
+def run(files, manifest=None, loader=fake_loader, **kwargs):
+    pipeline = IngestionPipeline(loader=loader, manifest=manifest, **kwargs).start()
+    for file_path in files:
+        pipeline.submit(file_path)
+    pipeline.close()
+    return pipeline.stats()
+
+
+def test_plan_reuses_shifted_chunks_across_windows():
+    stored = [(1, "f:0:0", content_hash("a")), (2, "f:0:1", content_hash("b")), (3, "f:0:2", content_hash("gone"))]
+    chunks = calculate_chunk_ids([
+        Document(page_content=text, metadata={"source": "f", "page": 0}) for text in ["a", "new", "b"]
+    ])
+    plan = FileSyncPlan(stored)
+
+    first_embed, first_relabel = plan.add(chunks[:2])
+    second_embed, second_relabel = plan.add(chunks[2:])
+
+    assert [c.page_content for c in first_embed] == ["new"]
+    assert first_relabel == [] and second_embed == []
+    assert second_relabel == [(2, chunks[2].metadata)]
+    assert plan.finish() == [3]
+    assert (plan.unchanged, plan.relabeled) == (1, 1)
+
+
+def test_pdf_windows_match_whole_file_and_stream_in_fixed_batches(store, tmp_path):
+    pdf = synthetic_pdf(str(tmp_path / "big.pdf"), pages=5, lines_per_page=20)
+    windows = list(iter_file_chunks(pdf, pages_per_window=2))
+
+    whole = load_and_split(pdf)
+    assert [len({c.metadata["page"] for c in window}) for window in windows] == [2, 2, 1]
+    assert [c.metadata for window in windows for c in window] == [c.metadata for c in whole]
+
+    stats = run([pdf], loader=None, workers=2, batch_size=4, pages_per_window=2)
+
+    assert stats["added"] == len(whole)
+    assert store.batches[:-1] == [4] * (len(store.batches) - 1)
+    assert sorted(i for i, _, _ in store.rows.values()) == sorted(c.metadata["id"] for c in whole)
+
+
+def test_pipeline_ingests_all_files(store, tmp_path):
+    files = [write_file(tmp_path / f"file{i}.md", [f"{i}-{j}" for j in range(5)]) for i in range(6)]
+    stats = run(files, workers=2, embed_workers=2, batch_size=2, queue_size=2)
+
+    assert stats["files"] == 6
+    assert stats["added"] == 30
+    assert stats["errors"] == 0
+    assert len(store.rows) == 30
+    assert store.max_active <= 2
+
+
+def test_pipeline_reports_load_errors(store, tmp_path):
+    stats = run([str(tmp_path / "missing.md"), write_file(tmp_path / "ok.md", ["x"])], workers=1, embed_workers=1)
+
+    assert stats["errors"] == 1
+    assert stats["files"] == 1
+
+
+def test_incremental_resync_embeds_only_changed_chunks(store, tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    doc = write_file(tmp_path / "doc.md", ["intro", "body", "outro"])
+    run([doc], manifest=manifest, workers=1)
+    assert manifest.is_unchanged(doc)
+
+    store.embedded.clear()
+    write_file(tmp_path / "doc.md", ["intro", "inserted", "body"])
+    os.utime(doc, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert not manifest.is_unchanged(doc)
+    stats = run([doc], manifest=manifest, workers=1)
+
+    assert store.embedded == ["inserted"]
+    assert store.texts() == ["body", "inserted", "intro"]
+    assert stats["reused"] == 2
+    assert stats["deleted"] == 1
+    assert SyncManifest(manifest.path).get(doc)["sha256"] == file_digest(doc)
+
+
+def test_failed_write_keeps_the_replaced_chunks(store, tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    doc = write_file(tmp_path / "doc.md", ["intro", "outro"])
+    run([doc], manifest=manifest, workers=1)
+    recorded = manifest.get(doc)
+
+    write_file(tmp_path / "doc.md", ["intro", "rewritten"])
+    os.utime(doc, ns=(time.time_ns(), time.time_ns() + 10**9))
+
+    def down(chunks, embeddings):
+        raise ConnectionError("postgres is down")
+
+    with patch.object(pipeline_module, "write_chunks", down):
+        stats = run([doc], manifest=manifest, workers=1)
+
+    # "outro" stays searchable until its replacement is written
+    assert store.texts() == ["intro", "outro"]
+    assert (stats["errors"], stats["deleted"]) == (1, 0)
+    assert manifest.get(doc) == recorded
+
+
+def test_repeated_text_is_embedded_once_across_files(store, tmp_path):
+    boilerplate = "This document is for internal use only."
+    original = write_file(tmp_path / "a.md", ["alpha", boilerplate])
+    other = write_file(tmp_path / "b.md", ["beta", boilerplate])
+    copy = write_file(tmp_path / "copy-of-a.md", ["alpha", boilerplate])
+
+    stats = run([original, other, copy], workers=1, embed_workers=1)
+
+    assert sorted(store.embedded) == sorted(["alpha", "beta", boilerplate])
+    assert stats["added"] == 6
+    assert (stats["embedded"], stats["embed_cache_hits"]) == (3, 3)
+    assert stats["embed_cache_hit_rate"] == 0.5
+
+
+def test_touched_but_identical_file_is_not_reloaded(store, tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    doc = write_file(tmp_path / "doc.md", ["a", "b"])
+    run([doc], manifest=manifest, workers=1)
+
+    os.utime(doc, ns=(time.time_ns(), time.time_ns() + 10**9))
+    stats = run([doc], manifest=manifest, workers=1)
+
+    assert stats["unchanged"] == 1
+    assert stats["files"] == 0
+    assert manifest.is_unchanged(doc)
+
+
+def test_remove_deletes_chunks_and_manifest_entry(store, tmp_path):
+    manifest = SyncManifest(str(tmp_path / "manifest.json"))
+    doc = write_file(tmp_path / "doc.md", ["a", "b"])
+    run([doc], manifest=manifest, workers=1)
+
+    pipeline = IngestionPipeline(loader=fake_loader, manifest=manifest)
+    pipeline.remove(doc)
+
+    assert store.rows == {}
+    assert manifest.get(doc) is None
@@ -0,0 +1,109 @@
+"""Tests for the cached, hot-reloading prompt configuration."""
+import json
+import os
+
+import httpx
+import pytest
+from pydantic import ValidationError
+
+from cib_chatbot_serverside.config.prompts import DEFAULT_CONFIG, PromptConfig, PromptManager
+from cib_chatbot_serverside.config.settings import settings
+
+
+def write_config(path, **overrides):
+    path.write_text(json.dumps(dict(DEFAULT_CONFIG, **overrides)), encoding="utf-8")
+    # Make sure the mtime moves even on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_config_is_parsed_once(tmp_path, monkeypatch):
+    path = tmp_path / "prompt_config.json"
+    write_config(path, top_k_results=7)
+    manager = PromptManager(str(path), check_interval=0)
+
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda *a, **kw: opened.append(a[0]) or real_open(*a, **kw))
+    for _ in range(10):
+        config = manager.get()
+
+    assert config.top_k_results == 7
+    assert opened == []
+    assert manager.stats()["reloads"] == 1
+
+
+def test_retrieval_settings_fall_back_to_the_environment(monkeypatch):
+    monkeypatch.setattr(settings, "SIMILARITY_THRESHOLD", 0.45)
+    monkeypatch.setattr(settings, "TOP_K_RESULTS", 7)
+
+    config = PromptConfig.model_validate({"prompt_template": "{context} {question}"})
+
+    assert (config.similarity_threshold, config.top_k_results) == (0.45, 7)
+    # Values in prompt_config.json still win
+    assert PromptConfig.model_validate({"top_k_results": 2}).top_k_results == 2
+
+
+def test_snapshot_is_immutable():
+    with pytest.raises(ValidationError):
+        PromptConfig().top_k_results = 10
+
+
+def test_mtime_change_swaps_snapshot(tmp_path):
+    path = tmp_path / "prompt_config.json"
+    write_config(path, top_k_results=3)
+    manager = PromptManager(str(path), check_interval=0)
+    reloaded = []
+    manager.add_listener(reloaded.append)
+    before = manager.get()
+
+    write_config(path, top_k_results=5)
+    after = manager.get()
+
+    assert before.top_k_results == 3
+    assert after.top_k_results == 5
+    assert reloaded == [after]
+
+
+def test_invalid_file_keeps_previous_snapshot(tmp_path):
+    path = tmp_path / "prompt_config.json"
+    write_config(path, similarity_threshold=0.4)
+    manager = PromptManager(str(path), check_interval=0)
+
+    write_config(path, prompt_template="no placeholders here")
+    assert manager.get().similarity_threshold == 0.4
+    assert "prompt_template" in manager.stats()["last_error"]
+
+    path.write_text("{not json", encoding="utf-8")
+    assert manager.reload() is False
+    assert manager.get().similarity_threshold == 0.4
+    assert manager.stats()["failures"] == 2
+
+
+def test_missing_file_is_created_with_defaults(tmp_path):
+    manager = PromptManager(str(tmp_path / "prompt_config.json"))
+
+    assert manager.get().prompt_template == DEFAULT_CONFIG["prompt_template"]
+    assert manager.stats()["failures"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admin_reload_endpoint(tmp_path, monkeypatch):
+    from cib_chatbot_serverside.api import routes
+    from cib_chatbot_serverside.main import app
+
+    path = tmp_path / "prompt_config.json"
+    write_config(path, top_k_results=4)
+    manager = PromptManager(str(path), check_interval=3600)
+    monkeypatch.setattr(routes, "prompt_manager", manager)
+    write_config(path, top_k_results=9)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        before = (await client.get("/api/admin/config")).json()
+        reload = (await client.post("/api/admin/reload-config")).json()
+        after = (await client.get("/api/admin/config")).json()
+
+    assert before["config"]["top_k_results"] == 4
+    assert reload["reloaded"] is True
+    assert after["config"]["top_k_results"] == 9
@@ -0,0 +1,145 @@
+"""Tests for LLM admission control and fair scheduling."""
+import asyncio
+
+import httpx
+import pytest
+
+from cib_chatbot_serverside.services import scheduler
+from cib_chatbot_serverside.services.scheduler import LLMOverloadedError, LLMScheduler
+
+
+async def hold(llm_scheduler, client, log, delay=0.02):
+    async with llm_scheduler.slot(client):
+        log.append(client)
+        await asyncio.sleep(delay)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_is_enforced():
+    llm_scheduler = LLMScheduler(max_concurrent=2, queue_size=10)
+    peak = 0
+
+    async def generation():
+        nonlocal peak
+        async with llm_scheduler.slot("c"):
+            peak = max(peak, llm_scheduler.stats()["active"])
+            await asyncio.sleep(0.02)
+
+    await asyncio.gather(*(generation() for _ in range(6)))
+
+    assert peak == 2
+    stats = llm_scheduler.stats()
+    assert stats["admitted"] == 6
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_immediately_with_retry_after():
+    llm_scheduler = LLMScheduler(max_concurrent=1, queue_size=1)
+    log = []
+    running = [asyncio.create_task(hold(llm_scheduler, f"c{i}", log, delay=0.1)) for i in range(2)]
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(LLMOverloadedError) as excinfo:
+        async with llm_scheduler.slot("c3"):
+            pass
+
+    assert excinfo.value.reason == "queue_full"
+    assert excinfo.value.retry_after >= 1
+    await asyncio.gather(*running)
+    assert llm_scheduler.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_one_client_cannot_fill_the_queue():
+    llm_scheduler = LLMScheduler(max_concurrent=1, queue_size=10, per_client=2)
+    log = []
+    running = [asyncio.create_task(hold(llm_scheduler, "noisy", log, delay=0.1)) for _ in range(3)]
+    await asyncio.sleep(0.001)
+
+    with pytest.raises(LLMOverloadedError) as excinfo:
+        llm_scheduler.check_admission("noisy")
+    llm_scheduler.check_admission("quiet")
+
+    assert excinfo.value.reason == "client_queue_full"
+    await asyncio.gather(*running)
+
+
+@pytest.mark.asyncio
+async def test_waiting_too_long_is_rejected():
+    llm_scheduler = LLMScheduler(max_concurrent=1, queue_size=10, max_wait=0.02)
+    blocker = asyncio.create_task(hold(llm_scheduler, "a", [], delay=0.2))
+    await asyncio.sleep(0.001)
+
+    with pytest.raises(LLMOverloadedError) as excinfo:
+        async with llm_scheduler.slot("b"):
+            pass
+
+    assert excinfo.value.reason == "timeout"
+    assert llm_scheduler.stats()["queued"] == 0
+    await blocker
+
+
+@pytest.mark.asyncio
+async def test_slots_are_shared_round_robin_between_clients():
+    llm_scheduler = LLMScheduler(max_concurrent=1, queue_size=10)
+    log = []
+    release = asyncio.Event()
+
+    async def first():
+        async with llm_scheduler.slot("noisy"):
+            log.append("noisy")
+            await release.wait()
+
+    tasks = [asyncio.create_task(first())]
+    await asyncio.sleep(0)
+    tasks += [asyncio.create_task(hold(llm_scheduler, "noisy", log, delay=0)) for _ in range(3)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(hold(llm_scheduler, "quiet", log, delay=0)))
+    await asyncio.sleep(0)
+    assert llm_scheduler.stats()["queued"] == 4
+    release.set()
+
+    await asyncio.gather(*tasks)
+
+    # FIFO would serve "quiet" last; round-robin serves it after one more "noisy"
+    assert log == ["noisy", "noisy", "quiet", "noisy", "noisy"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    llm_scheduler = LLMScheduler(max_concurrent=1, queue_size=10)
+    blocker = asyncio.create_task(hold(llm_scheduler, "a", [], delay=0.2))
+    await asyncio.sleep(0.001)
+    waiter = asyncio.create_task(hold(llm_scheduler, "b", []))
+    await asyncio.sleep(0.001)
+    assert llm_scheduler.stats()["queued"] == 1
+
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    await blocker
+
+    stats = llm_scheduler.stats()
+    assert stats["queued"] == 0 and stats["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_returns_429_when_llm_is_saturated(app_service):
+    from cib_chatbot_serverside.main import app
+
+    llm_scheduler = scheduler._scheduler = LLMScheduler(max_concurrent=1, queue_size=0)
+    blocker = asyncio.create_task(hold(llm_scheduler, "other", [], delay=0.5))
+    await asyncio.sleep(0.001)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        chat = await client.post("/api/chat", json={"message": "hi"})
+        stream = await client.post("/api/chat/stream", json={"message": "hi"})
+        stats = (await client.get("/api/llm-stats")).json()
+
+    assert chat.status_code == 429
+    assert int(chat.headers["Retry-After"]) >= 1
+    assert chat.json()["reason"] == "queue_full"
+    assert stream.status_code == 429
+    assert stats["active"] == 1 and stats["rejected"] == 2
+    blocker.cancel()
@@ -0,0 +1,68 @@
+"""Tests for the semantic response cache."""
+import pytest
+
+from cib_chatbot_serverside.services import semantic_cache
+from cib_chatbot_serverside.services.semantic_cache import SemanticCache
+
+RESULT = {"response": "cached", "context_used": True, "sources": ["doc.pdf"]}
+
+
+def test_close_question_with_same_sources_hits():
+    cache = SemanticCache(max_size=4, max_distance=0.05)
+    cache.store([1.0, 0.0], ("a:0:0",), RESULT, cache.generation)
+
+    assert cache.lookup([0.99, 0.05], ("a:0:0",)) == RESULT
+    assert cache.lookup([0.99, 0.05], ("b:0:0",)) is None
+    assert cache.lookup([0.0, 1.0], ("a:0:0",)) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_bounded_size():
+    cache = SemanticCache(max_size=2)
+    for i in range(3):
+        cache.store([1.0, float(i)], (str(i),), RESULT, cache.generation)
+
+    assert cache.stats()["size"] == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup([1.0, 0.0], ("0",)) is None
+
+
+def test_invalidate_drops_entries_and_stale_writes():
+    cache = SemanticCache()
+    generation = cache.generation
+    cache.store([1.0], ("a",), RESULT, generation)
+    cache.invalidate()
+
+    assert cache.lookup([1.0], ("a",)) is None
+    # An answer generated before the invalidation must not be cached
+    cache.store([1.0], ("a",), RESULT, generation)
+    assert cache.stats()["size"] == 0
+
+
+@pytest.fixture
+def enabled_cache():
+    semantic_cache._cache = SemanticCache(max_size=8, max_distance=0.05)
+    return semantic_cache._cache
+
+
+@pytest.mark.asyncio
+async def test_repeat_question_skips_generation(rag_service, enabled_cache):
+    llm = rag_service.llm_service.llm
+    first = await rag_service.process_query("How do I reset my password?")
+    await rag_service.clear_history()
+    second = await rag_service.process_query("How can I reset my password?")
+
+    assert second == first
+    assert llm.calls == 1
+    assert enabled_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_follow_up_questions_bypass_cache(rag_service, enabled_cache):
+    llm = rag_service.llm_service.llm
+    await rag_service.process_query("How do I reset my password?")
+    await rag_service.process_query("How do I reset my password?")
+
+    assert llm.calls == 2
+    assert enabled_cache.stats()["bypassed"] == 1
@@ -0,0 +1,151 @@
+"""Tests for per-session conversations and the shared session store."""
+import json
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from cib_chatbot_serverside.db import sessions as db_sessions
+from cib_chatbot_serverside.services import RAGService, SessionStore, sessions
+from cib_chatbot_serverside.services.history import ConversationHistory
+
+from .conftest import stub_service
+from .test_db_operations import RecordingCursor, RecordingPool
+
+
+class FakeSessionTable:
+    """Stands in for chat_sessions, shared by several stores like workers sharing Postgres."""
+
+    def __init__(self):
+        self.rows = {}
+        self.notifications = []
+
+    @contextmanager
+    def installed(self):
+        def save(session_id, state, origin):
+            # Round-trip through JSON like the JSONB columns
+            self.rows[session_id] = json.loads(json.dumps(state))
+            self.notifications.append(f"{origin}:{session_id}")
+
+        def delete(session_id, origin):
+            self.notifications.append(f"{origin}:{session_id}")
+            return self.rows.pop(session_id, None) is not None
+
+        with patch.object(sessions, "ensure_sessions_table", lambda: None), \
+                patch.object(sessions, "load_session", lambda session_id, ttl: self.rows.get(session_id)), \
+                patch.object(sessions, "save_session", save), \
+                patch.object(sessions, "delete_session", delete):
+            yield self
+
+
+def persistent_service():
+    service = stub_service(RAGService())
+    service.sessions.persistent = True
+    return service
+
+
+@pytest.mark.asyncio
+async def test_api_keeps_sessions_apart_and_clears_only_one(app_service):
+    from cib_chatbot_serverside.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = (await client.post("/api/chat", json={"message": "hi"})).json()
+        session_a = first["session_id"]
+        await client.post("/api/chat", json={"message": "again", "session_id": session_a})
+        stream = await client.post("/api/chat/stream", json={"message": "hello", "session_id": "b"})
+        bad = await client.post("/api/chat", json={"message": "hi", "session_id": "no spaces"})
+        cleared = await client.post("/api/clear-history", json={"session_id": session_a})
+
+    assert session_a
+    assert stream.headers["X-Session-ID"] == "b"
+    assert '"session_id": "b"' in stream.text.split("event: done")[1]
+    assert bad.status_code == 422
+    assert cleared.json()["session_id"] == session_a
+    assert len((await app_service.sessions.get(session_a)).messages) == 0
+    assert len((await app_service.sessions.get("b")).messages) == 2
+
+
+@pytest.mark.asyncio
+async def test_any_worker_continues_a_conversation(fake_db):
+    with FakeSessionTable().installed() as table:
+        worker_a, worker_b = persistent_service(), persistent_service()
+
+        await worker_a.process_query("first question", "s1")
+        await worker_b.process_query("second question", "s1")
+        # Worker A's cached copy is stale until B's notification arrives
+        worker_a.sessions.invalidate(table.notifications)
+        history = await worker_a.sessions.get("s1")
+
+    assert [message.content for message in history.messages[::2]] == ["first question", "second question"]
+    assert [item["role"] for item in table.rows["s1"]["messages"]] == ["human", "ai", "human", "ai"]
+    # Each worker ignores its own notifications
+    assert worker_b.sessions.stats()["invalidations"] == 0
+    worker_b.sessions.invalidate(table.notifications)
+    assert worker_b.sessions.stats()["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_store_is_a_bounded_lru_that_forgets_idle_sessions():
+    store = SessionStore(ConversationHistory, max_sessions=2, idle_ttl=60, persistent=False)
+    first = await store.get("a")
+    await store.get("b")
+    assert await store.get("a") is first
+    await store.get("c")
+
+    assert store.stats()["evictions"] == 1
+    assert await store.get("a") is first  # "b" was the least recently used
+
+    store.idle_ttl = 0
+    assert await store.expire() == 2
+    assert store.stats()["cached"] == 0
+
+
+@pytest.mark.asyncio
+async def test_database_errors_do_not_break_the_conversation(rag_service):
+    def down(*args):
+        raise ConnectionError("postgres is down")
+
+    rag_service.sessions.persistent = True
+    with patch.object(sessions, "ensure_sessions_table", down):
+        result = await rag_service.process_query("question", "s1")
+
+    assert result["response"] == "stub answer"
+    assert len((await rag_service.sessions.get("s1")).messages) == 2
+    assert rag_service.sessions.stats()["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_turns_awaiting_summary_survive_a_restore():
+    summarized = []
+
+    async def summarizer(summary, messages):
+        summarized.extend(message.content for message in messages)
+        return "summary"
+
+    state = {
+        "messages": [],
+        "pending": [{"role": "human", "content": "old"}, {"role": "ai", "content": "reply"}],
+        "summary": "earlier",
+    }
+
+    restored = ConversationHistory(summarizer=summarizer, token_budget=1000)
+    restored.restore(json.loads(json.dumps(state)))
+    await restored.wait_for_summary()
+
+    assert summarized == ["old", "reply"]
+    assert restored.summary == "summary"
+    assert restored.dump() == {"messages": [], "pending": [], "summary": "summary"}
+
+
+def test_save_upserts_and_notifies_in_one_transaction():
+    cur = RecordingCursor([])
+    cur.rowcount = 1
+    with patch.object(db_sessions, "get_pool", lambda: RecordingPool(cur)):
+        db_sessions.save_session("s1", {"messages": [], "pending": [], "summary": ""}, "worker")
+
+    (upsert, params), (notify, notify_params) = cur.calls
+    assert "ON CONFLICT (session_id) DO UPDATE" in upsert
+    assert params[0] == "s1"
+    assert notify_params == (db_sessions.SESSIONS_CHANGED_CHANNEL, "worker:s1")
@@ -0,0 +1,190 @@
+"""Tests for in-flight request coalescing."""
+import asyncio
+from contextlib import aclosing
+
+import pytest
+
+from cib_chatbot_serverside.utils.metrics import COALESCED
+from cib_chatbot_serverside.utils.singleflight import SingleFlight
+
+
+class Work:
+    """Counts executions of a slow computation."""
+
+    def __init__(self, delay=0.05, result="done", error=None):
+        self.delay = delay
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class Tokens:
+    """A slow token stream that records whether it was closed."""
+
+    def __init__(self, tokens=("a", "b", "c", "d"), delay=0.02):
+        self.tokens = tokens
+        self.delay = delay
+        self.calls = 0
+        self.closed = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            for token in self.tokens:
+                await asyncio.sleep(self.delay)
+                yield token
+        finally:
+            self.closed = True
+
+
+async def collect(flight, key, source):
+    async with aclosing(flight.stream(key, source)) as stream:
+        return [item async for item in stream]
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_execution():
+    flight = SingleFlight("test-do")
+    work, other = Work(), Work(result="other")
+    before = COALESCED.value(layer="test-do")
+
+    results = await asyncio.gather(
+        *(flight.do("q", work) for _ in range(5)), flight.do("other", other)
+    )
+
+    assert results == ["done"] * 5 + ["other"]
+    assert work.calls == 1 and other.calls == 1
+    assert COALESCED.value(layer="test-do") - before == 4
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+    # Finished calls are not cached
+    await flight.do("q", work)
+    assert work.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight("test-error")
+    work = Work(error=ValueError("boom"))
+
+    results = await asyncio.gather(*(flight.do("q", work) for _ in range(3)), return_exceptions=True)
+
+    assert work.calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_fail_the_others():
+    flight = SingleFlight("test-cancel")
+    work = Work()
+
+    leader = asyncio.create_task(flight.do("q", work))
+    follower = asyncio.create_task(flight.do("q", work))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == "done"
+    assert work.cancelled is False
+
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_when_every_caller_leaves():
+    flight = SingleFlight("test-abandon")
+    work = Work(delay=1)
+
+    tasks = [asyncio.create_task(flight.do("q", work)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert work.cancelled is True
+    assert flight.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_late_stream_subscriber_gets_the_whole_stream():
+    flight = SingleFlight("test-stream")
+    source = Tokens()
+
+    first = asyncio.create_task(collect(flight, "q", source))
+    await asyncio.sleep(0.05)
+    second = await collect(flight, "q", source)
+
+    assert await first == ["a", "b", "c", "d"]
+    assert second == ["a", "b", "c", "d"]
+    assert source.calls == 1
+    assert flight.stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_closes_upstream_only_after_last_subscriber():
+    flight = SingleFlight("test-stream-close")
+    source = Tokens()
+
+    quitter = flight.stream("q", source)
+    assert await quitter.__anext__() == "a"
+    stayer = asyncio.create_task(collect(flight, "q", source))
+    await asyncio.sleep(0)
+    await quitter.aclose()
+
+    assert source.closed is False
+    assert await stayer == ["a", "b", "c", "d"]
+
+    lone = flight.stream("q2", source)
+    await lone.__anext__()
+    await lone.aclose()
+    assert source.closed is True
+
+
+@pytest.mark.asyncio
+async def test_disabled_runs_every_call():
+    flight = SingleFlight("test-disabled", enabled=False)
+    work, source = Work(), Tokens(delay=0)
+
+    await asyncio.gather(flight.do("q", work), flight.do("q", work))
+    await asyncio.gather(collect(flight, "q", source), collect(flight, "q", source))
+
+    assert work.calls == 2
+    assert source.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_identical_chat_requests_share_embed_search_and_generation(rag_service):
+    results = await asyncio.gather(*(rag_service.process_query("What is in the doc?") for _ in range(4)))
+
+    assert all(result["response"] == "stub answer" for result in results)
+    assert rag_service.llm_service.embeddings.calls == 1
+    assert rag_service.llm_service.llm.calls == 1
+    stats = rag_service.coalescing_stats()
+    assert stats["search"]["executed"] == 1
+    assert stats["search"]["coalesced"] == 3
+
+
+@pytest.mark.asyncio
+async def test_identical_streams_share_one_generation(rag_service):
+    async def consume():
+        async with aclosing(rag_service.stream_query("What is in the doc?")) as events:
+            return [event async for event in events]
+
+    first, second = await asyncio.gather(consume(), consume())
+
+    assert rag_service.llm_service.llm.calls == 1
+    tokens = [event["content"] for event in first if event["type"] == "token"]
+    assert tokens == [event["content"] for event in second if event["type"] == "token"]
+    assert "".join(tokens) == "stub answer"
+    assert first[-1]["metrics"]["tokens"] == second[-1]["metrics"]["tokens"] == 2
@@ -0,0 +1,66 @@
+"""Tests for the token-streaming chat path."""
+import json
+
+import httpx
+import pytest
+
+from cib_chatbot_serverside.services import DEFAULT_SESSION
+
+
+def parse_sse(body: str):
+    """Parse a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_stream_query_yields_tokens_then_summary(rag_service):
+    rag_service.llm_service.llm.answer = "one two three"
+    events = [event async for event in rag_service.stream_query("question")]
+
+    tokens = [e["content"] for e in events if e["type"] == "token"]
+    done = events[-1]
+
+    assert "".join(tokens) == "one two three"
+    assert done["type"] == "done"
+    assert done["sources"] == ["doc.pdf"]
+    assert done["context_used"] is True
+    assert done["metrics"]["tokens"] == 3
+    assert done["metrics"]["time_to_first_token"] > 0
+    history = await rag_service.sessions.get(DEFAULT_SESSION)
+    assert len(history.messages) == 2
+    assert history.messages[1].content == "one two three"
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_cancels_generation(rag_service):
+    """Abandoning the stream stops the model and leaves history untouched."""
+    llm = rag_service.llm_service.llm
+    llm.answer = "a b c d e f"
+
+    stream = rag_service.stream_query("question")
+    first = await stream.__anext__()
+    await stream.aclose()
+
+    assert first == {"type": "token", "content": "a"}
+    assert llm.stream_closed is True
+    assert (await rag_service.sessions.get(DEFAULT_SESSION)).messages == []
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_endpoint_emits_sse(app_service):
+    from cib_chatbot_serverside.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/api/chat/stream", json={"message": "hi"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [name for name, _ in events[:-1]] == ["token", "token"]
+    assert events[-1][0] == "done"
+    assert events[-1][1]["sources"] == ["doc.pdf"]
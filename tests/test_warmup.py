@@ -0,0 +1,85 @@
+"""Tests for startup warm-up, readiness and lazy imports."""
+import asyncio
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+from cib_chatbot_serverside.services import warmup
+from cib_chatbot_serverside.services.warmup import WarmUp
+
+
+@pytest.fixture
+def fresh_warmup():
+    warmup._warmup = WarmUp(timeout=1)
+    yield warmup._warmup
+    warmup._warmup = None
+
+
+@pytest.mark.asyncio
+async def test_ready_turns_200_once_warm_up_settles(fresh_warmup):
+    from cib_chatbot_serverside.main import app
+
+    release = asyncio.Event()
+    task = asyncio.create_task(fresh_warmup.run({"chat_model": release.wait}))
+    await asyncio.sleep(0)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        before = await client.get("/api/ready")
+        release.set()
+        await task
+        after = await client.get("/api/ready")
+
+    assert before.status_code == 503
+    assert before.json()["steps"]["chat_model"]["status"] == "pending"
+    assert after.status_code == 200
+    assert after.json()["steps"]["chat_model"]["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_failed_or_slow_steps_are_recorded_without_blocking_readiness(fresh_warmup):
+    fresh_warmup.timeout = 0.05
+
+    async def broken():
+        raise ConnectionError("ollama is down")
+
+    await fresh_warmup.run({
+        "database": lambda: asyncio.sleep(0),
+        "embedding_model": broken,
+        "chat_model": asyncio.Event().wait,
+    })
+    status = fresh_warmup.status()
+
+    assert status["ready"]
+    assert sorted(status["failed"]) == ["chat_model", "embedding_model"]
+    assert status["steps"]["embedding_model"]["error"] == "ollama is down"
+    assert status["steps"]["chat_model"]["error"] == "TimeoutError"
+
+
+def test_preload_loads_both_models_into_ollama():
+    from benchmarks.fake_ollama import FakeOllama
+    from cib_chatbot_serverside.services.llm_service import LLMService
+
+    with FakeOllama(embed_latency=0, dims=8) as fake:
+        service = LLMService()
+        service.llm.base_url = service.embeddings.base_url = fake.base_url
+
+        async def preload():
+            await service.preload_chat_model()
+            await service.preload_embedding_model()
+
+        asyncio.run(preload())
+
+    assert fake.requests == {"embed": 1, "chat": 1}
+
+
+def test_package_import_does_not_load_clients():
+    code = (
+        "import sys, cib_chatbot_serverside; "
+        "print(sorted(m for m in ('langchain_ollama', 'fastapi', 'psycopg2') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "[]"